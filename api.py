@@ -0,0 +1,634 @@
+"""HTTP API over the CinePredicta booking core (c.py).
+
+Run with several workers against a shared cine.db:
+    CINE_DB=cine.db CINE_WORKERS=4 python api.py
+Authenticated routes use HTTP Basic with the same accounts as the terminal app.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Optional, List, Dict, Any, Literal
+
+import uvicorn
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from fastapi.security import HTTPBasic, HTTPBasicCredentials
+from pydantic import BaseModel, Field, TypeAdapter
+
+from c import (
+    Admin, Manager, User, Database, LoyaltyEngine, RatingAggregates, CatalogSearch, FilmCatalog,
+    ReviewFeed, DemandForecaster, RevenueRollups, Recommender, CatalogVersions, SeatEvents, LRUCache,
+    ListingExport, HistoryPurger, BackupManager, ReadReplica, MetricsRegistry, POINTS_REDEEM_BLOCK, RECOMMENDATION_TOP_K, SLOW_QUERY_MS
+)
+
+DB_PATH = os.environ.get('CINE_DB', 'cine.db')
+HOST = os.environ.get('CINE_HOST', '127.0.0.1')
+PORT = int(os.environ.get('CINE_PORT', '8000'))
+WORKERS = int(os.environ.get('CINE_WORKERS', '4'))
+RESPONSE_CACHE_SIZE = 1024
+# Live seat maps: tail interval, per-subscriber backlog before it is cut off, keep-alive period
+SEAT_POLL_INTERVAL = 0.05
+SEAT_QUEUE_SIZE = 256
+SEAT_HEARTBEAT = 15
+# Query tracing at startup; /admin/queries switches it per worker at runtime
+TRACE_QUERIES = os.environ.get('CINE_TRACE') == '1'
+TRACE_SLOW_MS = float(os.environ.get('CINE_SLOW_QUERY_MS', SLOW_QUERY_MS))
+
+# Importing migrates the schema; `python api.py` does so once before workers start
+db = Database(DB_PATH)
+if WORKERS > 1:
+    # These caches are only invalidated by writes in the same process; with several
+    # workers a write handled elsewhere would leave them stale, so bypass them
+    db.activity_cache.max_entries = 0
+    db.film_cache.max_entries = 0
+db.tracer.enabled = TRACE_QUERIES
+db.tracer.slow_ms = TRACE_SLOW_MS
+admin = Admin(db)
+manager = Manager(db)
+user = User(db)
+loyalty = LoyaltyEngine(db)
+ratings = RatingAggregates(db)
+search = CatalogSearch(db)
+films = FilmCatalog(db)
+review_feed = ReviewFeed(db)
+forecaster = DemandForecaster(db)
+revenue = RevenueRollups(db)
+recommender = Recommender(db)
+purger = HistoryPurger(db)
+backups = BackupManager(db)
+replica = ReadReplica(db)
+catalog_versions = CatalogVersions(db)
+# Rendered catalog listings keyed by path and version stamp. Unlike the caches above this one
+# is safe with several workers: a write anywhere moves the stamp, so stale keys are never hit
+response_cache = LRUCache(RESPONSE_CACHE_SIZE)
+db.caches['response'] = response_cache
+seat_events = SeatEvents(db)
+
+def _sse_frame(event_id: int, event: str, data: Dict) -> bytes:
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+
+class SeatHub:
+    """Live seat-map fan-out for this worker. A single thread tails seat_events for every show,
+    so database load does not grow with subscribers; each delta is encoded once and the same
+    frame is queued for every subscriber of its show on the event loop."""
+    def __init__(self, events: SeatEvents):
+        self.events = events
+        self.channels = defaultdict(set)
+        self.loop = None
+        self.last_id = 0
+    def start(self, loop):
+        self.loop = loop
+        self.last_id = self.events.last_id()
+        threading.Thread(target=self._tail, name='seat-hub', daemon=True).start()
+    def _tail(self):
+        while True:
+            try:
+                events = self.events.since(self.last_id)
+            except sqlite3.Error:
+                events = []
+            if events:
+                self.last_id = events[-1]['id']
+                self.loop.call_soon_threadsafe(self._publish, events)
+            else:
+                time.sleep(SEAT_POLL_INTERVAL)
+    def _publish(self, events: List[Dict]):
+        for event in events:
+            subscribers = self.channels.get((event['theatre_id'], event['movie_id'], event['show_time']))
+            if not subscribers:
+                continue
+            frame = _sse_frame(event['id'], 'seats', {'state': event['state'], 'seats': event['seats']})
+            for queue in list(subscribers):
+                try:
+                    queue.put_nowait((event['id'], frame))
+                except asyncio.QueueFull:
+                    # Too far behind: drop its backlog and end the stream; the client
+                    # reconnects with Last-Event-ID and catches up from seat_events
+                    subscribers.discard(queue)
+                    while not queue.empty():
+                        queue.get_nowait()
+                    queue.put_nowait(None)
+    def subscribe(self, key: tuple) -> asyncio.Queue:
+        queue = asyncio.Queue(SEAT_QUEUE_SIZE)
+        self.channels[key].add(queue)
+        return queue
+    def unsubscribe(self, key: tuple, queue: asyncio.Queue):
+        subscribers = self.channels.get(key)
+        if subscribers is not None:
+            subscribers.discard(queue)
+            if not subscribers:
+                del self.channels[key]
+seat_hub = SeatHub(seat_events)
+db.metrics.gauge('cine_live_subscribers', "Open live seat-map streams.",
+                 collect=lambda: [((), sum(len(queues) for queues in list(seat_hub.channels.values())))])
+db.metrics.gauge('cine_replica_lag_seconds', "Age of the read replica's snapshot; absent while reports read the primary.",
+                 collect=lambda: [((), lag) for lag in [db.replica_lag()] if lag is not None])
+db.metrics.gauge('cine_backup_last_success_timestamp_seconds', "When the newest backup on disk was completed.",
+                 collect=lambda: [((), completed) for completed in [backups.last_completed()] if completed is not None])
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    seat_hub.start(asyncio.get_running_loop())
+    purger.start()
+    backups.start()
+    replica.start()
+    yield
+
+app = FastAPI(title="CinePredicta API", lifespan=lifespan)
+basic_auth = HTTPBasic()
+
+# Request models
+class SignupRequest(BaseModel):
+    username: str = Field(min_length=1)
+    password: str = Field(min_length=1)
+    email: str = Field(min_length=3)
+    phone: Optional[str] = None
+class ManagerSignupRequest(BaseModel):
+    username: str = Field(min_length=1)
+    password: str = Field(min_length=1)
+    email: str = Field(min_length=3)
+    theatre_id: int
+class SeatRef(BaseModel):
+    row: str = Field(min_length=1, max_length=1)
+    number: int = Field(ge=1)
+class SnackLine(BaseModel):
+    snack_id: int
+    quantity: int = Field(ge=1)
+class BookingRequest(BaseModel):
+    theatre_id: int
+    movie_id: int
+    show_time: str
+    seats: List[SeatRef] = Field(min_length=1)
+    snacks: List[SnackLine] = []
+    points_to_redeem: int = Field(0, ge=0)
+class FoodOrderRequest(BaseModel):
+    booking_id: int
+    snack_id: int
+    quantity: int = Field(ge=1)
+class ReviewRequest(BaseModel):
+    rating: int = Field(ge=1, le=5)
+    comment: str = ''
+    review_type: Literal['movie', 'theatre']
+    theatre_id: int
+    movie_id: Optional[int] = None
+class RedeemRequest(BaseModel):
+    points: int = Field(ge=POINTS_REDEEM_BLOCK)
+class MovieRequest(BaseModel):
+    title: str = Field(min_length=1)
+    duration: int = Field(gt=0)
+    cast_line: str = ''
+    genre: str = ''
+    show_times: str = Field(min_length=1)
+    ticket_price: float = Field(ge=0)
+class FilmRequest(BaseModel):
+    title: str = Field(min_length=1)
+    duration: int = Field(gt=0)
+    cast_line: str = ''
+    genre: str = ''
+class SnackRequest(BaseModel):
+    name: str = Field(min_length=1)
+    price: float = Field(ge=0)
+class TheatreRequest(BaseModel):
+    name: str = Field(min_length=1)
+    location: str = Field(min_length=1)
+    total_seats: int = Field(gt=0)
+class TierRequest(BaseModel):
+    name: str = Field(min_length=1)
+    min_spend: float = Field(ge=0)
+    multiplier: float = Field(gt=0)
+class TracingRequest(BaseModel):
+    enabled: bool
+    slow_ms: Optional[float] = Field(default=None, ge=0)
+    reset: bool = False
+
+# Response models
+class TheatreOut(BaseModel):
+    id: int
+    name: str
+    location: str
+    total_seats: int
+    avg_rating: Optional[float] = None
+    review_count: int = 0
+class MovieOut(BaseModel):
+    id: int
+    film_id: int
+    title: str
+    duration: int
+    cast_line: Optional[str] = None
+    genre: Optional[str] = None
+    theatre_id: Optional[int] = None
+    theatre_name: Optional[str] = None
+    show_times: Optional[str] = None
+    ticket_price: Optional[float] = None
+    avg_rating: Optional[float] = None
+    review_count: int = 0
+class SnackOut(BaseModel):
+    id: int
+    name: str
+    price: float
+    theatre_id: int
+class SeatMapOut(BaseModel):
+    theatre_id: int
+    movie_id: int
+    show_time: str
+    rows: int
+    seats_per_row: int
+    total_seats: int
+    available: int
+    seat_map: Dict[str, Dict[int, str]]
+class BookingOut(BaseModel):
+    id: int
+    seats_booked: int
+    show_time: Optional[str] = None
+    total_amount: float
+    booking_date: Optional[str] = None
+    movie_title: Optional[str] = None
+    theatre_name: Optional[str] = None
+class FoodOrderOut(BaseModel):
+    id: int
+    snack_name: Optional[str] = None
+    quantity: int
+    unit_price: Optional[float] = None
+    total_price: float
+    order_date: Optional[str] = None
+    booking_id: Optional[int] = None
+    movie_title: Optional[str] = None
+class LoyaltyOut(BaseModel):
+    loyalty_points: int
+    tier: str
+    multiplier: float
+    trailing_spend: float = 0
+class SummaryOut(BaseModel):
+    booking_count: int
+    food_order_count: int
+    review_count: int
+    total_spent: float
+    loyalty_points: int
+    tier: str
+    multiplier: float
+    recent_bookings: List[BookingOut]
+    recent_food_orders: List[FoodOrderOut]
+class RecommendationOut(BaseModel):
+    movie_id: int
+    film_id: int
+    title: str
+    genre: Optional[str] = None
+    theatre_id: Optional[int] = None
+    theatre_name: str
+    ticket_price: Optional[float] = None
+    score: float
+class ReviewPageOut(BaseModel):
+    reviews: List[Dict[str, Any]]
+    next_cursor: Optional[List[Any]] = None
+
+# Authentication: HTTP Basic checked against the role's account table
+def _authenticate(role, credentials: HTTPBasicCredentials) -> Dict:
+    account = role.login(credentials.username, credentials.password)
+    if not account:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid credentials",
+            headers={'WWW-Authenticate': 'Basic'}
+        )
+    return account
+def current_user(credentials: HTTPBasicCredentials = Depends(basic_auth)) -> Dict:
+    return _authenticate(user, credentials)
+def current_manager(credentials: HTTPBasicCredentials = Depends(basic_auth)) -> Dict:
+    return _authenticate(manager, credentials)
+def current_admin(credentials: HTTPBasicCredentials = Depends(basic_auth)) -> Dict:
+    return _authenticate(admin, credentials)
+def _require(found, detail: str = "Not found", status_code: int = status.HTTP_404_NOT_FOUND):
+    if not found:
+        raise HTTPException(status_code=status_code, detail=detail)
+    return found
+
+# Conditional GET: catalog listings carry their version stamp as ETag, so a revalidation
+# is answered from the stamps alone and each version is rendered once per worker
+THEATRE_LIST = TypeAdapter(List[TheatreOut])
+MOVIE_LIST = TypeAdapter(List[MovieOut])
+SNACK_LIST = TypeAdapter(List[SnackOut])
+def _replica_headers() -> Dict[str, str]:
+    """Reports read the read replica and may trail checkout; tell clients by how many seconds"""
+    lag = db.replica_lag()
+    return {} if lag is None else {'X-Replica-Lag': f"{lag:.0f}"}
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    tags = {tag.strip().removeprefix('W/') for tag in header.split(',')}
+    return '*' in tags or etag.removeprefix('W/') in tags
+def _catalog_response(request: Request, resource: str, scope_id: int, adapter: TypeAdapter, load) -> Response:
+    etag = catalog_versions.etag(resource, scope_id)
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if _etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    key = (request.url.path, etag)
+    body = response_cache.get(key)
+    if body is None:
+        body = adapter.dump_json(adapter.validate_python(load()))
+        response_cache.put(key, body)
+    return Response(body, media_type='application/json', headers=headers)
+
+# Catalog (public)
+@app.get('/theatres', response_model=List[TheatreOut])
+def list_theatres(request: Request):
+    return _catalog_response(request, 'theatres', 0, THEATRE_LIST, user.get_available_theatres)
+@app.get('/theatres/{theatre_id}/movies', response_model=List[MovieOut])
+def list_theatre_movies(theatre_id: int, request: Request):
+    return _catalog_response(request, 'movies', theatre_id, MOVIE_LIST,
+                             lambda: user.get_movies_by_theatre(theatre_id))
+@app.get('/theatres/{theatre_id}/snacks', response_model=List[SnackOut])
+def list_theatre_snacks(theatre_id: int, request: Request):
+    return _catalog_response(request, 'snacks', theatre_id, SNACK_LIST,
+                             lambda: user.get_available_snacks(theatre_id))
+@app.get('/theatres/{theatre_id}/movies/{movie_id}/seats', response_model=SeatMapOut)
+def get_seat_map(theatre_id: int, movie_id: int, show_time: str):
+    arrangement = _require(user.get_seat_arrangement(theatre_id, movie_id, show_time), "Theatre not found")
+    return dict(
+        arrangement,
+        theatre_id=theatre_id,
+        movie_id=movie_id,
+        show_time=show_time,
+        available=sum(state == 'Available' for row in arrangement['seat_map'].values() for state in row.values())
+    )
+@app.get('/theatres/{theatre_id}/movies/{movie_id}/seats/live')
+async def stream_seat_map(theatre_id: int, movie_id: int, show_time: str,
+                          last_event_id: Optional[int] = Header(None)):
+    """Server-sent events: a 'snapshot' of booked seats, then 'seats' deltas as bookings commit.
+    A reconnect carrying Last-Event-ID gets only the missed deltas while they are retained."""
+    key = (theatre_id, movie_id, show_time)
+    # Subscribe before reading so nothing committed after the read can be missed; queued
+    # events already covered by the read are skipped below
+    queue = seat_hub.subscribe(key)
+    try:
+        replay = None
+        if last_event_id is not None:
+            replay = await run_in_threadpool(seat_events.replay, theatre_id, movie_id, show_time, last_event_id)
+        if replay is not None:
+            frames = [_sse_frame(event['id'], 'seats', {'state': event['state'], 'seats': event['seats']})
+                      for event in replay]
+            covered = replay[-1]['id'] if replay else last_event_id
+        else:
+            snapshot = _require(await run_in_threadpool(seat_events.snapshot, theatre_id, movie_id, show_time),
+                                "Theatre not found")
+            frames = [_sse_frame(snapshot['event_id'], 'snapshot', snapshot)]
+            covered = snapshot['event_id']
+    except BaseException:
+        seat_hub.unsubscribe(key, queue)
+        raise
+    async def stream():
+        try:
+            for frame in frames:
+                yield frame
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), SEAT_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                if item is None:
+                    break
+                if item[0] > covered:
+                    yield item[1]
+        finally:
+            seat_hub.unsubscribe(key, queue)
+    return StreamingResponse(stream(), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+@app.get('/films/{film_id}')
+def get_film(film_id: int) -> Dict[str, Any]:
+    return _require(films.get_film(film_id), "Film not found")
+@app.get('/genres')
+def list_genres() -> List[Dict[str, Any]]:
+    return user.get_genres()
+@app.get('/genres/{genre}/movies', response_model=List[MovieOut])
+def list_genre_movies(genre: str):
+    return user.get_movies_by_genre(genre)
+@app.get('/people/{name}/movies', response_model=List[MovieOut])
+def list_person_movies(name: str):
+    return user.get_movies_by_person(name)
+@app.get('/movies/{movie_id}/similar', response_model=List[RecommendationOut])
+def list_similar_movies(movie_id: int, limit: int = Query(RECOMMENDATION_TOP_K, ge=1, le=50)):
+    return user.get_similar_movies(movie_id, limit)
+@app.get('/movies/top-rated')
+def list_top_rated(limit: int = Query(10, ge=1, le=100), min_reviews: int = Query(1, ge=1)) -> List[Dict[str, Any]]:
+    return ratings.top_rated_movies(limit, min_reviews)
+@app.get('/search')
+def search_catalog(q: str = Query(min_length=1), limit: int = Query(10, ge=1, le=50)) -> Dict[str, Any]:
+    return {'movies': search.search_movies(q, limit), 'reviews': search.search_reviews(q, limit)}
+@app.get('/reviews', response_model=ReviewPageOut)
+def list_reviews(theatre_id: Optional[int] = None, movie_id: Optional[int] = None,
+                 min_rating: Optional[int] = Query(None, ge=1, le=5), max_rating: Optional[int] = Query(None, ge=1, le=5),
+                 review_type: Optional[Literal['movie', 'theatre']] = None, since: Optional[str] = None,
+                 after_created_at: Optional[str] = None, after_id: Optional[int] = None,
+                 limit: int = Query(20, ge=1, le=100)):
+    cursor_key = (after_created_at, after_id) if after_created_at and after_id else None
+    return review_feed.page(theatre_id, movie_id, min_rating, max_rating, review_type, since, cursor_key, limit)
+
+# User account
+@app.post('/users', status_code=status.HTTP_201_CREATED)
+def signup_user(request: SignupRequest) -> Dict[str, Any]:
+    _require(user.signup(request.username, request.password, request.email, request.phone),
+             "Username or email already exists", status.HTTP_409_CONFLICT)
+    return {'username': request.username}
+@app.get('/me')
+def get_me(account: Dict = Depends(current_user)) -> Dict[str, Any]:
+    return account
+@app.get('/me/summary', response_model=SummaryOut)
+def get_my_summary(account: Dict = Depends(current_user)):
+    return user.get_activity_summary(account['id'])
+@app.get('/me/bookings', response_model=List[BookingOut])
+def list_my_bookings(limit: Optional[int] = Query(None, ge=1), account: Dict = Depends(current_user)):
+    return user.get_user_bookings(account['id'], limit)
+@app.get('/me/food-orders', response_model=List[FoodOrderOut])
+def list_my_food_orders(limit: Optional[int] = Query(None, ge=1), account: Dict = Depends(current_user)):
+    return user.get_user_food_orders(account['id'], limit)
+@app.get('/me/reviews')
+def list_my_reviews(account: Dict = Depends(current_user)) -> List[Dict[str, Any]]:
+    return user.get_user_reviews(account['id'])
+@app.get('/me/recommendations', response_model=List[RecommendationOut])
+def list_my_recommendations(limit: int = Query(RECOMMENDATION_TOP_K, ge=1, le=50),
+                            account: Dict = Depends(current_user)):
+    return user.get_recommendations(account['id'], limit)
+@app.get('/me/loyalty', response_model=LoyaltyOut)
+def get_my_loyalty(account: Dict = Depends(current_user)):
+    return dict(loyalty.get_user_tier(account['id']), loyalty_points=user.get_loyalty_points(account['id']))
+@app.post('/me/loyalty/redeem', response_model=LoyaltyOut)
+def redeem_my_points(request: RedeemRequest, account: Dict = Depends(current_user)):
+    _require(user.redeem_points(account['id'], request.points), "Not enough points", status.HTTP_409_CONFLICT)
+    return get_my_loyalty(account)
+
+# Bookings, food and reviews
+@app.post('/bookings', response_model=BookingOut, status_code=status.HTTP_201_CREATED)
+def create_booking(request: BookingRequest, account: Dict = Depends(current_user)):
+    movies = {movie['id']: movie for movie in user.get_movies_by_theatre(request.theatre_id)}
+    movie = _require(movies.get(request.movie_id), "Movie not showing at this theatre")
+    show_times = [show_time.strip() for show_time in (movie['show_times'] or '').split(',')]
+    _require(request.show_time.strip() in show_times, "Unknown show time")
+    seat_map = user.get_seat_arrangement(request.theatre_id, request.movie_id, request.show_time)['seat_map']
+    seats = [(seat.row.upper(), seat.number) for seat in request.seats]
+    if len(set(seats)) != len(seats):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Duplicate seats")
+    for row, number in seats:
+        state = seat_map.get(row, {}).get(number)
+        _require(state, f"No seat {row}{number}", status.HTTP_422_UNPROCESSABLE_ENTITY)
+        _require(state == 'Available', f"Seat {row}{number} is taken", status.HTTP_409_CONFLICT)
+    snack_ids = {snack['id'] for snack in user.get_available_snacks(request.theatre_id)}
+    for line in request.snacks:
+        _require(line.snack_id in snack_ids, f"Snack {line.snack_id} is not sold at this theatre",
+                 status.HTTP_422_UNPROCESSABLE_ENTITY)
+    # Tickets, snacks and points commit together; checkout re-checks the seats under the write
+    # lock, so a seat taken by a concurrent request after the check above is refused
+    booking_id = _require(
+        user.checkout(account['id'], request.movie_id, request.theatre_id, request.show_time, seats,
+                      [(line.snack_id, line.quantity) for line in request.snacks], request.points_to_redeem),
+        "Seats, snacks or points no longer available", status.HTTP_409_CONFLICT
+    )
+    return user.get_booking(account['id'], booking_id)
+@app.post('/food-orders', status_code=status.HTTP_201_CREATED)
+def create_food_order(request: FoodOrderRequest, account: Dict = Depends(current_user)) -> Dict[str, Any]:
+    # order_food checks the booking is the user's under the write lock
+    order_id = _require(user.order_food(account['id'], request.booking_id, request.snack_id, request.quantity),
+                        "Booking or snack not found")
+    return user.get_food_order(account['id'], order_id)
+@app.post('/reviews', status_code=status.HTTP_201_CREATED)
+def create_review(request: ReviewRequest, account: Dict = Depends(current_user)) -> Dict[str, Any]:
+    if request.review_type == 'movie' and request.movie_id is None:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="movie_id is required")
+    _require(user.add_review(account['id'], request.rating, request.comment, request.review_type,
+                             request.theatre_id, request.movie_id), "Review could not be saved",
+             status.HTTP_400_BAD_REQUEST)
+    return {'status': 'created'}
+@app.delete('/reviews/{review_id}', status_code=status.HTTP_204_NO_CONTENT)
+def delete_review(review_id: int, account: Dict = Depends(current_user)):
+    _require(user.delete_review(review_id, account['id']), "Review not found")
+
+# Manager (scoped to the manager's theatre)
+@app.post('/managers', status_code=status.HTTP_201_CREATED)
+def signup_manager(request: ManagerSignupRequest, account: Dict = Depends(current_admin)) -> Dict[str, Any]:
+    """Manager accounts are issued by admins: a manager controls a theatre's catalog and bookings"""
+    _require(manager.signup(request.username, request.password, request.email, request.theatre_id),
+             "Username or email already exists", status.HTTP_409_CONFLICT)
+    return {'username': request.username}
+@app.get('/manager/movies')
+def manager_list_movies(account: Dict = Depends(current_manager)) -> List[Dict[str, Any]]:
+    return manager.view_movies(account['theatre_id'])
+@app.post('/manager/movies', status_code=status.HTTP_201_CREATED)
+def manager_add_movie(request: MovieRequest, account: Dict = Depends(current_manager)) -> Dict[str, Any]:
+    _require(manager.add_movie(request.title, request.duration, request.cast_line, request.genre,
+                               request.show_times, request.ticket_price, account['theatre_id']),
+             "Movie could not be added", status.HTTP_400_BAD_REQUEST)
+    return {'status': 'created'}
+@app.put('/manager/movies/{movie_id}')
+def manager_update_movie(movie_id: int, request: MovieRequest, account: Dict = Depends(current_manager)) -> Dict[str, Any]:
+    _require(manager.update_movie(movie_id, request.title, request.duration, request.cast_line, request.genre,
+                                  request.show_times, request.ticket_price, account['theatre_id']), "Movie not found")
+    return {'status': 'updated'}
+@app.delete('/manager/movies/{movie_id}', status_code=status.HTTP_204_NO_CONTENT)
+def manager_delete_movie(movie_id: int, account: Dict = Depends(current_manager)):
+    _require(manager.delete_movie(movie_id, account['theatre_id']), "Movie not found")
+@app.get('/manager/snacks')
+def manager_list_snacks(account: Dict = Depends(current_manager)) -> List[Dict[str, Any]]:
+    return manager.view_snacks(account['theatre_id'])
+@app.post('/manager/snacks', status_code=status.HTTP_201_CREATED)
+def manager_add_snack(request: SnackRequest, account: Dict = Depends(current_manager)) -> Dict[str, Any]:
+    _require(manager.add_snack(request.name, request.price, account['theatre_id']),
+             "Snack could not be added", status.HTTP_400_BAD_REQUEST)
+    return {'status': 'created'}
+@app.delete('/manager/snacks/{snack_id}', status_code=status.HTTP_204_NO_CONTENT)
+def manager_delete_snack(snack_id: int, account: Dict = Depends(current_manager)):
+    _require(manager.delete_snack(snack_id, account['theatre_id']), "Snack not found")
+@app.get('/manager/bookings')
+def manager_list_bookings(response: Response, account: Dict = Depends(current_manager)) -> List[Dict[str, Any]]:
+    response.headers.update(_replica_headers())
+    return manager.view_bookings(account['theatre_id'])
+@app.get('/manager/reviews')
+def manager_list_reviews(account: Dict = Depends(current_manager)) -> List[Dict[str, Any]]:
+    return manager.view_reviews(account['theatre_id'])
+@app.get('/manager/revenue')
+def manager_revenue(start_date: Optional[str] = None, end_date: Optional[str] = None,
+                    group_by: Optional[Literal['day', 'movie', 'show', 'theatre']] = None,
+                    account: Dict = Depends(current_manager)) -> List[Dict[str, Any]]:
+    return revenue.report(account['theatre_id'], start_date, end_date, group_by)
+@app.get('/manager/forecast')
+def manager_forecast(days: int = Query(1, ge=1, le=14), account: Dict = Depends(current_manager)) -> List[Dict[str, Any]]:
+    return forecaster.forecast(account['theatre_id'], days)
+
+# Admin
+@app.get('/admin/users')
+def admin_list_users(response: Response, account: Dict = Depends(current_admin)) -> List[Dict[str, Any]]:
+    response.headers.update(_replica_headers())
+    return admin.view_users()
+@app.get('/admin/export/{listing}')
+def admin_export(listing: Literal['users', 'reviews'], format: Literal['ndjson', 'csv'] = 'ndjson',
+                 account: Dict = Depends(current_admin)):
+    """Stream a full listing; rows are read and encoded as the body is sent"""
+    rows = admin.iter_users() if listing == 'users' else admin.iter_all_reviews()
+    return StreamingResponse(
+        ListingExport.chunks(rows, format),
+        media_type=ListingExport.FORMATS[format],
+        headers={'Content-Disposition': f'attachment; filename="{listing}.{format}"', **_replica_headers()}
+    )
+@app.get('/admin/theatres')
+def admin_list_theatres(account: Dict = Depends(current_admin)) -> List[Dict[str, Any]]:
+    return admin.view_theatres()
+@app.post('/admin/theatres', status_code=status.HTTP_201_CREATED)
+def admin_add_theatre(request: TheatreRequest, account: Dict = Depends(current_admin)) -> Dict[str, Any]:
+    _require(admin.add_theatre(request.name, request.location, request.total_seats),
+             "Theatre could not be added", status.HTTP_400_BAD_REQUEST)
+    return {'status': 'created'}
+@app.delete('/admin/theatres/{theatre_id}', status_code=status.HTTP_204_NO_CONTENT)
+def admin_delete_theatre(theatre_id: int, account: Dict = Depends(current_admin)):
+    _require(admin.delete_theatre(theatre_id), "Theatre not found")
+@app.put('/admin/films/{film_id}')
+def admin_update_film(film_id: int, request: FilmRequest, account: Dict = Depends(current_admin)) -> Dict[str, Any]:
+    _require(admin.update_film(film_id, request.title, request.duration, request.cast_line, request.genre),
+             "Film not found, or another film has that title and duration")
+    return {'status': 'updated'}
+@app.get('/admin/loyalty-tiers')
+def admin_list_tiers(account: Dict = Depends(current_admin)) -> List[Dict[str, Any]]:
+    return loyalty.get_tiers()
+@app.put('/admin/loyalty-tiers')
+def admin_set_tier(request: TierRequest, account: Dict = Depends(current_admin)) -> List[Dict[str, Any]]:
+    _require(loyalty.set_tier(request.name, request.min_spend, request.multiplier),
+             "Tier could not be saved", status.HTTP_400_BAD_REQUEST)
+    return loyalty.get_tiers()
+@app.post('/admin/jobs/{job}')
+def admin_run_job(job: Literal['loyalty-tiers', 'ratings', 'search', 'forecast', 'revenue', 'recommendations', 'backup',
+                              'replica'],
+                  account: Dict = Depends(current_admin)) -> Dict[str, Any]:
+    jobs = {
+        'loyalty-tiers': loyalty.run_tier_job,
+        'ratings': ratings.rebuild,
+        'search': search.rebuild,
+        'forecast': forecaster.rebuild,
+        'revenue': revenue.rebuild,
+        'recommendations': recommender.rebuild,
+        'backup': backups.backup,
+        'replica': replica.refresh
+    }
+    return {'job': job, 'result': jobs[job]()}
+@app.get('/metrics')
+def metrics():
+    """Prometheus scrape target; like every in-process figure here it covers this worker only"""
+    return Response(db.metrics.render(), media_type=MetricsRegistry.CONTENT_TYPE)
+@app.get('/admin/queries')
+def admin_query_stats(account: Dict = Depends(current_admin)) -> Dict[str, Any]:
+    """This worker's statement histograms, counters and slow-query log"""
+    return {'pid': os.getpid(), **db.tracer.snapshot()}
+@app.put('/admin/queries')
+def admin_set_tracing(request: TracingRequest, account: Dict = Depends(current_admin)) -> Dict[str, Any]:
+    if request.reset:
+        db.tracer.reset()
+    if request.slow_ms is not None:
+        db.tracer.slow_ms = request.slow_ms
+    db.tracer.enabled = request.enabled
+    return {'pid': os.getpid(), 'enabled': db.tracer.enabled, 'slow_ms': db.tracer.slow_ms}
+
+if __name__ == "__main__":
+    uvicorn.run('api:app', host=HOST, port=PORT, workers=WORKERS)
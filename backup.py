@@ -0,0 +1,105 @@
+"""Online backups of cine.db and its archive, taken while bookings carry on.
+
+    python backup.py run                          # take a backup now
+    python backup.py list
+    python backup.py verify cine-20261019T020000Z
+    python backup.py restore cine-20261019T020000Z  # stop api.py first
+
+    python backup.py bench --db big.db --seconds 20   # booking latency with and without a backup
+
+api.py takes one backup every BACKUP_INTERVAL_HOURS and keeps the newest BACKUP_RETENTION.
+bench books seats from one thread while idle and then while a backup runs, for each
+--pages/--pause setting given, and reports booking latency and backup throughput.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from contextlib import redirect_stdout
+from typing import List, Dict
+
+from bench import Fixture, BENCH_SEED, percentile
+from c import Database, User, BackupManager, BACKUP_STEP_PAGES, BACKUP_PAUSE
+
+def _book(db: Database, fixture: Fixture, stop: threading.Event, latencies: List[float]):
+    """Book one free seat after another until stopped, recording each call's latency"""
+    user = User(db)
+    with open(os.devnull, 'w') as quiet, redirect_stdout(quiet):
+        while not stop.is_set():
+            theatre_id, movie_id, show_time, seats = fixture.free_seats(1)
+            started = time.perf_counter()
+            user.book_specific_seats(fixture.pick(fixture.users), movie_id, theatre_id, show_time, seats)
+            latencies.append(time.perf_counter() - started)
+
+def _summary(label: str, latencies: List[float], elapsed: float) -> Dict:
+    result = {
+        'phase': label,
+        'bookings': len(latencies),
+        'bookings_per_sec': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'max_ms': round(max(latencies, default=0) * 1000, 1)
+    }
+    print(f"{label:>24}: {result['bookings_per_sec']} bookings/s, p50 {result['p50_ms']} ms, "
+          f"p99 {result['p99_ms']} ms, max {result['max_ms']} ms")
+    return result
+
+def bench(db_path: str, seconds: float, settings: List[tuple], directory: str) -> List[Dict]:
+    db = Database(db_path)
+    fixture = Fixture(db_path, BENCH_SEED)
+    results = []
+    for pages, pause in [(None, None)] + settings:
+        latencies = []
+        stop = threading.Event()
+        booker = threading.Thread(target=_book, args=(db, fixture, stop, latencies))
+        started = time.perf_counter()
+        booker.start()
+        if pages is None:
+            time.sleep(seconds)
+            label = 'no backup'
+        else:
+            manager = BackupManager(db, directory, step_pages=pages, pause=pause, retention=1)
+            manifest = manager.backup()
+            label = f"backup {pages} pages/{pause * 1000:g} ms"
+        stop.set()
+        booker.join()
+        # The booker silences stdout process-wide while it runs, so report only now
+        if pages is not None:
+            size = sum(copied['bytes'] for copied in manifest['files'].values())
+            print(f"{label:>24}: {size >> 20} MiB in {manifest['seconds']:.1f} s "
+                  f"({size / manifest['seconds'] / 2 ** 20:.0f} MiB/s)")
+        results.append(_summary(label, latencies, time.perf_counter() - started))
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['run', 'list', 'verify', 'restore', 'bench'])
+    parser.add_argument('name', nargs='?', help="backup to verify or restore")
+    parser.add_argument('--db', default=os.environ.get('CINE_DB', 'cine.db'))
+    parser.add_argument('--dir', help="backup directory (default: backups/ next to the database)")
+    parser.add_argument('--seconds', type=float, default=20, help="bench: length of the no-backup phase")
+    parser.add_argument('--pages', type=int, nargs='+', default=[BACKUP_STEP_PAGES, -1],
+                        help="bench: pages per step to try; -1 copies everything in one step")
+    parser.add_argument('--pause', type=float, nargs='+', default=[BACKUP_PAUSE, 0],
+                        help="bench: pause after each step, one per --pages value")
+    args = parser.parse_args()
+    if args.command == 'bench':
+        bench(args.db, args.seconds, list(zip(args.pages, args.pause)), args.dir or 'bench-backups')
+        raise SystemExit()
+    manager = BackupManager(Database(args.db), args.dir)
+    if args.command == 'run':
+        print(json.dumps(manager.backup(), indent=2))
+    elif args.command == 'list':
+        for manifest in manager.list():
+            size = sum(copied['bytes'] for copied in manifest['files'].values())
+            print(f"{manifest['name']}  {manifest['created_at']} UTC  {size >> 20} MiB  {', '.join(manifest['files'])}")
+    elif not args.name:
+        parser.error(f"{args.command} needs the name of a backup")
+    elif args.command == 'verify':
+        problems = manager.verify(args.name)
+        print('\n'.join(problems) or f"{args.name}: ok")
+        raise SystemExit(1 if problems else 0)
+    else:
+        manager.restore(args.name)
+        print(f"Restored {args.name} into {args.db}")
@@ -0,0 +1,358 @@
+"""Benchmarks for every public Admin, Manager and User operation, offline.
+
+    python bench.py                                   # 10k, 100k and 1M row datasets
+    python bench.py --sizes 10000 100000 --baseline bench-baseline.json
+    python bench.py --output bench-baseline.json      # record a new baseline
+
+Datasets come from datagen.py with a fixed seed and end date and are cached in --data-dir;
+each size runs against a fresh copy, so writes and deletes never leak between runs. Every
+operation is called until --iterations calls or --seconds have passed (at least
+MIN_CALLS), with arguments that vary per call: different users, theatres, shows and free
+seats. Read-only operations run first, then writes, then deletes. A first untimed call runs
+under tracemalloc for peak Python memory and doubles as warm-up, so tracing never skews the
+timings. Deletes stop early when a small dataset runs out of rows to delete. Writes and
+deletes must return a truthy result: calls that report failure are counted, not timed.
+
+Results (ops/sec, p50/p99 in ms, peak KiB, failures) go to --output as JSON. With --baseline
+every operation is compared by size and name; p50 (given COMPARE_MIN_CALLS samples on both
+sides) or peak memory more than --threshold above the baseline, or more failures than the
+baseline had, is a regression and the exit status is 1.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import sqlite3
+import sys
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from typing import Callable, Dict, List, Optional, Tuple
+
+import datagen
+from c import Database, Admin, Manager, User, SEATS_PER_ROW
+
+BENCH_SEED = 42
+BENCH_END_DATE = datetime.date(2026, 1, 1)    # fixed so cached datasets never change
+DATASET_VERSION = 2        # bump when datagen output changes, so cached datasets are regenerated
+BENCH_PASSWORD = 'password'
+MIN_CALLS = 3
+COMPARE_MIN_CALLS = 10     # fewer samples are too noisy to call a latency regression
+
+class PoolExhausted(Exception):
+    """A delete ran out of rows to delete; small datasets end such operations early"""
+
+class Fixture:
+    """Deterministic argument pools drawn from one dataset"""
+    def __init__(self, db_path: str, seed: int):
+        self.rng = random.Random(seed)
+        conn = sqlite3.connect(db_path)
+        self.theatres = [row[0] for row in conn.execute("SELECT id FROM theatres ORDER BY id")]
+        self.screenings = conn.execute(
+            """SELECT m.id, m.theatre_id, m.title, m.duration, m.cast_line, m.genre, m.show_times, m.ticket_price
+               FROM movies m ORDER BY m.id"""
+        ).fetchall()
+        self.films = conn.execute("SELECT id, title, duration, cast_line, genre FROM films ORDER BY id").fetchall()
+        self.users = [row[0] for row in conn.execute("SELECT id FROM users WHERE loyalty_points > 0 ORDER BY id")]
+        self.bookings = conn.execute("SELECT id, user_id, theatre_id FROM bookings ORDER BY id").fetchall()
+        self.snack_rows = conn.execute("SELECT id, theatre_id FROM snacks WHERE available = 1 ORDER BY id").fetchall()
+        self.snacks: Dict[int, List[int]] = {}
+        for snack_id, theatre_id in self.snack_rows:
+            self.snacks.setdefault(theatre_id, []).append(snack_id)
+        self.food_orders = conn.execute("SELECT id, user_id FROM food_orders ORDER BY id").fetchall()
+        self.reviews = conn.execute("SELECT id, user_id FROM reviews ORDER BY id").fetchall()
+        # Generated seats fill each show from A1, so everything past the booked count is free
+        capacity = dict(conn.execute("SELECT id, total_seats FROM theatres"))
+        booked = {(movie_id, show_time): count for movie_id, show_time, count in conn.execute(
+            "SELECT movie_id, show_time, COUNT(*) FROM seats WHERE is_booked = 1 GROUP BY movie_id, show_time"
+        )}
+        self.shows = []
+        for movie_id, theatre_id, *_, show_times, _ in self.screenings:
+            for show_time in show_times.split(', '):
+                taken = booked.get((movie_id, show_time), 0)
+                if taken < capacity[theatre_id]:
+                    self.shows.append([theatre_id, movie_id, show_time, taken, capacity[theatre_id]])
+        self.rng.shuffle(self.shows)
+        conn.close()
+        self.genres = sorted({genre.strip() for *_, genre, _, _ in self.screenings for genre in (genre or '').split(',')})
+        self.people = sorted({person.strip() for *_, cast_line, _, _, _ in self.screenings
+                              for person in (cast_line or '').split(',')})
+    def pick(self, pool):
+        return pool[self.rng.randrange(len(pool))]
+    def screening(self) -> Tuple[int, int, str]:
+        """(theatre_id, movie_id, show_time) of a random show"""
+        movie_id, theatre_id, *_, show_times, _ = self.pick(self.screenings)
+        return theatre_id, movie_id, self.rng.choice(show_times.split(', '))
+    def free_seats(self, count: int) -> Tuple[int, int, str, List[Tuple[str, int]]]:
+        """Claim the next `count` free seats of some show; never hands out a seat twice"""
+        while self.shows:
+            show = self.shows[-1]
+            theatre_id, movie_id, show_time, taken, capacity = show
+            if taken + count <= capacity:
+                show[3] += count
+                self.shows.insert(0, self.shows.pop())
+                return theatre_id, movie_id, show_time, [
+                    (chr(65 + seat // SEATS_PER_ROW), seat % SEATS_PER_ROW + 1) for seat in range(taken, taken + count)
+                ]
+            self.shows.pop()
+        raise SystemExit("Dataset has no free seats left; use a larger size")
+    def take(self, pool):
+        """Remove and return the last item; for deletes that must not repeat"""
+        if not pool:
+            raise PoolExhausted()
+        return pool.pop()
+
+def operations(db: Database, fixture: Fixture) -> List[Tuple[str, str, Callable[[int], object]]]:
+    """(kind, name, call) for every public operation; kind orders reads before writes before deletes"""
+    admin, manager, user = Admin(db), Manager(db), User(db)
+    theatre = lambda: fixture.pick(fixture.theatres)
+    customer = lambda: fixture.pick(fixture.users)
+    def booking_with_snacks():
+        booking_id, user_id, theatre_id = fixture.pick(fixture.bookings)
+        return user_id, booking_id, fixture.snacks.get(theatre_id, [0])
+    def update_movie(index):
+        movie_id, theatre_id, title, duration, cast_line, genre, show_times, price = fixture.pick(fixture.screenings)
+        return manager.update_movie(movie_id, title, duration, cast_line, genre, show_times, price + index % 2,
+                                    theatre_id)
+    def update_film(index):
+        film_id, title, duration, cast_line, genre = fixture.pick(fixture.films)
+        return admin.update_film(film_id, title, duration, cast_line if index % 2 else f"{cast_line}, Bench Cameo", genre)
+    def book_seats(index, method):
+        theatre_id, movie_id, show_time, seats = fixture.free_seats(2)
+        return method(customer(), movie_id, theatre_id, show_time, seats)
+    def checkout(index):
+        theatre_id, movie_id, show_time, seats = fixture.free_seats(2)
+        snack_lines = [(snack_id, 1) for snack_id in fixture.snacks.get(theatre_id, [])[:2]]
+        return user.checkout(customer(), movie_id, theatre_id, show_time, seats, snack_lines)
+    def book_ticket(index):
+        theatre_id, movie_id, show_time = fixture.screening()
+        return user.book_ticket_with_points(customer(), movie_id, theatre_id, 2, show_time)
+    def order_food(index):
+        user_id, booking_id, snacks = booking_with_snacks()
+        return user.order_food(user_id, booking_id, snacks[0], 1)
+    def order_food_items(index):
+        user_id, booking_id, snacks = booking_with_snacks()
+        return user.order_food_items(user_id, booking_id, [(snack_id, 1 + index % 2) for snack_id in snacks[:3]])
+    def add_review(index):
+        theatre_id, movie_id, _ = fixture.screening()
+        return user.add_review(customer(), 1 + index % 5, f"Bench review {index}", 'movie', theatre_id, movie_id)
+    def delete_review(index):
+        review_id, user_id = fixture.take(fixture.reviews)
+        return user.delete_review(review_id, user_id)
+    def delete_snack(index):
+        snack_id, theatre_id = fixture.take(fixture.snack_rows)
+        return manager.delete_snack(snack_id, theatre_id)
+    def delete_movie(index):
+        movie_id, theatre_id, *_ = fixture.take(fixture.screenings)
+        return manager.delete_movie(movie_id, theatre_id)
+    return [
+        ('read', 'Admin.login', lambda index: admin.login('admin', BENCH_PASSWORD)),
+        ('read', 'Admin.view_theatres', lambda index: admin.view_theatres()),
+        ('read', 'Admin.view_users', lambda index: admin.view_users()),
+        ('read', 'Admin.view_all_reviews', lambda index: admin.view_all_reviews()),
+        ('read', 'Admin.iter_users', lambda index: sum(1 for _ in admin.iter_users())),
+        ('read', 'Admin.iter_all_reviews', lambda index: sum(1 for _ in admin.iter_all_reviews())),
+        ('read', 'Manager.login', lambda index: manager.login(f"manager{theatre()}", BENCH_PASSWORD)),
+        ('read', 'Manager.view_movies', lambda index: manager.view_movies(theatre())),
+        ('read', 'Manager.view_snacks', lambda index: manager.view_snacks(theatre())),
+        ('read', 'Manager.view_bookings', lambda index: manager.view_bookings(theatre())),
+        ('read', 'Manager.view_reviews', lambda index: manager.view_reviews(theatre())),
+        ('read', 'User.login', lambda index: user.login(f"user{customer()}", BENCH_PASSWORD)),
+        ('read', 'User.get_available_theatres', lambda index: user.get_available_theatres()),
+        ('read', 'User.get_movies_by_theatre', lambda index: user.get_movies_by_theatre(theatre())),
+        ('read', 'User.get_available_snacks', lambda index: user.get_available_snacks(theatre())),
+        ('read', 'User.get_genres', lambda index: user.get_genres()),
+        ('read', 'User.get_movies_by_genre', lambda index: user.get_movies_by_genre(fixture.pick(fixture.genres))),
+        ('read', 'User.get_movies_by_person', lambda index: user.get_movies_by_person(fixture.pick(fixture.people))),
+        ('read', 'User.get_seat_arrangement', lambda index: user.get_seat_arrangement(*fixture.screening())),
+        ('read', 'User.get_similar_movies', lambda index: user.get_similar_movies(fixture.screening()[1])),
+        ('read', 'User.get_recommendations', lambda index: user.get_recommendations(customer())),
+        ('read', 'User.get_user_bookings', lambda index: user.get_user_bookings(customer())),
+        ('read', 'User.get_booking', lambda index: user.get_booking(*fixture.pick(fixture.bookings)[1::-1])),
+        ('read', 'User.get_user_food_orders', lambda index: user.get_user_food_orders(customer())),
+        ('read', 'User.get_food_order', lambda index: user.get_food_order(*fixture.pick(fixture.food_orders)[::-1])),
+        ('read', 'User.get_user_reviews', lambda index: user.get_user_reviews(customer())),
+        ('read', 'User.get_all_reviews', lambda index: user.get_all_reviews()),
+        ('read', 'User.get_activity_summary', lambda index: user.get_activity_summary(customer())),
+        ('read', 'User.get_loyalty_points', lambda index: user.get_loyalty_points(customer())),
+        ('write', 'Admin.signup', lambda index: admin.signup(f"benchadmin{index}", BENCH_PASSWORD,
+                                                             f"benchadmin{index}@example.com")),
+        ('write', 'Admin.add_theatre', lambda index: admin.add_theatre(f"Bench Theatre {index}", 'Bench', 200)),
+        ('write', 'Admin.update_film', update_film),
+        ('write', 'Manager.signup', lambda index: manager.signup(f"benchmanager{index}", BENCH_PASSWORD,
+                                                                 f"benchmanager{index}@example.com", theatre())),
+        ('write', 'Manager.add_movie', lambda index: manager.add_movie(
+            f"Bench Feature {index}", 100 + index % 60, 'Bench Actor, Bench Support', 'Drama',
+            '10:00AM, 07:00PM', 120.0, theatre())),
+        ('write', 'Manager.update_movie', update_movie),
+        ('write', 'Manager.add_snack', lambda index: manager.add_snack(f"Bench Snack {index}", 4.0, theatre())),
+        ('write', 'User.signup', lambda index: user.signup(f"benchuser{index}", BENCH_PASSWORD,
+                                                           f"benchuser{index}@example.com")),
+        ('write', 'User.book_ticket_with_points', book_ticket),
+        ('write', 'User.book_specific_seats', lambda index: book_seats(index, user.book_specific_seats)),
+        ('write', 'User.book_specific_seats_with_points',
+         lambda index: book_seats(index, user.book_specific_seats_with_points)),
+        ('write', 'User.checkout', checkout),
+        ('write', 'User.order_food', order_food),
+        ('write', 'User.order_food_items', order_food_items),
+        ('write', 'User.add_review', add_review),
+        ('write', 'User.redeem_points', lambda index: user.redeem_points(customer(), 1)),
+        ('delete', 'User.delete_review', delete_review),
+        ('delete', 'Manager.delete_snack', delete_snack),
+        ('delete', 'Manager.delete_movie', delete_movie),
+        ('delete', 'Admin.delete_theatre', lambda index: admin.delete_theatre(fixture.take(fixture.theatres))),
+    ]
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+def measure(call: Callable[[int], object], iterations: int, seconds: float, quiet,
+            checked: bool = False) -> Optional[Dict]:
+    """One traced call for peak memory (doubling as warm-up), then time calls until the count or
+    time budget runs out. With checked, a call returning a falsy result counts as a failure and
+    its time is left out. None when the dataset cannot support a single timed call."""
+    failures = 0
+    tracemalloc.start()
+    try:
+        with redirect_stdout(quiet):
+            result = call(0)
+        peak = tracemalloc.get_traced_memory()[1]
+    except PoolExhausted:
+        return None
+    finally:
+        tracemalloc.stop()
+    if checked and not result:
+        failures += 1
+    latencies = []
+    attempts = 0
+    deadline = time.perf_counter() + seconds
+    while attempts < iterations and (attempts < MIN_CALLS or time.perf_counter() < deadline):
+        attempts += 1
+        started = time.perf_counter()
+        try:
+            with redirect_stdout(quiet):
+                result = call(attempts)
+        except PoolExhausted:
+            break
+        elapsed = time.perf_counter() - started
+        if checked and not result:
+            failures += 1
+        else:
+            latencies.append(elapsed)
+    if not latencies and not failures:
+        return None
+    return {
+        'calls': len(latencies),
+        'failures': failures,
+        'ops_per_sec': round(len(latencies) / sum(latencies), 1) if latencies else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+def dataset(data_dir: str, rows: int) -> str:
+    """Path of the cached generated dataset for `rows`, generating it on first use"""
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"cine-{rows}-seed{BENCH_SEED}-v{DATASET_VERSION}.db")
+    if not os.path.exists(path):
+        print(f"Generating {rows}-row dataset...", flush=True)
+        partial = path + '.partial'
+        for leftover in (partial, partial + '-wal', partial + '-shm'):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        datagen.generate(partial, rows, BENCH_SEED, BENCH_END_DATE, fast=True)
+        # Fold the WAL in so a plain file copy is the whole database
+        conn = sqlite3.connect(partial)
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.execute("PRAGMA journal_mode = DELETE")
+        conn.close()
+        os.replace(partial, path)
+    return path
+
+def run(sizes: List[int], data_dir: str, iterations: int, seconds: float, only: Optional[str]) -> Dict:
+    results = []
+    with open(os.devnull, 'w') as quiet:
+        for rows in sizes:
+            work = os.path.join(data_dir, 'bench-work.db')
+            for leftover in (work, work + '-wal', work + '-shm'):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+            shutil.copyfile(dataset(data_dir, rows), work)
+            db = Database(work)
+            fixture = Fixture(work, BENCH_SEED)
+            for kind, name, call in operations(db, fixture):
+                if only and only not in name:
+                    continue
+                measured = measure(call, iterations, seconds, quiet, checked=kind != 'read')
+                if measured is None:
+                    print(f"{rows:>9} {name:<36} skipped, dataset too small", flush=True)
+                    continue
+                result = dict(size=rows, operation=name, kind=kind, **measured)
+                results.append(result)
+                print(f"{rows:>9} {name:<36} {result['ops_per_sec']:>10.1f} ops/s  p50 {result['p50_ms']:>9.3f} ms  "
+                      f"p99 {result['p99_ms']:>9.3f} ms  peak {result['peak_kib']:>9.1f} KiB"
+                      + (f"  FAILED {result['failures']}" if result['failures'] else ""), flush=True)
+    return {
+        'meta': {
+            'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'machine': platform.machine(),
+            'seed': BENCH_SEED,
+            'iterations': iterations,
+            'seconds': seconds,
+            'max_rss_kib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        },
+        'results': results,
+    }
+
+def compare(report: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Regressions against the baseline: p50 latency or peak memory grew by more than threshold,
+    or calls failed that did not before"""
+    previous = {(result['size'], result['operation']): result for result in baseline['results']}
+    regressions = []
+    for result in report['results']:
+        before = previous.get((result['size'], result['operation']))
+        if not before:
+            continue
+        if result.get('failures', 0) > before.get('failures', 0):
+            regressions.append(f"{result['size']} {result['operation']}: failures "
+                               f"{before.get('failures', 0)} -> {result['failures']}")
+        for metric in ('p50_ms', 'peak_kib'):
+            if metric == 'p50_ms' and min(result['calls'], before['calls']) < COMPARE_MIN_CALLS:
+                continue
+            # Ignore sub-resolution noise on operations that are effectively free
+            floor = 0.05 if metric == 'p50_ms' else 16
+            if result[metric] > max(before[metric], floor) * (1 + threshold):
+                regressions.append(f"{result['size']} {result['operation']}: {metric} "
+                                   f"{before[metric]} -> {result[metric]}")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000],
+                        help="approximate dataset rows, see datagen.py")
+    parser.add_argument('--data-dir', default='.bench', help="cache for generated datasets")
+    parser.add_argument('--iterations', type=int, default=200, help="maximum timed calls per operation")
+    parser.add_argument('--seconds', type=float, default=1.0, help="time budget per operation")
+    parser.add_argument('--only', help="run operations whose name contains this text")
+    parser.add_argument('--output', default='bench-results.json')
+    parser.add_argument('--baseline', help="earlier --output to compare against")
+    parser.add_argument('--threshold', type=float, default=0.25, help="allowed slowdown before flagging")
+    args = parser.parse_args()
+    report = run(args.sizes, args.data_dir, args.iterations, args.seconds, args.only)
+    with open(args.output, 'w') as output:
+        json.dump(report, output, indent=2)
+    print(f"Results written to {args.output}")
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            regressions = compare(report, json.load(baseline), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        print(f"{len(regressions)} regressions against {args.baseline}")
+        sys.exit(1 if regressions else 0)
@@ -1,17 +1,588 @@
 import sqlite3
+import csv
 import hashlib
 import datetime
-from typing import Optional, List, Dict, Any
+import bisect
+import heapq
+import inspect
+import io
+import json
+import logging
+import math
+import mmap
+import os
+import re
+import sys
+import threading
+import time
+import weakref
+from array import array
+from collections import OrderedDict, defaultdict, deque
+from contextvars import ContextVar
+from operator import itemgetter
+from typing import Optional, List, Dict, Any, Iterator, Tuple
+from urllib.parse import quote
+
+# Loyalty rules: 1 point per $10 spent (scaled by tier multiplier), 100 points = $10 off
+POINTS_EARN_UNIT = 10
+POINTS_REDEEM_BLOCK = 100
+POINTS_REDEEM_VALUE = 10
+LOYALTY_WINDOW_MONTHS = 12
+# (name, trailing-12-month spend threshold, earn multiplier)
+DEFAULT_LOYALTY_TIERS = [
+    ('Bronze', 0, 1.0),
+    ('Silver', 500, 1.25),
+    ('Gold', 1500, 1.5),
+    ('Platinum', 5000, 2.0),
+]
+ACTIVITY_CACHE_SIZE = 1024
+FILM_CACHE_SIZE = 4096
+RECENT_ACTIVITY_LIMIT = 5
+# Demand forecasting: features a show's occupancy is learned by, and shrinkage strength
+FORECAST_FEATURES = ['movie', 'genre', 'weekday', 'slot', 'theatre']
+FORECAST_SHRINKAGE = 5.0
+# Recommendations: list length per user, neighbours kept per movie, history cap per user
+RECOMMENDATION_TOP_K = 10
+RECOMMENDATION_NEIGHBOURS = 50
+RECOMMENDATION_HISTORY_LIMIT = 50
+RECOMMENDATION_BATCH_SIZE = 10000
+# Seat maps: layout width, and how many seat events are kept for live-map resume
+SEATS_PER_ROW = 10
+SEAT_EVENT_RETENTION = 100000
+# Streaming exports: rows encoded per chunk written to a file or response
+EXPORT_CHUNK_ROWS = 1000
+# Query tracing: histogram bucket bounds (ms), slow-statement threshold, slow log length
+QUERY_BUCKETS_MS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500]
+SLOW_QUERY_MS = 100
+SLOW_QUERY_LOG_SIZE = 200
+STATEMENT_CACHE_SIZE = 4096
+PROCESS_STARTED = time.time()
+# Deletes: history rows removed per purge transaction, pause between batches so bookings get
+# the write lock, and how often the purge worker wakes up to check for work
+PURGE_BATCH_SIZE = 2000
+PURGE_PAUSE = 0.005
+PURGE_POLL_INTERVAL = 5
+# Soft-deleted theatres, screenings and snacks stay (hidden) for reporting this long, and are
+# only collected during these local hours [start, end)
+SOFT_DELETE_RETENTION_DAYS = 30
+GC_HOURS = (2, 5)
+# Bookings older than this many days move, with their seats and food orders, to the archive
+# database in batches of this many bookings; values are the column tying a row to its booking
+ARCHIVE_AFTER_DAYS = 90
+ARCHIVE_BATCH_SIZE = 2000
+ARCHIVE_TABLES = {'bookings': 'id', 'seats': 'booking_id', 'food_orders': 'booking_id'}
+# Online backups: pages copied per step and pause between steps so bookings keep the disk and
+# CPU, hours between scheduled backups, how often the scheduler checks, and backups kept
+BACKUP_STEP_PAGES = 256
+BACKUP_PAUSE = 0.01
+BACKUP_INTERVAL_HOURS = 24
+BACKUP_POLL_INTERVAL = 60
+BACKUP_RETENTION = 7
+# Read replica for reports: least seconds between refreshes, the most of the time a refresh may
+# spend copying (a copy slows bookings as much as a backup does, so large databases are refreshed
+# less often), and the most age a replica may reach; reports go back to the primary database
+# sooner, once a replica is two refresh intervals old and so nobody is refreshing it
+REPLICA_REFRESH_INTERVAL = 60
+REPLICA_COPY_SHARE = 0.1
+REPLICA_MAX_LAG = 3600
+# Child (table, column) foreign keys whose rows are deleted along with their parent; tables
+# in parent-before-child order
+CASCADE_TABLES = ['managers', 'screenings', 'snacks', 'bookings', 'food_orders', 'reviews', 'seats']
+CASCADE_KEYS = {
+    ('managers', 'theatre_id'), ('screenings', 'theatre_id'), ('snacks', 'theatre_id'),
+    ('bookings', 'user_id'), ('bookings', 'movie_id'), ('bookings', 'theatre_id'),
+    ('food_orders', 'user_id'), ('food_orders', 'booking_id'), ('food_orders', 'snack_id'),
+    ('reviews', 'user_id'), ('reviews', 'movie_id'), ('reviews', 'theatre_id'),
+    ('seats', 'theatre_id'), ('seats', 'movie_id'), ('seats', 'booking_id'),
+}
+# Metrics: latency bucket bounds (seconds), and operations whose truthy result counts as success
+METRIC_BUCKETS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+OUTCOME_OPERATIONS = {
+    'login', 'signup', 'book_ticket_with_points', 'book_specific_seats', 'book_specific_seats_with_points',
+    'checkout', 'order_food', 'order_food_items', 'add_review', 'delete_review', 'redeem_points'
+}
+
+class LRUCache:
+    """Small thread-safe LRU map used for in-process read caches"""
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+    def __len__(self):
+        return len(self._data)
+
+class QueryTracer:
+    """Per-statement latency histograms, a slow-query log and connection counters.
+    Off by default and switchable at runtime through `enabled`. While off, Database hands
+    out plain sqlite3 connections, so the only cost is one attribute check per connection.
+
+    A statement's latency runs from execute to its last fetch, so lazily stepped SELECTs
+    are charged in full. Statements are keyed by their text with literals stripped, under
+    the public operation (e.g. 'User.checkout') that issued them."""
+    operation: ContextVar = ContextVar('cine_query_operation', default='')
+    LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+    PLACEHOLDER_LISTS = re.compile(r"\?(?:\s*,\s*\?)+")
+    def __init__(self, enabled: bool = False, slow_ms: float = SLOW_QUERY_MS):
+        self.enabled = enabled
+        self.slow_ms = slow_ms
+        self.logger = logging.getLogger('cine.sql')
+        self.slow_queries = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+        self._statements = LRUCache(STATEMENT_CACHE_SIZE)
+        self._lock = threading.Lock()
+        self.reset()
+    def reset(self):
+        with self._lock:
+            self.counters = dict.fromkeys(
+                ['connections', 'statements', 'rows', 'transactions', 'rollbacks', 'errors', 'busy_errors',
+                 'slow_statements'], 0
+            )
+            # (operation, statement) -> [count, total seconds, max seconds, bucket counts]
+            self.histograms = {}
+            self.slow_queries.clear()
+    def count(self, counter: str, amount: int = 1):
+        with self._lock:
+            self.counters[counter] += amount
+    def statement(self, sql: str) -> str:
+        """Statement text with whitespace collapsed, literals and IN-lists reduced to '?'"""
+        normalized = self._statements.get(sql)
+        if normalized is None:
+            normalized = self.PLACEHOLDER_LISTS.sub('?, ...', self.LITERALS.sub('?', ' '.join(sql.split())))
+            self._statements.put(sql, normalized)
+        return normalized
+    @staticmethod
+    def redact(parameters) -> Any:
+        """Bound parameters reduced to their types; values never reach the log"""
+        if isinstance(parameters, dict):
+            return {name: type(value).__name__ for name, value in parameters.items()}
+        return [type(value).__name__ for value in parameters]
+    def record(self, sql: str, parameters, seconds: float, rows: int, error: Exception = None):
+        operation = self.operation.get()
+        statement = self.statement(sql)
+        milliseconds = seconds * 1000
+        bucket = next((index for index, bound in enumerate(QUERY_BUCKETS_MS) if milliseconds <= bound),
+                      len(QUERY_BUCKETS_MS))
+        slow = milliseconds >= self.slow_ms
+        with self._lock:
+            histogram = self.histograms.get((operation, statement))
+            if histogram is None:
+                histogram = self.histograms[(operation, statement)] = [0, 0.0, 0.0, [0] * (len(QUERY_BUCKETS_MS) + 1)]
+            histogram[0] += 1
+            histogram[1] += seconds
+            histogram[2] = max(histogram[2], seconds)
+            histogram[3][bucket] += 1
+            self.counters['statements'] += 1
+            self.counters['rows'] += rows
+            if error is not None:
+                self.counters['errors'] += 1
+                if isinstance(error, sqlite3.OperationalError) and ('locked' in str(error) or 'busy' in str(error)):
+                    self.counters['busy_errors'] += 1
+            if slow:
+                self.counters['slow_statements'] += 1
+        if slow:
+            entry = {
+                'at': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='milliseconds'),
+                'operation': operation, 'statement': statement, 'parameters': self.redact(parameters),
+                'ms': round(milliseconds, 3), 'rows': rows, 'error': str(error) if error else None
+            }
+            self.slow_queries.append(entry)
+            self.logger.warning("slow query %.1f ms [%s] %s %s", milliseconds, operation or '-', statement,
+                                entry['parameters'])
+    @staticmethod
+    def _quantile(buckets: List[int], count: int, fraction: float) -> Optional[float]:
+        """Upper bound of the bucket holding the quantile; None past the last bound"""
+        seen = 0
+        for index, bucket_count in enumerate(buckets):
+            seen += bucket_count
+            if seen >= fraction * count:
+                return QUERY_BUCKETS_MS[index] if index < len(QUERY_BUCKETS_MS) else None
+        return None
+    def snapshot(self) -> Dict:
+        """Counters, per-statement histograms (slowest total first) and the recent slow log"""
+        with self._lock:
+            counters = dict(self.counters)
+            histograms = [(key, count, total, peak, list(buckets))
+                          for key, (count, total, peak, buckets) in self.histograms.items()]
+            slow_queries = list(self.slow_queries)
+        histograms.sort(key=lambda item: item[2], reverse=True)
+        return {
+            'enabled': self.enabled,
+            'slow_ms': self.slow_ms,
+            'counters': counters,
+            'bucket_bounds_ms': QUERY_BUCKETS_MS,
+            'statements': [
+                {'operation': operation, 'statement': statement, 'count': count,
+                 'total_ms': round(total * 1000, 3), 'mean_ms': round(total * 1000 / count, 3),
+                 'max_ms': round(peak * 1000, 3), 'p50_ms': self._quantile(buckets, count, 0.50),
+                 'p99_ms': self._quantile(buckets, count, 0.99), 'buckets': buckets}
+                for (operation, statement), count, total, peak, buckets in histograms
+            ],
+            'slow_queries': slow_queries,
+        }
+
+class TracedCursor(sqlite3.Cursor):
+    """Cursor that reports each statement, execute through last fetch, to its QueryTracer"""
+    def __init__(self, connection):
+        super().__init__(connection)
+        self.tracer = connection.tracer
+        self._pending = None
+    def _finish(self):
+        if self._pending is not None:
+            sql, parameters, seconds, rows = self._pending
+            self._pending = None
+            self.tracer.record(sql, parameters, seconds, rows)
+    def _run(self, run, sql, parameters):
+        self._finish()
+        if not self.tracer.enabled:
+            return run(sql, parameters)
+        started = time.perf_counter()
+        try:
+            run(sql, parameters)
+        except sqlite3.Error as error:
+            self.tracer.record(sql, parameters, time.perf_counter() - started, 0, error)
+            raise
+        self._pending = [sql, parameters, time.perf_counter() - started, 0]
+        return self
+    def execute(self, sql, parameters=()):
+        return self._run(super().execute, sql, parameters)
+    def executemany(self, sql, seq_of_parameters):
+        # Parameter rows can be a generator; record the statement without them
+        self._finish()
+        return self._run(lambda sql, _: super(TracedCursor, self).executemany(sql, seq_of_parameters), sql, ())
+    def _fetched(self, started: float, rows: int):
+        if self._pending is not None:
+            self._pending[2] += time.perf_counter() - started
+            self._pending[3] += rows
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(started, row is not None)
+        return row
+    def fetchmany(self, size: int = None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(started, len(rows))
+        return rows
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(started, len(rows))
+        return rows
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(started, 0)
+            raise
+        self._fetched(started, 1)
+        return row
+    def close(self):
+        self._finish()
+        super().close()
+
+class TracedConnection(sqlite3.Connection):
+    """Connection whose cursors are traced; counts commits and rollbacks, explicit or on close"""
+    tracer: QueryTracer = None
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cursors = weakref.WeakSet()
+    def cursor(self, factory=TracedCursor):
+        cursor = super().cursor(factory)
+        self._cursors.add(cursor)
+        return cursor
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+    def _flush(self):
+        for cursor in list(self._cursors):
+            if isinstance(cursor, TracedCursor):
+                cursor._finish()
+    def commit(self):
+        self._flush()
+        if self.tracer.enabled and self.in_transaction:
+            self.tracer.count('transactions')
+        super().commit()
+    def rollback(self):
+        self._flush()
+        if self.tracer.enabled and self.in_transaction:
+            self.tracer.count('rollbacks')
+        super().rollback()
+    def close(self):
+        self._flush()
+        # Closing mid-transaction rolls it back, which is how failed writes usually end
+        if self.tracer.enabled and self.in_transaction:
+            self.tracer.count('rollbacks')
+        super().close()
+
+class Metric:
+    """One labelled counter, gauge or histogram family. Values are set directly, or read at
+    scrape time from `collect`, which returns (label values, value) pairs."""
+    def __init__(self, name: str, kind: str, documentation: str, label_names=(), buckets=None, collect=None):
+        self.name = name
+        self.kind = kind
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = buckets
+        self.collect = collect
+        self._values = {}
+        self._lock = threading.Lock()
+    def inc(self, amount: float = 1, labels: tuple = ()):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+    def set(self, value: float, labels: tuple = ()):
+        with self._lock:
+            self._values[labels] = value
+    def observe(self, value: float, labels: tuple = ()):
+        """Histogram sample: per-bucket counts (made cumulative on render), sum and count"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+    @staticmethod
+    def _labels(names: tuple, values: tuple, extra: str = '') -> str:
+        pairs = [f'{name}="{MetricsRegistry.escape(value)}"' for name, value in zip(names, values)]
+        if extra:
+            pairs.append(extra)
+        return '{' + ','.join(pairs) + '}' if pairs else ''
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        if self.collect:
+            values = list(self.collect())
+        else:
+            with self._lock:
+                values = [(labels, [list(value[0]), value[1], value[2]] if self.kind == 'histogram' else value)
+                          for labels, value in self._values.items()]
+        for labels, value in values:
+            if self.kind != 'histogram':
+                lines.append(f"{self.name}{self._labels(self.label_names, labels)} {float(value)!r}")
+                continue
+            counts, total, count = value
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + [math.inf], counts):
+                cumulative += bucket_count
+                bound_label = 'le="+Inf"' if bound == math.inf else f'le="{float(bound)!r}"'
+                lines.append(f"{self.name}_bucket{self._labels(self.label_names, labels, bound_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(self.label_names, labels)} {total!r}")
+            lines.append(f"{self.name}_count{self._labels(self.label_names, labels)} {count}")
+        return lines
+
+class MetricsRegistry:
+    """Counters, gauges and histograms rendered in the Prometheus text format"""
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+    def _add(self, metric: Metric) -> Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+    def counter(self, name: str, documentation: str, label_names=(), collect=None) -> Metric:
+        return self._add(Metric(name, 'counter', documentation, label_names, collect=collect))
+    def gauge(self, name: str, documentation: str, label_names=(), collect=None) -> Metric:
+        return self._add(Metric(name, 'gauge', documentation, label_names, collect=collect))
+    def histogram(self, name: str, documentation: str, label_names=(), buckets=METRIC_BUCKETS) -> Metric:
+        return self._add(Metric(name, 'histogram', documentation, label_names, buckets=list(buckets)))
+    @staticmethod
+    def escape(value) -> str:
+        return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+    def render(self) -> str:
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+    def add_process_metrics(self):
+        """Standard process_* series; memory and descriptors need /proc, as on Linux"""
+        self.counter('process_cpu_seconds_total', "User and system CPU time spent in seconds.",
+                     collect=lambda: [((), sum(os.times()[:2]))])
+        self.gauge('process_threads', "Number of Python threads.", collect=lambda: [((), threading.active_count())])
+        self.gauge('process_start_time_seconds', "Start time of the process since unix epoch in seconds.",
+                   collect=lambda: [((), PROCESS_STARTED)])
+        if not os.path.exists('/proc/self/statm'):
+            return
+        page_size = os.sysconf('SC_PAGE_SIZE')
+        def resident_bytes():
+            with open('/proc/self/statm') as statm:
+                return int(statm.read().split()[1]) * page_size
+        self.gauge('process_resident_memory_bytes', "Resident memory size in bytes.",
+                   collect=lambda: [((), resident_bytes())])
+        self.gauge('process_open_fds', "Number of open file descriptors.",
+                   collect=lambda: [((), len(os.listdir('/proc/self/fd')))])
 
 class Database:
-    def __init__(self, db_name: str = "cine.db"):
+    def __init__(self, db_name: str = "cine.db", archive_name: str = None, replica_name: str = None):
         self.db_name = db_name
+        # Finished shows' bookings, seats and food orders, moved there by HistoryArchiver
+        self.archive_name = archive_name or f"{os.path.splitext(db_name)[0]}-archive.db"
+        # Read-only snapshot of both for reports, kept recent by ReadReplica
+        self.replica_name = replica_name or f"{os.path.splitext(db_name)[0]}-replica.db"
+        self.replica_archive_name = f"{os.path.splitext(self.replica_name)[0]}-archive.db"
+        # Clear to send replica=True reads to the primary database, e.g. where writes must show at once
+        self.replica_reads = True
+        self._history_tables = None
+        # Per-user dashboard data (summary, tickets, food orders), keyed by user id
+        self.activity_cache = LRUCache(ACTIVITY_CACHE_SIZE)
+        # Film details keyed by film id, shared by every screening of the film
+        self.film_cache = LRUCache(FILM_CACHE_SIZE)
+        # Statement timings and counters; flip tracer.enabled to start or stop recording
+        self.tracer = QueryTracer()
+        self.init_metrics()
         self.init_database()
-    def get_connection(self):
-        return sqlite3.connect(self.db_name)
+    def get_connection(self, history: bool = False, replica: bool = False, check_same_thread: bool = True):
+        """history=True attaches the archive read-only, for reads of past activity (user history,
+        reports) that take their bookings, seats and food_orders from history_tables().
+        replica=True reads the read replica instead while replica_age() finds it kept fresh, for
+        reports that may trail checkout by replica_lag() seconds. Such a connection is read-only."""
+        replicated = replica and self.replica_reads and self.replica_age() is not None
+        db_name, archive_name = (self.replica_name, self.replica_archive_name) if replicated \
+            else (self.db_name, self.archive_name)
+        archived = history and os.path.exists(archive_name)
+        if replicated:
+            # Replica files are replaced, never written in place, so no locking is needed
+            db_name = f"file:{quote(os.path.abspath(db_name))}?immutable=1"
+        if self.tracer.enabled:
+            conn = sqlite3.connect(db_name, factory=TracedConnection, uri=replicated or archived,
+                                   check_same_thread=check_same_thread)
+            conn.tracer = self.tracer
+            self.tracer.count('connections')
+        else:
+            conn = sqlite3.connect(db_name, uri=replicated or archived, check_same_thread=check_same_thread)
+        # With WAL, NORMAL syncs at checkpoints instead of every commit; a commit can only
+        # be lost to an OS crash or power cut, never to an application crash
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA foreign_keys = ON")
+        if archived:
+            conn.execute("ATTACH DATABASE ? AS archive",
+                         (f"file:{quote(os.path.abspath(archive_name))}?{'immutable=1' if replicated else 'mode=ro'}",))
+        return conn
+    def replica_age(self) -> Optional[float]:
+        """Seconds since the read replica was last replaced; None without a usable replica.
+        A replica is usable while under twice the refresh interval the refresher last recorded
+        (its 'replica' 'interval' watermark) old, so it is dropped soon after refreshes stop."""
+        try:
+            age = time.time() - os.stat(self.replica_name).st_mtime
+        except OSError:
+            return None
+        conn = self.get_connection()
+        try:
+            interval = self.get_watermark(conn.cursor(), 'replica', 'interval')
+        finally:
+            conn.close()
+        return age if age < min(2 * interval, REPLICA_MAX_LAG) else None
+    def replica_lag(self) -> Optional[float]:
+        """Seconds of commits the read replica may be missing: the age of its snapshot.
+        None while reports read the primary database."""
+        if self.replica_age() is None:
+            return None
+        conn = self.get_connection(replica=True)
+        try:
+            snapshot = self.get_watermark(conn.cursor(), 'replica', 'snapshot')
+        finally:
+            conn.close()
+        return max(0.0, time.time() - snapshot)
+    def history_tables(self, conn) -> Dict[str, str]:
+        """FROM-clause sources for bookings, seats and food_orders on a history connection: each
+        hot table unioned with its archive copy, or the plain table while nothing is archived.
+        Archive rows count only up to the archiver's watermark, so a batch whose hot rows were
+        not deleted yet is never seen twice; columns the archive lacks read as NULL. Subqueries
+        rather than TEMP views, which would cost every connection a schema reload."""
+        attached = any(row[1] == 'archive' for row in conn.execute("PRAGMA database_list"))
+        if not attached:
+            return {table: table for table in ARCHIVE_TABLES}
+        if self._history_tables is None:
+            sources = {}
+            for table, key in ARCHIVE_TABLES.items():
+                columns = [row[1] for row in conn.execute(f"PRAGMA main.table_info({table})")]
+                archived = {row[1] for row in conn.execute(f"PRAGMA archive.table_info({table})")}
+                if not archived:
+                    # The archiver has not created its tables yet
+                    return {table: table for table in ARCHIVE_TABLES}
+                sources[table] = f"""(SELECT {', '.join(columns)} FROM main.{table}
+                    UNION ALL
+                    SELECT {', '.join(column if column in archived else f'NULL AS {column}' for column in columns)}
+                    FROM archive.{table}
+                    WHERE {key} <= (SELECT last_id FROM main.job_watermarks
+                                    WHERE job_name = 'archiver' AND source = 'bookings'))"""
+            self._history_tables = sources
+        return self._history_tables
+    def get_write_connection(self, foreign_keys: bool = True, archive: bool = False):
+        """Connection already holding the write lock, for transactions that read before writing.
+        Under WAL a deferred transaction that read first fails at once when another process
+        committed in between; taking the lock up front makes it wait its turn instead.
+        foreign_keys=False skips cascades, for deletes that leave history to HistoryPurger.
+        archive=True attaches the archive writable when there is one, for deletes from history."""
+        conn = self.get_connection()
+        if not foreign_keys:
+            conn.execute("PRAGMA foreign_keys = OFF")
+        if archive and os.path.exists(self.archive_name):
+            conn.execute("ATTACH DATABASE ? AS archive", (self.archive_name,))
+        started = time.perf_counter()
+        conn.execute("BEGIN IMMEDIATE")
+        self.lock_wait_seconds.observe(time.perf_counter() - started)
+        return conn
+    def init_metrics(self):
+        """Operation latency and outcomes, write-lock waits, seats sold, cache and tracer
+        counters, and process stats. Further caches can be listed in `caches` to be exported."""
+        self.metrics = MetricsRegistry()
+        self.operation_seconds = self.metrics.histogram(
+            'cine_operation_seconds', "Latency of public Admin, Manager and User operations.", ['operation']
+        )
+        self.operation_outcomes = self.metrics.counter(
+            'cine_operation_outcomes_total', "Logins, bookings, food orders and other writes by outcome.",
+            ['operation', 'outcome']
+        )
+        self.lock_wait_seconds = self.metrics.histogram(
+            'cine_lock_wait_seconds', "Time spent waiting for the database write lock."
+        )
+        self.seats_booked = self.metrics.counter('cine_seats_booked_total', "Seats sold, by theatre.", ['theatre_id'])
+        self.caches = {'activity': self.activity_cache, 'film': self.film_cache}
+        cache_stat = lambda read: lambda: [((name,), read(cache)) for name, cache in self.caches.items()]
+        self.metrics.counter('cine_cache_hits_total', "In-process cache hits.", ['cache'],
+                             collect=cache_stat(lambda cache: cache.hits))
+        self.metrics.counter('cine_cache_misses_total', "In-process cache misses.", ['cache'],
+                             collect=cache_stat(lambda cache: cache.misses))
+        self.metrics.gauge('cine_cache_entries', "Entries held by each in-process cache.", ['cache'],
+                           collect=cache_stat(len))
+        self.metrics.counter('cine_sql_events_total', "Query tracer counters; zero while tracing is off.", ['event'],
+                             collect=lambda: [((event,), count) for event, count in self.tracer.counters.items()])
+        self.metrics.add_process_metrics()
     def init_database(self):
         conn = self.get_connection()
         cursor = conn.cursor()
+        # WAL lets readers run alongside a writer when several processes share the file
+        cursor.execute("PRAGMA journal_mode = WAL")
+        # Migrations drop and rewrite tables; cascades must not fire while they do
+        cursor.execute("PRAGMA foreign_keys = OFF")
+        # Hold the write lock while inspecting the schema so concurrent starts migrate once
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        existing_tables = {row[0] for row in cursor.fetchall()}
         # Users table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS users (
@@ -41,7 +612,8 @@ class Database:
                 name TEXT NOT NULL,
                 location TEXT NOT NULL,
                 total_seats INTEGER NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                deleted_at TIMESTAMP
             )
         ''')
         # Managers table
@@ -53,24 +625,59 @@ class Database:
                 email TEXT UNIQUE NOT NULL,
                 theatre_id INTEGER,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (theatre_id) REFERENCES theatres (id)
+                FOREIGN KEY (theatre_id) REFERENCES theatres (id) ON DELETE CASCADE
             )
         ''')
-        # Movies table
+        # Films table: one row per film, shared by every theatre that screens it
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS movies (
+            CREATE TABLE IF NOT EXISTS films (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 title TEXT NOT NULL,
+                title_key TEXT NOT NULL,
                 duration INTEGER NOT NULL,
                 cast_line TEXT,
                 genre TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE (title_key, duration)
+            )
+        ''')
+        films_migrated = 'movies' in existing_tables
+        if films_migrated:
+            # Pre-films schema: movies was a table of per-theatre copies
+            FilmCatalog.migrate_rows(cursor)
+        # Screenings table: a film's run at one theatre (ids are the historical movie ids)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS screenings (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                film_id INTEGER NOT NULL,
                 theatre_id INTEGER,
                 show_times TEXT,
                 ticket_price REAL DEFAULT 0,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (theatre_id) REFERENCES theatres (id)
+                deleted_at TIMESTAMP,
+                FOREIGN KEY (film_id) REFERENCES films (id),
+                FOREIGN KEY (theatre_id) REFERENCES theatres (id) ON DELETE CASCADE
             )
         ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_screenings_theatre ON screenings (theatre_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_screenings_film ON screenings (film_id)")
+        # Soft deletes: catalog reads filter deleted_at IS NULL, and these partial indexes hold
+        # live rows only, so hidden rows cost nothing until HistoryPurger collects them
+        self.ensure_column(cursor, 'theatres', 'deleted_at', 'TIMESTAMP')
+        self.ensure_column(cursor, 'screenings', 'deleted_at', 'TIMESTAMP')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_screenings_live ON screenings (theatre_id) WHERE deleted_at IS NULL")
+        # Movies view: screenings flattened with their film, the shape most queries read.
+        # History readers join it too, so it keeps soft-deleted screenings
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'view' AND name = 'movies'")
+        view = cursor.fetchone()
+        if view and 'deleted_at' not in view[0]:
+            cursor.execute("DROP VIEW movies")
+        cursor.execute('''
+            CREATE VIEW IF NOT EXISTS movies AS
+            SELECT s.id, f.title, f.duration, f.cast_line, f.genre, s.theatre_id, s.show_times,
+                   s.ticket_price, s.created_at, s.film_id, s.deleted_at
+            FROM screenings s JOIN films f ON f.id = s.film_id
+        ''')
         # Snacks table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS snacks (
@@ -79,9 +686,14 @@ class Database:
                 price REAL NOT NULL,
                 theatre_id INTEGER,
                 available BOOLEAN DEFAULT 1,
-                FOREIGN KEY (theatre_id) REFERENCES theatres (id)
+                deleted_at TIMESTAMP,
+                FOREIGN KEY (theatre_id) REFERENCES theatres (id) ON DELETE CASCADE
             )
         ''')
+        self.ensure_column(cursor, 'snacks', 'deleted_at', 'TIMESTAMP')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_snacks_live ON snacks (theatre_id) WHERE deleted_at IS NULL")
+        # Superseded by idx_snacks_live, which the planner would otherwise pass over
+        cursor.execute("DROP INDEX IF EXISTS idx_snacks_theatre")
         # Bookings table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS bookings (
@@ -94,9 +706,9 @@ class Database:
                 booking_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 total_amount REAL,
                 points_earned INTEGER DEFAULT 0,
-                FOREIGN KEY (user_id) REFERENCES users (id),
-                FOREIGN KEY (movie_id) REFERENCES movies (id),
-                FOREIGN KEY (theatre_id) REFERENCES theatres (id)
+                FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE,
+                FOREIGN KEY (movie_id) REFERENCES screenings (id) ON DELETE CASCADE,
+                FOREIGN KEY (theatre_id) REFERENCES theatres (id) ON DELETE CASCADE
             )
         ''')
         # Food orders table
@@ -109,9 +721,9 @@ class Database:
                 quantity INTEGER,
                 total_price REAL,
                 order_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id),
-                FOREIGN KEY (booking_id) REFERENCES bookings (id),
-                FOREIGN KEY (snack_id) REFERENCES snacks (id)
+                FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE,
+                FOREIGN KEY (booking_id) REFERENCES bookings (id) ON DELETE CASCADE,
+                FOREIGN KEY (snack_id) REFERENCES snacks (id) ON DELETE CASCADE
             )
         ''')
         # Reviews table
@@ -125,9 +737,9 @@ class Database:
                 comment TEXT,
                 review_type TEXT CHECK(review_type IN ('movie', 'theatre')),
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id),
-                FOREIGN KEY (movie_id) REFERENCES movies (id),
-                FOREIGN KEY (theatre_id) REFERENCES theatres (id)
+                FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE,
+                FOREIGN KEY (movie_id) REFERENCES screenings (id) ON DELETE CASCADE,
+                FOREIGN KEY (theatre_id) REFERENCES theatres (id) ON DELETE CASCADE
             )
         ''')
         #seats table
@@ -141,13 +753,468 @@ class Database:
                 seat_number INTEGER,
                 is_booked BOOLEAN DEFAULT 0,
                 booking_id INTEGER,
-                FOREIGN KEY (theatre_id) REFERENCES theatres (id),
-                FOREIGN KEY (movie_id) REFERENCES movies (id),
-                FOREIGN KEY (booking_id) REFERENCES bookings (id)
+                FOREIGN KEY (theatre_id) REFERENCES theatres (id) ON DELETE CASCADE,
+                FOREIGN KEY (movie_id) REFERENCES screenings (id) ON DELETE CASCADE,
+                FOREIGN KEY (booking_id) REFERENCES bookings (id) ON DELETE CASCADE
+            )
+        ''')
+        self.migrate_cascades(cursor)
+        # Child-side indexes: cascades and purges find a parent's rows without scanning.
+        # Bookings by theatre use idx_bookings_theatre (theatre_id, booking_date) below
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_bookings_movie ON bookings (movie_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_food_orders_booking ON food_orders (booking_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_food_orders_snack ON food_orders (snack_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_seats_booking ON seats (booking_id)")
+        # History of deleted theatres and screenings, removed in batches by HistoryPurger
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS purge_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                theatre_id INTEGER NOT NULL,
+                movie_id INTEGER,
+                rows_purged INTEGER NOT NULL DEFAULT 0,
+                requested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                finished_at TIMESTAMP
+            )
+        ''')
+        # Seat changes per show, tailed by live seat maps; AUTOINCREMENT keeps ids unique as resume cursors
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS seat_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                theatre_id INTEGER NOT NULL,
+                movie_id INTEGER NOT NULL,
+                show_time TEXT NOT NULL,
+                state TEXT NOT NULL,
+                seats TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_seat_events_show ON seat_events (theatre_id, movie_id, show_time, id)")
+        # Loyalty tiers table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS loyalty_tiers (
+                name TEXT PRIMARY KEY,
+                min_spend REAL NOT NULL,
+                multiplier REAL NOT NULL DEFAULT 1.0
+            )
+        ''')
+        cursor.executemany(
+            "INSERT OR IGNORE INTO loyalty_tiers (name, min_spend, multiplier) VALUES (?, ?, ?)",
+            DEFAULT_LOYALTY_TIERS
+        )
+        # Per-user tier computed by the loyalty job
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS user_loyalty (
+                user_id INTEGER PRIMARY KEY,
+                tier TEXT NOT NULL,
+                multiplier REAL NOT NULL DEFAULT 1.0,
+                trailing_spend REAL NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users (id)
+            )
+        ''')
+        # Monthly spend buckets so the trailing window can roll forward incrementally
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS user_spend_monthly (
+                user_id INTEGER NOT NULL,
+                month TEXT NOT NULL,
+                amount REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, month),
+                FOREIGN KEY (user_id) REFERENCES users (id)
             )
         ''')
+        # Row id watermarks for incremental batch jobs
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS job_watermarks (
+                job_name TEXT NOT NULL,
+                source TEXT NOT NULL,
+                last_id INTEGER NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (job_name, source)
+            )
+        ''')
+        # Per-user activity counters, maintained by the write paths
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS user_activity_summary (
+                user_id INTEGER PRIMARY KEY,
+                booking_count INTEGER NOT NULL DEFAULT 0,
+                food_order_count INTEGER NOT NULL DEFAULT 0,
+                review_count INTEGER NOT NULL DEFAULT 0,
+                total_spent REAL NOT NULL DEFAULT 0,
+                FOREIGN KEY (user_id) REFERENCES users (id)
+            )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_bookings_user ON bookings (user_id, booking_date)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_food_orders_user ON food_orders (user_id, order_date)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_reviews_user ON reviews (user_id, created_at)")
+        # Rating aggregates per movie / theatre, maintained alongside reviews
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS rating_aggregates (
+                scope TEXT NOT NULL CHECK(scope IN ('movie', 'theatre')),
+                entity_id INTEGER NOT NULL,
+                review_count INTEGER NOT NULL DEFAULT 0,
+                rating_sum INTEGER NOT NULL DEFAULT 0,
+                rating_1 INTEGER NOT NULL DEFAULT 0,
+                rating_2 INTEGER NOT NULL DEFAULT 0,
+                rating_3 INTEGER NOT NULL DEFAULT 0,
+                rating_4 INTEGER NOT NULL DEFAULT 0,
+                rating_5 INTEGER NOT NULL DEFAULT 0,
+                last_review_at TIMESTAMP,
+                PRIMARY KEY (scope, entity_id)
+            )
+        ''')
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_rating_aggregates_avg ON rating_aggregates (scope, (rating_sum * 1.0 / review_count))"
+        )
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_reviews_movie ON reviews (movie_id, created_at)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_reviews_theatre ON reviews (theatre_id, created_at)")
+        # Keyset pagination on (created_at, id); the rowid tail of each index supplies id
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_reviews_created ON reviews (created_at)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_reviews_type ON reviews (review_type, created_at)")
+        try:
+            # A seat can be held by one booking per show, even across server processes
+            cursor.execute(
+                """CREATE UNIQUE INDEX IF NOT EXISTS idx_seats_booked
+                   ON seats (theatre_id, movie_id, show_time, seat_row, seat_number) WHERE is_booked = 1"""
+            )
+        except sqlite3.IntegrityError:
+            # Legacy double bookings: the first booking keeps each seat, later ones are released
+            cursor.execute(
+                """UPDATE seats SET is_booked = 0 WHERE is_booked = 1 AND id NOT IN (
+                       SELECT MIN(id) FROM seats WHERE is_booked = 1
+                       GROUP BY theatre_id, movie_id, show_time, seat_row, seat_number)"""
+            )
+            logging.getLogger('cine.db').warning(
+                "Released %d double-booked seats so idx_seats_booked could be created", cursor.rowcount
+            )
+            cursor.execute(
+                """CREATE UNIQUE INDEX idx_seats_booked
+                   ON seats (theatre_id, movie_id, show_time, seat_row, seat_number) WHERE is_booked = 1"""
+            )
+        self.fts_enabled = self.init_search_index(cursor)
+        if films_migrated and self.fts_enabled:
+            cursor.execute("INSERT INTO movies_fts (movies_fts) VALUES ('rebuild')")
+        # Seats sold per show and day, and running occupancy sums per forecast feature
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS show_demand (
+                theatre_id INTEGER NOT NULL,
+                movie_id INTEGER NOT NULL,
+                show_time TEXT NOT NULL,
+                show_date TEXT NOT NULL,
+                seats_sold INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (theatre_id, movie_id, show_time, show_date)
+            )
+        ''')
+        # Revenue / occupancy rollups, maintained by booking and food-order commits
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS revenue_daily (
+                theatre_id INTEGER NOT NULL,
+                day TEXT NOT NULL,
+                movie_id INTEGER NOT NULL,
+                show_time TEXT NOT NULL,
+                bookings INTEGER NOT NULL DEFAULT 0,
+                seats_sold INTEGER NOT NULL DEFAULT 0,
+                ticket_revenue REAL NOT NULL DEFAULT 0,
+                food_orders INTEGER NOT NULL DEFAULT 0,
+                food_revenue REAL NOT NULL DEFAULT 0,
+                bookings_with_food INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (theatre_id, day, movie_id, show_time)
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS revenue_hourly (
+                theatre_id INTEGER NOT NULL,
+                hour TEXT NOT NULL,
+                movie_id INTEGER NOT NULL,
+                bookings INTEGER NOT NULL DEFAULT 0,
+                seats_sold INTEGER NOT NULL DEFAULT 0,
+                ticket_revenue REAL NOT NULL DEFAULT 0,
+                food_orders INTEGER NOT NULL DEFAULT 0,
+                food_revenue REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (theatre_id, hour, movie_id)
+            )
+        ''')
+        # Databases created while a single-column index had this name get the composite one now
+        cursor.execute("PRAGMA index_info(idx_bookings_theatre)")
+        if len(cursor.fetchall()) == 1:
+            cursor.execute("DROP INDEX idx_bookings_theatre")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_bookings_theatre ON bookings (theatre_id, booking_date)")
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS forecast_stats (
+                feature TEXT NOT NULL,
+                key TEXT NOT NULL,
+                observations INTEGER NOT NULL DEFAULT 0,
+                occupancy_sum REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (feature, key)
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS item_similarity (
+                movie_id INTEGER NOT NULL,
+                similar_movie_id INTEGER NOT NULL,
+                score REAL NOT NULL,
+                PRIMARY KEY (movie_id, similar_movie_id)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS user_recommendations (
+                user_id INTEGER NOT NULL,
+                rank INTEGER NOT NULL,
+                movie_id INTEGER NOT NULL,
+                score REAL NOT NULL,
+                PRIMARY KEY (user_id, rank)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS genres (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT UNIQUE NOT NULL COLLATE NOCASE
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS people (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT UNIQUE NOT NULL COLLATE NOCASE
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS movie_genres (
+                genre_id INTEGER NOT NULL,
+                movie_id INTEGER NOT NULL,
+                PRIMARY KEY (genre_id, movie_id),
+                FOREIGN KEY (genre_id) REFERENCES genres (id),
+                FOREIGN KEY (movie_id) REFERENCES screenings (id)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS movie_cast (
+                person_id INTEGER NOT NULL,
+                movie_id INTEGER NOT NULL,
+                billing INTEGER NOT NULL,
+                PRIMARY KEY (person_id, movie_id),
+                FOREIGN KEY (person_id) REFERENCES people (id),
+                FOREIGN KEY (movie_id) REFERENCES screenings (id)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_movie_genres_movie ON movie_genres (movie_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_movie_cast_movie ON movie_cast (movie_id, billing)")
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS catalog_versions (
+                resource TEXT NOT NULL,
+                scope_id INTEGER NOT NULL,
+                version INTEGER NOT NULL,
+                PRIMARY KEY (resource, scope_id)
+            ) WITHOUT ROWID
+        ''')
+        if 'catalog_versions' not in existing_tables:
+            CatalogVersions.seed(cursor)
+        # Derived tables created just now start empty; fill them from existing history
+        if 'rating_aggregates' not in existing_tables:
+            RatingAggregates.rebuild_rows(cursor)
+        if 'forecast_stats' not in existing_tables:
+            DemandForecaster.rebuild_rows(cursor)
+        if 'revenue_daily' not in existing_tables:
+            RevenueRollups.rebuild_rows(cursor)
+        if 'movie_genres' not in existing_tables:
+            CatalogIndex.rebuild_rows(cursor)
         conn.commit()
         conn.close()
+    @staticmethod
+    def ensure_column(cursor, table: str, column: str, declaration: str):
+        """Add a column that tables created by older versions lack"""
+        cursor.execute(f"PRAGMA table_info({table})")
+        if column not in {row[1] for row in cursor.fetchall()}:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+    def migrate_cascades(self, cursor):
+        """Give foreign keys created by older schemas ON DELETE CASCADE, then drop the orphans
+        earlier deletes left behind. Only constraint text changes, so the stored CREATE TABLE
+        is edited in place (SQLite's writable_schema procedure) instead of copying every row."""
+        stale = defaultdict(set)
+        for table in CASCADE_TABLES:
+            cursor.execute(f"PRAGMA foreign_key_list({table})")
+            for row in cursor.fetchall():
+                if (table, row[3]) in CASCADE_KEYS and row[6] != 'CASCADE':
+                    stale[table].add(row[3])
+        if not stale:
+            return
+        clause = re.compile(r'FOREIGN KEY\s*\(\s*"?(\w+)"?\s*\)\s*REFERENCES\s+"?\w+"?\s*\(\s*id\s*\)(?!\s*ON\s+DELETE)',
+                            re.IGNORECASE)
+        rewritten = []
+        for table, columns in stale.items():
+            cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+            sql = clause.sub(
+                lambda match: match.group(0) + ' ON DELETE CASCADE' if match.group(1) in columns else match.group(0),
+                cursor.fetchone()[0]
+            )
+            rewritten.append((sql, table))
+        cursor.execute("PRAGMA schema_version")
+        schema_version = cursor.fetchone()[0]
+        cursor.execute("PRAGMA writable_schema = ON")
+        cursor.executemany("UPDATE sqlite_master SET sql = ? WHERE type = 'table' AND name = ?", rewritten)
+        cursor.execute(f"PRAGMA schema_version = {schema_version + 1}")
+        cursor.execute("PRAGMA writable_schema = OFF")
+        for table in CASCADE_TABLES:
+            cursor.execute(f"PRAGMA foreign_key_list({table})")
+            for row in cursor.fetchall():
+                if (table, row[3]) in CASCADE_KEYS:
+                    cursor.execute(
+                        f"DELETE FROM {table} WHERE {row[3]} IS NOT NULL AND {row[3]} NOT IN (SELECT id FROM {row[2]})"
+                    )
+    def init_search_index(self, cursor) -> bool:
+        """Create FTS5 tables over movies and review comments, kept in sync by triggers.
+        Returns False when the SQLite build has no FTS5; search then falls back to LIKE."""
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ('movies_fts', 'reviews_fts')")
+        existing = {row[0] for row in cursor.fetchall()}
+        try:
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS movies_fts USING fts5(
+                    title, cast_line, genre,
+                    content='movies', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+                )
+            ''')
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS reviews_fts USING fts5(
+                    comment,
+                    content='reviews', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+                )
+            ''')
+        except sqlite3.OperationalError:
+            return False
+        # movies is a view over screenings + films: screenings add/remove index rows,
+        # film edits re-index every screening of the film
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS screenings_fts_insert AFTER INSERT ON screenings BEGIN
+                INSERT INTO movies_fts (rowid, title, cast_line, genre)
+                SELECT new.id, title, cast_line, genre FROM films WHERE id = new.film_id;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS screenings_fts_delete AFTER DELETE ON screenings BEGIN
+                INSERT INTO movies_fts (movies_fts, rowid, title, cast_line, genre)
+                SELECT 'delete', old.id, title, cast_line, genre FROM films WHERE id = old.film_id;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS screenings_fts_update AFTER UPDATE OF film_id ON screenings BEGIN
+                INSERT INTO movies_fts (movies_fts, rowid, title, cast_line, genre)
+                SELECT 'delete', old.id, title, cast_line, genre FROM films WHERE id = old.film_id;
+                INSERT INTO movies_fts (rowid, title, cast_line, genre)
+                SELECT new.id, title, cast_line, genre FROM films WHERE id = new.film_id;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS films_fts_update AFTER UPDATE OF title, cast_line, genre ON films BEGIN
+                INSERT INTO movies_fts (movies_fts, rowid, title, cast_line, genre)
+                SELECT 'delete', s.id, old.title, old.cast_line, old.genre FROM screenings s WHERE s.film_id = old.id;
+                INSERT INTO movies_fts (rowid, title, cast_line, genre)
+                SELECT s.id, new.title, new.cast_line, new.genre FROM screenings s WHERE s.film_id = new.id;
+            END
+        ''')
+        if 'movies_fts' not in existing:
+            cursor.execute("INSERT INTO movies_fts (movies_fts) VALUES ('rebuild')")
+        for table, columns in (('reviews', ['comment']),):
+            column_list = ', '.join(columns)
+            new_values = ', '.join(f"new.{column}" for column in columns)
+            old_values = ', '.join(f"old.{column}" for column in columns)
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} BEGIN
+                    INSERT INTO {table}_fts (rowid, {column_list}) VALUES (new.id, {new_values});
+                END
+            ''')
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} BEGIN
+                    INSERT INTO {table}_fts ({table}_fts, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+                END
+            ''')
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE OF {column_list} ON {table} BEGIN
+                    INSERT INTO {table}_fts ({table}_fts, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+                    INSERT INTO {table}_fts (rowid, {column_list}) VALUES (new.id, {new_values});
+                END
+            ''')
+            if f"{table}_fts" not in existing:
+                # Index rows written before the search tables existed
+                cursor.execute(f"INSERT INTO {table}_fts ({table}_fts) VALUES ('rebuild')")
+        return True
+    def get_films(self, cursor, film_ids) -> Dict[int, Dict]:
+        """Film details by id from film_cache; misses are loaded in one query.
+        Writers invalidate entries after committing a film change."""
+        films = {}
+        missing = []
+        for film_id in set(film_ids):
+            film = self.film_cache.get(film_id)
+            if film is None:
+                missing.append(film_id)
+            else:
+                films[film_id] = film
+        for start in range(0, len(missing), 500):
+            chunk = missing[start:start + 500]
+            cursor.execute(
+                f"""SELECT id, title, duration, cast_line, genre FROM films
+                    WHERE id IN ({','.join('?' * len(chunk))})""",
+                chunk
+            )
+            for row in cursor.fetchall():
+                film = {'title': row[1], 'duration': row[2], 'cast_line': row[3], 'genre': row[4]}
+                self.film_cache.put(row[0], film)
+                films[row[0]] = film
+        return films
+    def record_activity(self, cursor, user_id: int, bookings: int = 0, food_orders: int = 0,
+                        reviews: int = 0, spent: float = 0):
+        """Bump a user's activity counters inside the caller's transaction.
+        Counters are only adjusted once a summary row exists; missing rows are
+        rebuilt from history the next time the summary is read. Callers must
+        invalidate activity_cache after committing."""
+        cursor.execute(
+            """UPDATE user_activity_summary SET booking_count = booking_count + ?,
+               food_order_count = food_order_count + ?, review_count = review_count + ?,
+               total_spent = total_spent + ? WHERE user_id = ?""",
+            (bookings, food_orders, reviews, spent, user_id)
+        )
+    def reset_activity(self, cursor, user_query: str = None, params: tuple = ()):
+        """Drop summaries for users matched by user_query (all users if None) after bulk deletes"""
+        if user_query is None:
+            cursor.execute("DELETE FROM user_activity_summary")
+        else:
+            cursor.execute(f"DELETE FROM user_activity_summary WHERE user_id IN ({user_query})", params)
+    def get_watermark(self, cursor, job_name: str, source: str) -> int:
+        cursor.execute(
+            "SELECT last_id FROM job_watermarks WHERE job_name = ? AND source = ?",
+            (job_name, source)
+        )
+        result = cursor.fetchone()
+        return result[0] if result else 0
+    def set_watermark(self, cursor, job_name: str, source: str, last_id: int):
+        cursor.execute(
+            """INSERT INTO job_watermarks (job_name, source, last_id) VALUES (?, ?, ?)
+               ON CONFLICT(job_name, source) DO UPDATE SET last_id = excluded.last_id,
+               updated_at = CURRENT_TIMESTAMP""",
+            (job_name, source, last_id)
+        )
+    def claim_job(self, job_name: str, interval: float) -> Optional[int]:
+        """Claim a periodic job whose last run, a Unix time kept as its 'main' watermark, is
+        over interval seconds ago, so that of several processes only one runs it. Returns the
+        previous run time for release_job, or None when not due or claimed elsewhere."""
+        conn = self.get_write_connection()
+        try:
+            cursor = conn.cursor()
+            last_run = self.get_watermark(cursor, job_name, 'main')
+            now = int(time.time())
+            if now - last_run < interval:
+                conn.rollback()
+                return None
+            self.set_watermark(cursor, job_name, 'main', now)
+            conn.commit()
+            return last_run
+        finally:
+            conn.close()
+    def release_job(self, job_name: str, last_run: int):
+        """Hand back a claim whose run failed, so the next poll retries"""
+        conn = self.get_write_connection()
+        try:
+            self.set_watermark(conn.cursor(), job_name, 'main', last_run)
+            conn.commit()
+        finally:
+            conn.close()
 class Auth:
     @staticmethod
     def hash_password(password: str) -> str:
@@ -195,13 +1262,14 @@ class Admin:
                 "INSERT INTO theatres (name, location, total_seats) VALUES (?, ?, ?)",
                 (name, location, total_seats)
             )
+            CatalogVersions.bump(cursor, 'theatres')
             conn.commit()
             conn.close()
             return True
         except:
             return False
     def view_users(self) -> List[Dict]:
-        conn = self.db.get_connection()
+        conn = self.db.get_connection(replica=True)
         cursor = conn.cursor()
         cursor.execute("SELECT id, username, email, loyalty_points FROM users")
         users = cursor.fetchall()
@@ -215,10 +1283,38 @@ class Admin:
             }
             for user in users
         ]
+    def _iter_rows(self, query: str, columns: List[str]) -> Iterator[Dict]:
+        """Yield query rows as dicts straight off the cursor, never holding the result set.
+        The connection may be stepped from several threads in turn (HTTP bodies are iterated
+        in a threadpool), so it opts out of the same-thread check. Reads the read replica."""
+        conn = self.db.get_connection(replica=True, check_same_thread=False)
+        try:
+            for row in conn.execute(query):
+                yield dict(zip(columns, row))
+        finally:
+            conn.close()
+    def iter_users(self) -> Iterator[Dict]:
+        """Streaming counterpart of view_users, for exports"""
+        return self._iter_rows(
+            "SELECT id, username, email, loyalty_points FROM users ORDER BY id",
+            ['id', 'username', 'email', 'loyalty_points']
+        )
+    def iter_all_reviews(self) -> Iterator[Dict]:
+        """Streaming counterpart of view_all_reviews, in id order so no sort has to buffer rows"""
+        return self._iter_rows(
+            """SELECT r.id, r.rating, r.comment, r.review_type, r.created_at,
+                    u.username, t.name, COALESCE(m.title, 'N/A')
+            FROM reviews r
+            JOIN users u ON r.user_id = u.id
+            JOIN theatres t ON r.theatre_id = t.id
+            LEFT JOIN movies m ON r.movie_id = m.id
+            ORDER BY r.id""",
+            ['id', 'rating', 'comment', 'review_type', 'created_at', 'username', 'theatre_name', 'movie_title']
+        )
     def view_theatres(self) -> List[Dict]:
         conn = self.db.get_connection()
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM theatres")
+        cursor.execute("SELECT * FROM theatres WHERE deleted_at IS NULL")
         theatres = cursor.fetchall()
         conn.close()
         return [
@@ -231,27 +1327,58 @@ class Admin:
             for theatre in theatres
         ]
     def delete_theatre(self, theatre_id: int) -> bool:
+        """Soft-delete a theatre with its screenings and snacks: they vanish from the catalog at
+        once while their history stays for reporting until HistoryPurger collects them"""
         try:
-            conn = self.db.get_connection()
+            conn = self.db.get_write_connection()
             cursor = conn.cursor()
-            cursor.execute("SELECT id FROM theatres WHERE id = ?", (theatre_id,))
+            cursor.execute("SELECT id FROM theatres WHERE id = ? AND deleted_at IS NULL", (theatre_id,))
             if not cursor.fetchone():
+                conn.close()
                 return False
-            # Delete related records first (to maintain referential integrity)
-            cursor.execute("DELETE FROM reviews WHERE theatre_id = ?", (theatre_id,))
-            cursor.execute("DELETE FROM food_orders WHERE booking_id IN (SELECT id FROM bookings WHERE theatre_id = ?)", (theatre_id,))
-            cursor.execute("DELETE FROM bookings WHERE theatre_id = ?", (theatre_id,))
-            cursor.execute("DELETE FROM snacks WHERE theatre_id = ?", (theatre_id,))
-            cursor.execute("DELETE FROM movies WHERE theatre_id = ?", (theatre_id,))
-            cursor.execute("DELETE FROM managers WHERE theatre_id = ?", (theatre_id,))
-            cursor.execute("DELETE FROM theatres WHERE id = ?", (theatre_id,))
+            live = "SELECT id FROM screenings WHERE theatre_id = ? AND deleted_at IS NULL"
+            RatingAggregates.drop(cursor, 'movie', live, (theatre_id,))
+            RatingAggregates.drop(cursor, 'theatre', "SELECT ?", (theatre_id,))
+            Recommender.drop(cursor, live, (theatre_id,))
+            CatalogIndex.unlink(cursor, live, (theatre_id,))
+            for table in ('snacks', 'screenings'):
+                cursor.execute(
+                    f"UPDATE {table} SET deleted_at = CURRENT_TIMESTAMP WHERE theatre_id = ? AND deleted_at IS NULL",
+                    (theatre_id,)
+                )
+            cursor.execute("UPDATE theatres SET deleted_at = CURRENT_TIMESTAMP WHERE id = ?", (theatre_id,))
+            CatalogVersions.bump(cursor, 'theatres')
+            for resource in ('movies', 'snacks'):
+                CatalogVersions.bump(cursor, resource, "SELECT ?", (theatre_id,))
             conn.commit()
             conn.close()
             return True
         except:
             return False
-    def view_all_reviews(self) -> List[Dict]:
+    def update_film(self, film_id: int, title: str, duration: int, cast_line: str, genre: str) -> bool:
+        """Correct a film's details for every theatre screening it. False if the film does not
+        exist or the new title and duration belong to another film."""
         conn = self.db.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """UPDATE films SET title = ?, title_key = ?, duration = ?, cast_line = ?, genre = ?
+                   WHERE id = ?""",
+                (' '.join(title.split()), FilmCatalog.title_key(title), duration, cast_line, genre, film_id)
+            )
+            if not cursor.rowcount:
+                return False
+            FilmCatalog.relink(cursor, film_id)
+            CatalogVersions.bump(cursor, 'movies', "SELECT theatre_id FROM screenings WHERE film_id = ?", (film_id,))
+            conn.commit()
+        except sqlite3.IntegrityError:
+            return False
+        finally:
+            conn.close()
+        self.db.film_cache.invalidate(film_id)
+        return True
+    def view_all_reviews(self) -> List[Dict]:
+        conn = self.db.get_connection(replica=True)
         cursor = conn.cursor()
         cursor.execute(
             """SELECT r.id, r.rating, r.comment, r.review_type, r.created_at,
@@ -297,8 +1424,11 @@ class Manager:
     def login(self, username: str, password: str) -> Optional[Dict]:
         conn = self.db.get_connection()
         cursor = conn.cursor()
+        # Managers of a deleted theatre lose access with it
         cursor.execute(
-            "SELECT * FROM managers WHERE username = ?", (username,)
+            """SELECT m.* FROM managers m JOIN theatres t ON t.id = m.theatre_id
+               WHERE m.username = ? AND t.deleted_at IS NULL""",
+            (username,)
         )
         manager = cursor.fetchone()
         conn.close()
@@ -315,13 +1445,19 @@ class Manager:
         try:
             conn = self.db.get_connection()
             cursor = conn.cursor()
+            film_id = FilmCatalog.resolve(cursor, title, duration, cast_line, genre)
             cursor.execute(
-                """INSERT INTO movies (title, duration, cast_line, genre, show_times, ticket_price, theatre_id) 
-                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
-                (title, duration, cast_line, genre, show_times, ticket_price, theatre_id)
+                """INSERT INTO screenings (film_id, show_times, ticket_price, theatre_id) 
+                   VALUES (?, ?, ?, ?)""",
+                (film_id, show_times, ticket_price, theatre_id)
             )
+            FilmCatalog.relink(cursor, film_id, cursor.lastrowid)
+            # resolve() may have filled in details shown by other theatres' listings
+            CatalogVersions.bump(cursor, 'movies', "SELECT theatre_id FROM screenings WHERE film_id = ?", (film_id,))
+            CatalogVersions.bump(cursor, 'theatres')
             conn.commit()
             conn.close()
+            self.db.film_cache.invalidate(film_id)
             return True
         except:
             return False
@@ -333,17 +1469,19 @@ class Manager:
                 "INSERT INTO snacks (name, price, theatre_id) VALUES (?, ?, ?)",
                 (name, price, theatre_id)
             )
+            CatalogVersions.bump(cursor, 'snacks', "SELECT ?", (theatre_id,))
             conn.commit()
             conn.close()
             return True
         except:
             return False
     def view_bookings(self, theatre_id: int) -> List[Dict]:
-        conn = self.db.get_connection()
+        conn = self.db.get_connection(history=True, replica=True)
+        tables = self.db.history_tables(conn)
         cursor = conn.cursor()
         cursor.execute(
-            """SELECT b.*, m.title, u.username 
-               FROM bookings b 
+            f"""SELECT b.*, m.title, u.username 
+               FROM {tables['bookings']} b 
                JOIN movies m ON b.movie_id = m.id 
                JOIN users u ON b.user_id = u.id 
                WHERE b.theatre_id = ?""",
@@ -388,30 +1526,49 @@ class Manager:
     def view_movies(self, theatre_id: int)-> List[Dict]:
         conn=self.db.get_connection()
         cursor=conn.cursor()
-        cursor.execute("SELECT * FROM movies WHERE theatre_id=?",(theatre_id,))
+        cursor.execute(
+            """SELECT s.id, s.film_id, s.show_times, s.ticket_price,
+                    ra.rating_sum * 1.0 / ra.review_count, COALESCE(ra.review_count, 0)
+            FROM screenings s
+            LEFT JOIN rating_aggregates ra ON ra.scope = 'movie' AND ra.entity_id = s.id
+            WHERE s.theatre_id=? AND s.deleted_at IS NULL""",
+            (theatre_id,)
+        )
         movies=cursor.fetchall()
+        films=self.db.get_films(cursor, [movie[1] for movie in movies])
         conn.close()
         return[
             {
                 'id':movie[0],
-                'title': movie[1],
-                'duration': movie[2],
-                'cast_line': movie[3],
-                'genre': movie[4],
-                'show_times': movie[6],
-                'ticket_price': movie[7]
+                'film_id': movie[1],
+                'title': films[movie[1]]['title'],
+                'duration': films[movie[1]]['duration'],
+                'cast_line': films[movie[1]]['cast_line'],
+                'genre': films[movie[1]]['genre'],
+                'show_times': movie[2],
+                'ticket_price': movie[3],
+                'avg_rating': round(movie[4], 2) if movie[4] is not None else None,
+                'review_count': movie[5]
             }
             for movie in movies
         ]
     def delete_movie(self, movie_id: int, theatre_id: int) -> bool:
+        """Soft-delete a screening; bookings and reviews stay until HistoryPurger collects it"""
         try:
-            conn = self.db.get_connection()
+            conn = self.db.get_write_connection()
             cursor = conn.cursor()
-            cursor.execute("DELETE FROM food_orders WHERE booking_id IN (SELECT id FROM bookings WHERE movie_id = ?)", (movie_id,))
-            cursor.execute("DELETE FROM reviews WHERE movie_id = ?", (movie_id,))
-            cursor.execute("DELETE FROM bookings WHERE movie_id = ?", (movie_id,))
-            cursor.execute("DELETE FROM movies WHERE id = ? AND theatre_id = ?", (movie_id, theatre_id))
+            cursor.execute(
+                """UPDATE screenings SET deleted_at = CURRENT_TIMESTAMP
+                   WHERE id = ? AND theatre_id = ? AND deleted_at IS NULL""",
+                (movie_id, theatre_id)
+            )
             success = cursor.rowcount > 0
+            if success:
+                RatingAggregates.drop(cursor, 'movie', "SELECT ?", (movie_id,))
+                Recommender.drop(cursor, "SELECT ?", (movie_id,))
+                CatalogIndex.unlink(cursor, "SELECT ?", (movie_id,))
+                CatalogVersions.bump(cursor, 'movies', "SELECT ?", (theatre_id,))
+                CatalogVersions.bump(cursor, 'theatres')
             conn.commit()
             conn.close()
             return success
@@ -419,24 +1576,47 @@ class Manager:
             return False
     def update_movie(self, movie_id: int, title: str, duration: int, cast_line: str, 
                 genre: str, show_times: str, ticket_price: float, theatre_id: int) -> bool:
+        """Repoint this theatre's screening at the film matching the details, created if new.
+        Cast and genre are rewritten only for a film no other screening uses; details other
+        theatres show are corrected by admins (Admin.update_film)."""
         try:
             conn = self.db.get_connection()
             cursor = conn.cursor()
             cursor.execute(
-                """UPDATE movies SET title = ?, duration = ?, cast_line = ?, genre = ?, 
-                show_times = ?, ticket_price = ? WHERE id = ? AND theatre_id = ?""",
-                (title, duration, cast_line, genre, show_times, ticket_price, movie_id, theatre_id)
+                "SELECT film_id FROM screenings WHERE id = ? AND theatre_id = ? AND deleted_at IS NULL",
+                (movie_id, theatre_id)
+            )
+            current = cursor.fetchone()
+            if not current:
+                conn.close()
+                return False
+            film_id = FilmCatalog.resolve(cursor, title, duration, cast_line, genre)
+            cursor.execute("SELECT 1 FROM screenings WHERE film_id = ? AND id != ? LIMIT 1", (film_id, movie_id))
+            if film_id == current[0] and not cursor.fetchone():
+                cursor.execute(
+                    "UPDATE films SET title = ?, cast_line = ?, genre = ? WHERE id = ?",
+                    (' '.join(title.split()), cast_line, genre, film_id)
+                )
+            cursor.execute(
+                "UPDATE screenings SET film_id = ?, show_times = ?, ticket_price = ? WHERE id = ?",
+                (film_id, show_times, ticket_price, movie_id)
+            )
+            FilmCatalog.relink(cursor, film_id, movie_id)
+            FilmCatalog.prune(cursor)
+            CatalogVersions.bump(
+                cursor, 'movies', "SELECT theatre_id FROM screenings WHERE film_id IN (?, ?)", (film_id, current[0])
             )
-            success = cursor.rowcount > 0
             conn.commit()
             conn.close()
-            return success
+            self.db.film_cache.invalidate(film_id)
+            self.db.film_cache.invalidate(current[0])
+            return True
         except:
             return False    
     def view_snacks(self, theatre_id: int) -> List[Dict]:
         conn = self.db.get_connection()
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM snacks WHERE theatre_id = ?", (theatre_id,))
+        cursor.execute("SELECT * FROM snacks WHERE theatre_id = ? AND deleted_at IS NULL", (theatre_id,))
         snacks = cursor.fetchall()
         conn.close()
         return [
@@ -449,12 +1629,18 @@ class Manager:
             for snack in snacks
         ]    
     def delete_snack(self, snack_id: int, theatre_id: int) -> bool:
+        """Soft-delete a snack; its food orders and revenue stay until HistoryPurger collects it"""
         try:
             conn = self.db.get_connection()
             cursor = conn.cursor()
-            cursor.execute("DELETE FROM food_orders WHERE snack_id = ?", (snack_id,))
-            cursor.execute("DELETE FROM snacks WHERE id = ? AND theatre_id = ?", (snack_id, theatre_id))
+            cursor.execute(
+                """UPDATE snacks SET deleted_at = CURRENT_TIMESTAMP
+                   WHERE id = ? AND theatre_id = ? AND deleted_at IS NULL""",
+                (snack_id, theatre_id)
+            )
             success = cursor.rowcount > 0
+            if success:
+                CatalogVersions.bump(cursor, 'snacks', "SELECT ?", (theatre_id,))
             conn.commit()
             conn.close()
             return success
@@ -485,35 +1671,33 @@ class User:
         )
         user = cursor.fetchone()
         conn.close()
-        if user:
-            if Auth.verify_password(password, user[2]):
-                return {
-                    'id': user[0],
-                    'username': user[1],
-                    'email': user[3],
-                    'phone': user[4],
-                    'loyalty_points': user[5]
-                }
-            else:
-                print("Debug: Password verification failed")
-        else:
-            print("Debug: No user found with that username")
+        if user and Auth.verify_password(password, user[2]):
+            return {
+                'id': user[0],
+                'username': user[1],
+                'email': user[3],
+                'phone': user[4],
+                'loyalty_points': user[5]
+            }
         return None
     def book_ticket_with_points(self, user_id: int, movie_id: int, theatre_id: int, 
                    seats: int, show_time: str, points_to_redeem:int=0) -> bool:
         try:
-            conn = self.db.get_connection()
+            conn = self.db.get_write_connection()
             cursor = conn.cursor()
             # Get ticket price
-            cursor.execute("SELECT ticket_price FROM movies WHERE id = ?", (movie_id,))
+            cursor.execute("SELECT ticket_price FROM movies WHERE id = ? AND deleted_at IS NULL", (movie_id,))
             price_result = cursor.fetchone()
             if not price_result:
+                conn.close()
                 return False
             ticket_price = price_result[0]
             original_amount=ticket_price*seats
-            discount=(points_to_redeem//100)*10
+            discount=(points_to_redeem//POINTS_REDEEM_BLOCK)*POINTS_REDEEM_VALUE
             total_amount = original_amount-discount
-            points_earned = int(total_amount / 10)  # 1 point per $10 spent
+            # 1 point per $10 spent, scaled by the precomputed tier multiplier
+            multiplier = LoyaltyEngine.lookup_multiplier(cursor, user_id)
+            points_earned = int(total_amount / POINTS_EARN_UNIT * multiplier)
             # Check if user has enough points
             if points_to_redeem>0:
                 cursor.execute("SELECT loyalty_points FROM users WHERE id=?", (user_id,))
@@ -532,31 +1716,83 @@ class User:
                 "UPDATE users SET loyalty_points = loyalty_points + ? WHERE id = ?",
                 (points_earned, user_id)
             )
+            DemandForecaster.record_booking(cursor, theatre_id, movie_id, show_time, seats)
+            RevenueRollups.record_booking(cursor, theatre_id, movie_id, show_time, seats, total_amount)
+            self.db.record_activity(cursor, user_id, bookings=1, spent=total_amount)
             conn.commit()
             conn.close()
+            self.db.activity_cache.invalidate(user_id)
+            self.db.seats_booked.inc(seats, (theatre_id,))
             return True
         except:
             return False
-    def order_food(self, user_id: int, booking_id: int, snack_id: int, quantity: int) -> bool:
+    def order_food(self, user_id: int, booking_id: int, snack_id: int, quantity: int) -> Optional[int]:
+        """Order one snack line; returns the food order id, or None"""
+        order_ids = self.order_food_items(user_id, booking_id, [(snack_id, quantity)])
+        return order_ids[0] if order_ids else None
+    def order_food_items(self, user_id: int, booking_id: int, snack_lines: List[tuple]) -> Optional[List[int]]:
+        """Order (snack_id, quantity) lines for one of the user's bookings in one transaction.
+        Returns the food order ids in line order, or None with nothing written."""
+        conn = None
         try:
-            conn = self.db.get_connection()
+            conn = self.db.get_write_connection()
             cursor = conn.cursor()
-            # Get snack price
-            cursor.execute("SELECT price FROM snacks WHERE id = ?", (snack_id,))
-            price_result = cursor.fetchone()
-            if not price_result:
-                return False
-            total_price = price_result[0] * quantity
-            cursor.execute(
-                """INSERT INTO food_orders (user_id, booking_id, snack_id, quantity, total_price) 
+            cursor.execute("SELECT theatre_id FROM bookings WHERE id = ? AND user_id = ?", (booking_id, user_id))
+            booking = cursor.fetchone()
+            if not booking or not snack_lines:
+                return None
+            order_ids = []
+            food_total = self._insert_food_lines(cursor, user_id, booking_id, booking[0], snack_lines, order_ids)
+            if food_total is None:
+                return None
+            self.db.record_activity(cursor, user_id, food_orders=len(snack_lines), spent=food_total)
+            conn.commit()
+        except Exception:
+            return None
+        finally:
+            if conn:
+                conn.close()
+        self.db.activity_cache.invalidate(user_id)
+        return order_ids
+    @staticmethod
+    def _insert_food_lines(cursor, user_id: int, booking_id: int, theatre_id: int,
+                           snack_lines: List[tuple], order_ids: List[int] = None) -> Optional[float]:
+        """Insert food orders for (snack_id, quantity) lines in the caller's transaction and
+        return their total; None if a snack is not on sale at the theatre or a quantity is not positive.
+        The new orders' ids are appended to order_ids when given."""
+        if not snack_lines:
+            return 0.0
+        snack_ids = list({snack_id for snack_id, quantity in snack_lines})
+        cursor.execute(
+            f"""SELECT id, price FROM snacks WHERE theatre_id = ? AND available = 1 AND deleted_at IS NULL
+                AND id IN ({','.join('?' * len(snack_ids))})""",
+            [theatre_id] + snack_ids
+        )
+        prices = dict(cursor.fetchall())
+        if any(snack_id not in prices or quantity <= 0 for snack_id, quantity in snack_lines):
+            return None
+        orders = [
+            (user_id, booking_id, snack_id, quantity, prices[snack_id] * quantity)
+            for snack_id, quantity in snack_lines
+        ]
+        food_total = sum(order[4] for order in orders)
+        RevenueRollups.record_food_order(cursor, booking_id, food_total, len(orders))
+        if order_ids is None:
+            cursor.executemany(
+                """INSERT INTO food_orders (user_id, booking_id, snack_id, quantity, total_price)
                    VALUES (?, ?, ?, ?, ?)""",
-                (user_id, booking_id, snack_id, quantity, total_price)
+                orders
             )
-            conn.commit()
-            conn.close()
-            return True
-        except:
-            return False
+        else:
+            # One statement per order, as executemany does not report the rowids it assigns
+            for order in orders:
+                cursor.execute(
+                    """INSERT INTO food_orders (user_id, booking_id, snack_id, quantity, total_price)
+                       VALUES (?, ?, ?, ?, ?)""",
+                    order
+                )
+                order_ids.append(cursor.lastrowid)
+        return food_total
     def add_review(self, user_id: int, rating: int, comment: str, 
                    review_type: str, theatre_id: int, movie_id: int = None) -> bool:
         try:
@@ -567,8 +1803,33 @@ class User:
                    VALUES (?, ?, ?, ?, ?, ?)""",
                 (user_id, movie_id, theatre_id, rating, comment, review_type)
             )
+            RatingAggregates.apply(cursor, review_type, theatre_id, movie_id, rating)
+            self.db.record_activity(cursor, user_id, reviews=1)
+            conn.commit()
+            conn.close()
+            self.db.activity_cache.invalidate(user_id)
+            return True
+        except:
+            return False
+    def delete_review(self, review_id: int, user_id: int) -> bool:
+        """Delete one of the user's own reviews"""
+        try:
+            conn = self.db.get_write_connection()
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT review_type, theatre_id, movie_id, rating FROM reviews WHERE id = ? AND user_id = ?",
+                (review_id, user_id)
+            )
+            review = cursor.fetchone()
+            if not review:
+                conn.close()
+                return False
+            cursor.execute("DELETE FROM reviews WHERE id = ?", (review_id,))
+            RatingAggregates.apply(cursor, review[0], review[1], review[2], review[3], sign=-1)
+            self.db.record_activity(cursor, user_id, reviews=-1)
             conn.commit()
             conn.close()
+            self.db.activity_cache.invalidate(user_id)
             return True
         except:
             return False
@@ -581,7 +1842,7 @@ class User:
         return result[0] if result else 0
     def redeem_points(self, user_id: int, points: int) -> bool:
         try:
-            conn = self.db.get_connection()
+            conn = self.db.get_write_connection()
             cursor = conn.cursor()
             cursor.execute(
                 "UPDATE users SET loyalty_points = loyalty_points - ? WHERE id = ? AND loyalty_points >= ?",
@@ -590,6 +1851,7 @@ class User:
             success = cursor.rowcount > 0
             conn.commit()
             conn.close()
+            self.db.activity_cache.invalidate(user_id)
             return success
         except:
             return False
@@ -598,9 +1860,12 @@ class User:
         conn = self.db.get_connection()
         cursor = conn.cursor()
         cursor.execute(
-            """SELECT DISTINCT t.id, t.name, t.location, t.total_seats 
+            """SELECT t.id, t.name, t.location, t.total_seats,
+                    ra.rating_sum * 1.0 / ra.review_count, COALESCE(ra.review_count, 0)
             FROM theatres t 
-            JOIN movies m ON t.id = m.theatre_id"""
+            LEFT JOIN rating_aggregates ra ON ra.scope = 'theatre' AND ra.entity_id = t.id
+            WHERE t.deleted_at IS NULL
+            AND EXISTS (SELECT 1 FROM screenings s WHERE s.theatre_id = t.id AND s.deleted_at IS NULL)"""
         )
         theatres = cursor.fetchall()
         conn.close()
@@ -609,7 +1874,9 @@ class User:
                 'id': theatre[0],
                 'name': theatre[1],
                 'location': theatre[2],
-                'total_seats': theatre[3]
+                'total_seats': theatre[3],
+                'avg_rating': round(theatre[4], 2) if theatre[4] is not None else None,
+                'review_count': theatre[5]
             }
             for theatre in theatres
         ]
@@ -618,43 +1885,113 @@ class User:
         conn = self.db.get_connection()
         cursor = conn.cursor()
         cursor.execute(
-            "SELECT * FROM movies WHERE theatre_id = ?",
+            """SELECT s.id, s.film_id, s.theatre_id, s.show_times, s.ticket_price,
+                    ra.rating_sum * 1.0 / ra.review_count, COALESCE(ra.review_count, 0)
+            FROM screenings s
+            LEFT JOIN rating_aggregates ra ON ra.scope = 'movie' AND ra.entity_id = s.id
+            WHERE s.theatre_id = ? AND s.deleted_at IS NULL""",
             (theatre_id,)
         )
         movies = cursor.fetchall()
+        films = self.db.get_films(cursor, [movie[1] for movie in movies])
         conn.close()
         return [
             {
                 'id': movie[0],
-                'title': movie[1],
-                'duration': movie[2],
-                'cast_line': movie[3],
-                'genre': movie[4],
-                'theatre_id': movie[5],
-                'show_times': movie[6],
-                'ticket_price': movie[7]
+                'film_id': movie[1],
+                'title': films[movie[1]]['title'],
+                'duration': films[movie[1]]['duration'],
+                'cast_line': films[movie[1]]['cast_line'],
+                'genre': films[movie[1]]['genre'],
+                'theatre_id': movie[2],
+                'show_times': movie[3],
+                'ticket_price': movie[4],
+                'avg_rating': round(movie[5], 2) if movie[5] is not None else None,
+                'review_count': movie[6]
             }
             for movie in movies
         ]
-    def get_user_food_orders(self,user_id:int)->List[Dict]:
-        '''Get all food orders for a user'''
-        conn=self.db.get_connection()
+    def get_genres(self) -> List[Dict]:
+        """Genres currently showing anywhere, with their movie counts"""
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            """SELECT g.name, COUNT(*) FROM genres g JOIN movie_genres mg ON mg.genre_id = g.id
+               GROUP BY g.id ORDER BY g.name"""
+        )
+        genres = cursor.fetchall()
+        conn.close()
+        return [{'name': genre[0], 'movie_count': genre[1]} for genre in genres]
+    def get_movies_by_genre(self, genre: str) -> List[Dict]:
+        """Movies of a genre across all theatres (case-insensitive exact genre name)"""
+        return self._catalog_lookup(
+            "genres g JOIN movie_genres link ON link.genre_id = g.id", "g.name", genre
+        )
+    def get_movies_by_person(self, name: str) -> List[Dict]:
+        """Movies featuring a cast member across all theatres (case-insensitive exact name)"""
+        return self._catalog_lookup(
+            "people p JOIN movie_cast link ON link.person_id = p.id", "p.name", name
+        )
+    def _catalog_lookup(self, source: str, name_column: str, name: str) -> List[Dict]:
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            f"""SELECT s.id, s.film_id, s.theatre_id, t.name, s.show_times, s.ticket_price,
+                       ra.rating_sum * 1.0 / ra.review_count, COALESCE(ra.review_count, 0)
+                FROM {source}
+                JOIN screenings s ON s.id = link.movie_id
+                LEFT JOIN theatres t ON t.id = s.theatre_id
+                LEFT JOIN rating_aggregates ra ON ra.scope = 'movie' AND ra.entity_id = s.id
+                WHERE {name_column} = ?""",
+            (' '.join((name or '').split()),)
+        )
+        movies = cursor.fetchall()
+        films = self.db.get_films(cursor, [movie[1] for movie in movies])
+        conn.close()
+        movies = [
+            {
+                'id': movie[0],
+                'film_id': movie[1],
+                'title': films[movie[1]]['title'],
+                'duration': films[movie[1]]['duration'],
+                'cast_line': films[movie[1]]['cast_line'],
+                'genre': films[movie[1]]['genre'],
+                'theatre_id': movie[2],
+                'theatre_name': movie[3] or 'N/A',
+                'show_times': movie[4],
+                'ticket_price': movie[5],
+                'avg_rating': round(movie[6], 2) if movie[6] is not None else None,
+                'review_count': movie[7]
+            }
+            for movie in movies
+        ]
+        movies.sort(key=lambda movie: movie['title'].casefold())
+        return movies
+    def get_user_food_orders(self,user_id:int, limit:int=None)->List[Dict]:
+        '''Get food orders for a user, newest first (cached until the user's next write)'''
+        entry=self._activity_entry(user_id)
+        key=('food_orders', limit)
+        if key in entry:
+            return entry[key]
+        conn=self.db.get_connection(history=True)
+        tables=self.db.history_tables(conn)
         cursor=conn.cursor()
         cursor.execute(
-            ''' SELECT fo.id, fo.quantity, fo.total_price, fo.order_date,
+            f''' SELECT fo.id, fo.quantity, fo.total_price, fo.order_date,
                     s.name as snack_name, s.price as unit_price,
                     b.id as booking_id, m.title as movie_title
-                FROM food_orders fo
+                FROM {tables['food_orders']} fo
                 JOIN snacks s ON fo.snack_id=s.id
-                JOIN bookings b ON b.movie_id =b.id
+                JOIN {tables['bookings']} b ON fo.booking_id=b.id
                 JOIN movies m ON b.movie_id=m.id
                 WHERE fo.user_id=?
-                ORDER BY fo.order_date DESC''',
-            (user_id,)    
+                ORDER BY fo.order_date DESC, fo.id DESC
+                LIMIT ?''',
+            (user_id, limit if limit is not None else -1)
         )
         orders=cursor.fetchall()
         conn.close()
-        return[
+        entry[key]=[
             {
                 'id':order[0],
                 'quantity':order[1],
@@ -667,6 +2004,35 @@ class User:
             }
             for order in orders
         ]
+        return entry[key]
+    def get_food_order(self, user_id: int, order_id: int) -> Optional[Dict]:
+        """One of the user's food orders, in the shape of get_user_food_orders; None if not theirs"""
+        conn = self.db.get_connection(history=True)
+        tables = self.db.history_tables(conn)
+        cursor = conn.cursor()
+        cursor.execute(
+            f"""SELECT fo.id, fo.quantity, fo.total_price, fo.order_date, s.name, s.price, b.id, m.title
+                FROM {tables['food_orders']} fo
+                JOIN snacks s ON fo.snack_id = s.id
+                JOIN {tables['bookings']} b ON fo.booking_id = b.id
+                JOIN movies m ON b.movie_id = m.id
+                WHERE fo.id = ? AND fo.user_id = ?""",
+            (order_id, user_id)
+        )
+        order = cursor.fetchone()
+        conn.close()
+        if not order:
+            return None
+        return {
+            'id': order[0],
+            'quantity': order[1],
+            'total_price': order[2],
+            'order_date': order[3],
+            'snack_name': order[4],
+            'unit_price': order[5],
+            'booking_id': order[6],
+            'movie_title': order[7]
+        }
     def get_user_reviews(self, user_id:int)->List[Dict]:
         """Get all reviews written by a user"""
         conn=self.db.get_connection()
@@ -707,221 +2073,2454 @@ class User:
             JOIN users u ON r.user_id = u.id
             JOIN theatres t ON r.theatre_id = t.id
             LEFT JOIN movies m ON r.movie_id = m.id
+            WHERE t.deleted_at IS NULL AND m.deleted_at IS NULL
             ORDER BY r.created_at DESC"""
         )
-        reviews = cursor.fetchall()
+        reviews = cursor.fetchall()
+        conn.close()
+        
+        return [
+            {
+                'id': review[0],
+                'rating': review[1],
+                'comment': review[2],
+                'review_type': review[3],
+                'created_at': review[4],
+                'username': review[5],
+                'theatre_name': review[6],
+                'movie_title': review[7] if review[7] else 'N/A'
+            }
+            for review in reviews
+        ]
+    def get_user_bookings(self, user_id: int, limit: int = None) -> List[Dict]:
+        """Get bookings for a user, newest first (cached until the user's next write)"""
+        entry = self._activity_entry(user_id)
+        key = ('bookings', limit)
+        if key in entry:
+            return entry[key]
+        conn = self.db.get_connection(history=True)
+        tables = self.db.history_tables(conn)
+        cursor = conn.cursor()
+        cursor.execute(
+            f"""SELECT b.id, b.seats_booked, b.show_time, b.total_amount, 
+                    b.booking_date, m.title, t.name 
+            FROM {tables['bookings']} b 
+            JOIN movies m ON b.movie_id = m.id 
+            JOIN theatres t ON b.theatre_id = t.id 
+            WHERE b.user_id = ? 
+            ORDER BY b.booking_date DESC, b.id DESC
+            LIMIT ?""",
+            (user_id, limit if limit is not None else -1)
+        )
+        bookings = cursor.fetchall()
+        conn.close()
+        
+        entry[key] = [
+            {
+                'id': booking[0],
+                'seats_booked': booking[1],
+                'show_time': booking[2],
+                'total_amount': booking[3],
+                'booking_date': booking[4],
+                'movie_title': booking[5],
+                'theatre_name': booking[6]
+            }
+            for booking in bookings
+        ]
+        return entry[key]
+    def get_booking(self, user_id: int, booking_id: int) -> Optional[Dict]:
+        """One of the user's bookings, in the shape of get_user_bookings; None if not theirs"""
+        conn = self.db.get_connection(history=True)
+        tables = self.db.history_tables(conn)
+        cursor = conn.cursor()
+        cursor.execute(
+            f"""SELECT b.id, b.seats_booked, b.show_time, b.total_amount, b.booking_date, m.title, t.name
+                FROM {tables['bookings']} b
+                JOIN movies m ON b.movie_id = m.id
+                JOIN theatres t ON b.theatre_id = t.id
+                WHERE b.id = ? AND b.user_id = ?""",
+            (booking_id, user_id)
+        )
+        booking = cursor.fetchone()
+        conn.close()
+        if not booking:
+            return None
+        return {
+            'id': booking[0],
+            'seats_booked': booking[1],
+            'show_time': booking[2],
+            'total_amount': booking[3],
+            'booking_date': booking[4],
+            'movie_title': booking[5],
+            'theatre_name': booking[6]
+        }
+    def _activity_entry(self, user_id: int) -> Dict:
+        entry = self.db.activity_cache.get(user_id)
+        if entry is None:
+            entry = {}
+            self.db.activity_cache.put(user_id, entry)
+        return entry
+    def get_activity_summary(self, user_id: int) -> Dict:
+        """Dashboard summary: counters, points and most recent bookings/orders"""
+        entry = self._activity_entry(user_id)
+        if 'summary' in entry:
+            return entry['summary']
+        conn = self.db.get_connection(history=True)
+        cursor = conn.cursor()
+        cursor.execute(
+            """SELECT booking_count, food_order_count, review_count, total_spent
+               FROM user_activity_summary WHERE user_id = ?""",
+            (user_id,)
+        )
+        counters = cursor.fetchone()
+        if not counters:
+            # First read (or invalidated by a bulk delete): rebuild from history once
+            tables = self.db.history_tables(conn)
+            cursor.execute(
+                f"""SELECT (SELECT COUNT(*) FROM {tables['bookings']} WHERE user_id = ?),
+                          (SELECT COUNT(*) FROM {tables['food_orders']} WHERE user_id = ?),
+                          (SELECT COUNT(*) FROM reviews WHERE user_id = ?),
+                          (SELECT COALESCE(SUM(total_amount), 0) FROM {tables['bookings']} WHERE user_id = ?)
+                        + (SELECT COALESCE(SUM(total_price), 0) FROM {tables['food_orders']} WHERE user_id = ?)""",
+                (user_id,) * 5
+            )
+            counters = cursor.fetchone()
+            cursor.execute(
+                """INSERT OR REPLACE INTO user_activity_summary
+                   (user_id, booking_count, food_order_count, review_count, total_spent)
+                   VALUES (?, ?, ?, ?, ?)""",
+                (user_id,) + tuple(counters)
+            )
+            conn.commit()
+        cursor.execute(
+            """SELECT u.loyalty_points, ul.tier, COALESCE(ul.multiplier, 1.0)
+               FROM users u LEFT JOIN user_loyalty ul ON ul.user_id = u.id WHERE u.id = ?""",
+            (user_id,)
+        )
+        points = cursor.fetchone()
+        conn.close()
+        entry['summary'] = {
+            'booking_count': counters[0],
+            'food_order_count': counters[1],
+            'review_count': counters[2],
+            'total_spent': counters[3],
+            'loyalty_points': points[0] if points else 0,
+            'tier': points[1] if points and points[1] else DEFAULT_LOYALTY_TIERS[0][0],
+            'multiplier': points[2] if points else 1.0,
+            'recent_bookings': self.get_user_bookings(user_id, RECENT_ACTIVITY_LIMIT),
+            'recent_food_orders': self.get_user_food_orders(user_id, RECENT_ACTIVITY_LIMIT)
+        }
+        return entry['summary']
+    def get_recommendations(self, user_id: int, limit: int = RECOMMENDATION_TOP_K) -> List[Dict]:
+        """Movies for this user, best first (cached until the user's next write).
+        Reads the batch-computed list; users the last run did not score are ranked
+        from neighbour lists of their bookings, and users with no history get top-rated movies."""
+        entry = self._activity_entry(user_id)
+        key = ('recommendations', limit)
+        if key in entry:
+            return entry[key]
+        conn = self.db.get_connection(history=True)
+        tables = self.db.history_tables(conn)
+        cursor = conn.cursor()
+        cursor.execute(
+            f"""SELECT movie_id, score FROM user_recommendations
+               WHERE user_id = ? AND movie_id NOT IN (SELECT movie_id FROM {tables['bookings']} WHERE user_id = ?)
+               ORDER BY rank LIMIT ?""",
+            (user_id, user_id, limit)
+        )
+        picks = cursor.fetchall()
+        if not picks:
+            cursor.execute(
+                f"""SELECT s.similar_movie_id, SUM(s.score) FROM item_similarity s
+                   WHERE s.movie_id IN (SELECT movie_id FROM {tables['bookings']} WHERE user_id = ?)
+                   AND s.similar_movie_id NOT IN (SELECT movie_id FROM {tables['bookings']} WHERE user_id = ?)
+                   GROUP BY s.similar_movie_id ORDER BY 2 DESC LIMIT ?""",
+                (user_id, user_id, limit)
+            )
+            picks = cursor.fetchall()
+        if not picks:
+            cursor.execute(
+                f"""SELECT entity_id, rating_sum * 1.0 / review_count FROM rating_aggregates
+                   WHERE scope = 'movie' AND entity_id NOT IN (SELECT movie_id FROM {tables['bookings']} WHERE user_id = ?)
+                   ORDER BY rating_sum * 1.0 / review_count DESC LIMIT ?""",
+                (user_id, limit)
+            )
+            picks = cursor.fetchall()
+        entry[key] = self._movie_picks(cursor, picks)
+        conn.close()
+        return entry[key]
+    def get_similar_movies(self, movie_id: int, limit: int = RECOMMENDATION_TOP_K) -> List[Dict]:
+        """Customers who watched this movie also watched..."""
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            """SELECT similar_movie_id, score FROM item_similarity
+               WHERE movie_id = ? ORDER BY score DESC LIMIT ?""",
+            (movie_id, limit)
+        )
+        similar = self._movie_picks(cursor, cursor.fetchall())
+        conn.close()
+        return similar
+    def _movie_picks(self, cursor, picks) -> List[Dict]:
+        if not picks:
+            return []
+        movie_ids = [pick[0] for pick in picks]
+        cursor.execute(
+            f"""SELECT s.id, s.film_id, s.theatre_id, t.name, s.ticket_price
+                FROM screenings s LEFT JOIN theatres t ON s.theatre_id = t.id
+                WHERE s.id IN ({','.join('?' * len(movie_ids))}) AND s.deleted_at IS NULL""",
+            movie_ids
+        )
+        movies = {row[0]: row for row in cursor.fetchall()}
+        films = self.db.get_films(cursor, [movie[1] for movie in movies.values()])
+        return [
+            {
+                'movie_id': movie_id,
+                'film_id': movies[movie_id][1],
+                'title': films[movies[movie_id][1]]['title'],
+                'genre': films[movies[movie_id][1]]['genre'],
+                'theatre_id': movies[movie_id][2],
+                'theatre_name': movies[movie_id][3] or 'N/A',
+                'ticket_price': movies[movie_id][4],
+                'score': round(score, 4)
+            }
+            for movie_id, score in picks if movie_id in movies
+        ]
+    def get_available_snacks(self, theatre_id: int) -> List[Dict]:
+        """Get all snacks for a specific theatre"""
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT * FROM snacks WHERE theatre_id = ? AND available = 1 AND deleted_at IS NULL",
+            (theatre_id,)
+        )
+        snacks = cursor.fetchall()
+        conn.close()
+        
+        return [
+            {
+                'id': snack[0],
+                'name': snack[1],
+                'price': snack[2],
+                'theatre_id': snack[3]
+            }
+            for snack in snacks
+        ]
+    def get_seat_arrangement(self, theatre_id: int, movie_id: int, show_time: str) -> Dict:
+        """Get seat arrangement for a specific show"""
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        
+        # Get theatre info
+        cursor.execute("SELECT total_seats FROM theatres WHERE id = ? AND deleted_at IS NULL", (theatre_id,))
+        theatre_info = cursor.fetchone()
+        if not theatre_info:
+            return None
+        
+        total_seats = theatre_info[0]
+        
+        # Calculate rows and seats per row (assuming rectangular arrangement)
+        seats_per_row = SEATS_PER_ROW
+        rows = (total_seats + seats_per_row - 1) // seats_per_row
+        
+        # Get booked seats for this show
+        cursor.execute(
+            """SELECT seat_row, seat_number FROM seats 
+            WHERE theatre_id = ? AND movie_id = ? AND show_time = ? AND is_booked = 1""",
+            (theatre_id, movie_id, show_time)
+        )
+        booked_seats = cursor.fetchall()
+        conn.close()
+        
+        # Create seat map
+        seat_map = {}
+        for row in range(1, rows + 1):
+            seat_map[chr(64 + row)] = {}  # A, B, C, etc.
+            for seat in range(1, seats_per_row + 1):
+                if (row - 1) * seats_per_row + seat <= total_seats:
+                    seat_map[chr(64 + row)][seat] = 'Available'
+        
+        # Mark booked seats
+        for booked_seat in booked_seats:
+            row, seat_num = booked_seat
+            if row in seat_map and seat_num in seat_map[row]:
+                seat_map[row][seat_num] = 'Booked'
+        
+        return {
+            'seat_map': seat_map,
+            'rows': rows,
+            'seats_per_row': seats_per_row,
+            'total_seats': total_seats
+        }
+    def book_specific_seats(self, user_id: int, movie_id: int, theatre_id: int, 
+                        show_time: str, selected_seats: List[tuple]) -> bool:
+        """Book specific seats"""
+        try:
+            conn = self.db.get_write_connection()
+            cursor = conn.cursor()
+            
+            # Get ticket price
+            cursor.execute("SELECT ticket_price FROM movies WHERE id = ? AND deleted_at IS NULL", (movie_id,))
+            price_result = cursor.fetchone()
+            if not price_result or self._seats_taken(cursor, theatre_id, movie_id, show_time, selected_seats):
+                conn.close()
+                return False
+            
+            ticket_price = price_result[0]
+            total_amount = ticket_price * len(selected_seats)
+            multiplier = LoyaltyEngine.lookup_multiplier(cursor, user_id)
+            points_earned = int(total_amount / POINTS_EARN_UNIT * multiplier)
+            
+            # Create booking
+            cursor.execute(
+                """INSERT INTO bookings (user_id, movie_id, theatre_id, seats_booked, 
+                show_time, total_amount, points_earned) VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                (user_id, movie_id, theatre_id, len(selected_seats), show_time, total_amount, points_earned)
+            )
+            booking_id = cursor.lastrowid
+        
+            # Book individual seats
+            for seat_row, seat_number in selected_seats:
+                cursor.execute(
+                    """INSERT INTO seats (theatre_id, movie_id, show_time, seat_row, 
+                    seat_number, is_booked, booking_id) VALUES (?, ?, ?, ?, ?, 1, ?)""",
+                    (theatre_id, movie_id, show_time, seat_row, seat_number, booking_id)
+                )
+            
+            # Update loyalty points
+            cursor.execute(
+                "UPDATE users SET loyalty_points = loyalty_points + ? WHERE id = ?",
+                (points_earned, user_id)
+            )
+            SeatEvents.record(cursor, theatre_id, movie_id, show_time, 'booked', selected_seats)
+            DemandForecaster.record_booking(cursor, theatre_id, movie_id, show_time, len(selected_seats))
+            RevenueRollups.record_booking(cursor, theatre_id, movie_id, show_time, len(selected_seats), total_amount)
+            self.db.record_activity(cursor, user_id, bookings=1, spent=total_amount)
+            
+            conn.commit()
+            conn.close()
+            self.db.activity_cache.invalidate(user_id)
+            self.db.seats_booked.inc(len(selected_seats), (theatre_id,))
+            return True
+        except:
+            return False
+    def book_specific_seats_with_points(self,user_id:int, movie_id:int, theatre_id:int,
+                        show_time:str, selected_seats:List[tuple], points_to_redeem:int=0) -> bool:
+        """Book specific seats with optional loyalty points redemption""" 
+        return self.checkout(user_id, movie_id, theatre_id, show_time, selected_seats, [], points_to_redeem) is not None
+    @staticmethod
+    def _seats_taken(cursor, theatre_id: int, movie_id: int, show_time: str, seats: List[tuple]) -> bool:
+        """Whether a seat is already booked for the show or asked for twice. Run under the write
+        lock, so it holds on its own as well as backing up idx_seats_booked."""
+        if len({tuple(seat) for seat in seats}) != len(seats):
+            return True
+        cursor.execute(
+            f"""SELECT 1 FROM seats
+                WHERE theatre_id = ? AND movie_id = ? AND show_time = ? AND is_booked = 1
+                AND (seat_row, seat_number) IN (VALUES {', '.join(['(?, ?)'] * len(seats))}) LIMIT 1""",
+            (theatre_id, movie_id, show_time, *(value for seat in seats for value in seat))
+        )
+        return cursor.fetchone() is not None
+    def checkout(self, user_id: int, movie_id: int, theatre_id: int, show_time: str,
+                 selected_seats: List[tuple], snack_lines: List[tuple] = (), points_to_redeem: int = 0) -> Optional[int]:
+        """Book seats and order (snack_id, quantity) lines in one transaction, redeeming points
+        against the tickets. Returns the booking id, or None with nothing written when a seat is
+        taken, a snack is not on sale at the theatre, or the user lacks the points."""
+        conn = None
+        try:
+            conn = self.db.get_write_connection()
+            cursor = conn.cursor()
+            cursor.execute("SELECT ticket_price FROM movies WHERE id = ? AND deleted_at IS NULL", (movie_id,))
+            price_result = cursor.fetchone()
+            if not price_result or not selected_seats:
+                return None
+            if self._seats_taken(cursor, theatre_id, movie_id, show_time, selected_seats):
+                return None
+            original_cost = price_result[0] * len(selected_seats)
+            discount = (points_to_redeem // POINTS_REDEEM_BLOCK) * POINTS_REDEEM_VALUE
+            final_cost = original_cost - discount
+            multiplier = LoyaltyEngine.lookup_multiplier(cursor, user_id)
+            points_earned = int(final_cost / POINTS_EARN_UNIT * multiplier)
+            if points_to_redeem > 0:
+                cursor.execute("SELECT loyalty_points FROM users WHERE id = ?", (user_id,))
+                user_result = cursor.fetchone()
+                if not user_result or user_result[0] < points_to_redeem:
+                    return None
+            cursor.execute(
+                """INSERT INTO bookings (user_id, movie_id, theatre_id, seats_booked,
+                show_time, total_amount, points_earned) VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                (user_id, movie_id, theatre_id, len(selected_seats), show_time, final_cost, points_earned)
+            )
+            booking_id = cursor.lastrowid
+            # Should a seat be taken anyway, the unique seat index rejects it and the whole
+            # checkout rolls back
+            cursor.executemany(
+                """INSERT INTO seats (theatre_id, movie_id, show_time, seat_row,
+                seat_number, is_booked, booking_id) VALUES (?, ?, ?, ?, ?, 1, ?)""",
+                [(theatre_id, movie_id, show_time, seat_row, seat_number, booking_id)
+                 for seat_row, seat_number in selected_seats]
+            )
+            food_total = self._insert_food_lines(cursor, user_id, booking_id, theatre_id, snack_lines)
+            if food_total is None:
+                return None
+            # Subtract redeemed points, add earned points
+            cursor.execute(
+                "UPDATE users SET loyalty_points = loyalty_points + ? WHERE id = ?",
+                (points_earned - points_to_redeem, user_id)
+            )
+            SeatEvents.record(cursor, theatre_id, movie_id, show_time, 'booked', selected_seats)
+            DemandForecaster.record_booking(cursor, theatre_id, movie_id, show_time, len(selected_seats))
+            RevenueRollups.record_booking(cursor, theatre_id, movie_id, show_time, len(selected_seats), final_cost)
+            self.db.record_activity(cursor, user_id, bookings=1, food_orders=len(snack_lines),
+                                    spent=final_cost + food_total)
+            conn.commit()
+        except Exception:
+            return None
+        finally:
+            if conn:
+                conn.close()
+        self.db.activity_cache.invalidate(user_id)
+        self.db.seats_booked.inc(len(selected_seats), (theatre_id,))
+        return booking_id
+def instrumented(name: str, method, outcomes: bool):
+    """Wrap a public method to time it into cine_operation_seconds, count successes and
+    failures of `outcomes` operations, and name the statements it issues for the tracer.
+    Nested operations (checkout inside a seat booking) are timed by the outermost only."""
+    labels = (name,)
+    def wrapper(self, *args, **kwargs):
+        if QueryTracer.operation.get():
+            return method(self, *args, **kwargs)
+        token = QueryTracer.operation.set(name)
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            result = method(self, *args, **kwargs)
+            outcome = 'success' if result else 'failure'
+            return result
+        finally:
+            QueryTracer.operation.reset(token)
+            self.db.operation_seconds.observe(time.perf_counter() - started, labels)
+            if outcomes:
+                self.db.operation_outcomes.inc(1, (name, outcome))
+    wrapper.__name__, wrapper.__qualname__, wrapper.__doc__ = method.__name__, method.__qualname__, method.__doc__
+    wrapper.__wrapped__ = method
+    return wrapper
+# Every public operation is timed and names its traced statements; generators are left
+# alone since their statements run after the call returns
+for _role in (Admin, Manager, User):
+    for _name, _method in list(vars(_role).items()):
+        if inspect.isfunction(_method) and not _name.startswith('_') and not inspect.isgeneratorfunction(_method):
+            setattr(_role, _name, instrumented(f"{_role.__name__}.{_name}", _method, _name in OUTCOME_OPERATIONS))
+class LoyaltyEngine:
+    """Assigns loyalty tiers from trailing-12-month spend.
+    The tier job is incremental: it only reads bookings and food orders added since
+    its last watermark, folds them into per-user monthly spend buckets and re-rates
+    the users whose window changed. Booking paths read the stored multiplier."""
+    JOB_NAME = 'loyalty_tiers'
+    def __init__(self, db: Database):
+        self.db = db
+    @staticmethod
+    def lookup_multiplier(cursor, user_id: int) -> float:
+        cursor.execute("SELECT multiplier FROM user_loyalty WHERE user_id = ?", (user_id,))
+        result = cursor.fetchone()
+        return result[0] if result else 1.0
+    @staticmethod
+    def window_start_month(today: datetime.date = None) -> str:
+        """First month (YYYY-MM) inside the trailing loyalty window"""
+        today = today or datetime.datetime.now(datetime.timezone.utc).date()
+        year, month = today.year, today.month - (LOYALTY_WINDOW_MONTHS - 1)
+        while month <= 0:
+            month += 12
+            year -= 1
+        return f"{year:04d}-{month:02d}"
+    def get_tiers(self) -> List[Dict]:
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT name, min_spend, multiplier FROM loyalty_tiers ORDER BY min_spend")
+        tiers = cursor.fetchall()
+        conn.close()
+        return [
+            {
+                'name': tier[0],
+                'min_spend': tier[1],
+                'multiplier': tier[2]
+            }
+            for tier in tiers
+        ]
+    def set_tier(self, name: str, min_spend: float, multiplier: float) -> bool:
+        """Add or update a tier and re-rate every user against the new thresholds"""
+        try:
+            conn = self.db.get_connection()
+            cursor = conn.cursor()
+            cursor.execute(
+                """INSERT INTO loyalty_tiers (name, min_spend, multiplier) VALUES (?, ?, ?)
+                   ON CONFLICT(name) DO UPDATE SET min_spend = excluded.min_spend,
+                   multiplier = excluded.multiplier""",
+                (name, min_spend, multiplier)
+            )
+            cursor.execute("SELECT user_id FROM user_loyalty")
+            user_ids = {row[0] for row in cursor.fetchall()}
+            self._rate_users(cursor, user_ids)
+            conn.commit()
+            conn.close()
+            self.db.activity_cache.clear()
+            return True
+        except:
+            return False
+    def get_user_tier(self, user_id: int) -> Dict:
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT tier, multiplier, trailing_spend, updated_at FROM user_loyalty WHERE user_id = ?",
+            (user_id,)
+        )
+        result = cursor.fetchone()
+        if not result:
+            cursor.execute("SELECT name, multiplier FROM loyalty_tiers ORDER BY min_spend LIMIT 1")
+            base = cursor.fetchone()
+            conn.close()
+            return {
+                'tier': base[0] if base else 'Bronze',
+                'multiplier': 1.0,
+                'trailing_spend': 0,
+                'updated_at': None
+            }
+        conn.close()
+        return {
+            'tier': result[0],
+            'multiplier': result[1],
+            'trailing_spend': result[2],
+            'updated_at': result[3]
+        }
+    def run_tier_job(self) -> Dict:
+        """Fold new bookings/food orders into monthly buckets and re-rate affected users"""
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        window_start = self.window_start_month()
+        buckets = {}
+        processed = {}
+        sources = [
+            ('bookings', "SELECT id, user_id, substr(booking_date, 1, 7), total_amount FROM bookings WHERE id > ? ORDER BY id"),
+            ('food_orders', "SELECT id, user_id, substr(order_date, 1, 7), total_price FROM food_orders WHERE id > ? ORDER BY id"),
+        ]
+        for source, query in sources:
+            last_id = self.db.get_watermark(cursor, self.JOB_NAME, source)
+            cursor.execute(query, (last_id,))
+            rows = cursor.fetchall()
+            for row_id, user_id, month, amount in rows:
+                last_id = row_id
+                if user_id is None or not month or month < window_start:
+                    continue
+                key = (user_id, month)
+                buckets[key] = buckets.get(key, 0) + (amount or 0)
+            processed[source] = len(rows)
+            self.db.set_watermark(cursor, self.JOB_NAME, source, last_id)
+        cursor.executemany(
+            """INSERT INTO user_spend_monthly (user_id, month, amount) VALUES (?, ?, ?)
+               ON CONFLICT(user_id, month) DO UPDATE SET amount = amount + excluded.amount""",
+            [(user_id, month, amount) for (user_id, month), amount in buckets.items()]
+        )
+        affected = {user_id for user_id, _ in buckets}
+        # Users whose oldest months just rolled out of the window need re-rating too
+        cursor.execute("SELECT DISTINCT user_id FROM user_spend_monthly WHERE month < ?", (window_start,))
+        affected.update(row[0] for row in cursor.fetchall())
+        cursor.execute("DELETE FROM user_spend_monthly WHERE month < ?", (window_start,))
+        self._rate_users(cursor, affected)
+        conn.commit()
+        conn.close()
+        for user_id in affected:
+            self.db.activity_cache.invalidate(user_id)
+        return {
+            'bookings_processed': processed['bookings'],
+            'food_orders_processed': processed['food_orders'],
+            'users_rated': len(affected)
+        }
+    def _rate_users(self, cursor, user_ids):
+        cursor.execute("SELECT name, min_spend, multiplier FROM loyalty_tiers ORDER BY min_spend DESC")
+        tiers = cursor.fetchall()
+        if not tiers or not user_ids:
+            return
+        updates = []
+        for user_id in user_ids:
+            cursor.execute("SELECT COALESCE(SUM(amount), 0) FROM user_spend_monthly WHERE user_id = ?", (user_id,))
+            spend = cursor.fetchone()[0]
+            name, _, multiplier = next((tier for tier in tiers if spend >= tier[1]), tiers[-1])
+            updates.append((user_id, name, multiplier, spend))
+        cursor.executemany(
+            """INSERT INTO user_loyalty (user_id, tier, multiplier, trailing_spend) VALUES (?, ?, ?, ?)
+               ON CONFLICT(user_id) DO UPDATE SET tier = excluded.tier, multiplier = excluded.multiplier,
+               trailing_spend = excluded.trailing_spend, updated_at = CURRENT_TIMESTAMP""",
+            updates
+        )
+class RatingAggregates:
+    """Per-movie and per-theatre rating counters (count, sum, 1-5 histogram, last review).
+    Movie reviews roll up to their movie, theatre reviews to their theatre. Rows are
+    updated in the same transaction as the review insert/delete."""
+    HISTOGRAM = ['rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5']
+    def __init__(self, db: Database):
+        self.db = db
+    @staticmethod
+    def scope_for(review_type: str, theatre_id: int, movie_id: int = None) -> tuple:
+        if review_type == 'movie':
+            return 'movie', movie_id
+        return 'theatre', theatre_id
+    @staticmethod
+    def apply(cursor, review_type: str, theatre_id: int, movie_id: int, rating: int, sign: int = 1):
+        """Add (sign=1) or remove (sign=-1) one rating from its aggregate row"""
+        scope, entity_id = RatingAggregates.scope_for(review_type, theatre_id, movie_id)
+        if entity_id is None or not 1 <= rating <= 5:
+            return
+        # Listings show the averages, so their version moves with the aggregate
+        if scope == 'movie':
+            CatalogVersions.bump(cursor, 'movies', "SELECT theatre_id FROM screenings WHERE id = ?", (entity_id,))
+        else:
+            CatalogVersions.bump(cursor, 'theatres')
+        bucket = RatingAggregates.HISTOGRAM[rating - 1]
+        if sign > 0:
+            cursor.execute(
+                f"""INSERT INTO rating_aggregates (scope, entity_id, review_count, rating_sum, {bucket}, last_review_at)
+                    VALUES (?, ?, 1, ?, 1, CURRENT_TIMESTAMP)
+                    ON CONFLICT(scope, entity_id) DO UPDATE SET review_count = review_count + 1,
+                    rating_sum = rating_sum + excluded.rating_sum, {bucket} = {bucket} + 1,
+                    last_review_at = excluded.last_review_at""",
+                (scope, entity_id, rating)
+            )
+            return
+        column = 'movie_id' if scope == 'movie' else 'theatre_id'
+        cursor.execute(
+            f"""UPDATE rating_aggregates SET review_count = review_count - 1, rating_sum = rating_sum - ?,
+                {bucket} = {bucket} - 1,
+                last_review_at = (SELECT MAX(created_at) FROM reviews WHERE {column} = ? AND review_type = ?)
+                WHERE scope = ? AND entity_id = ?""",
+            (rating, entity_id, scope, scope, entity_id)
+        )
+        cursor.execute(
+            "DELETE FROM rating_aggregates WHERE scope = ? AND entity_id = ? AND review_count <= 0",
+            (scope, entity_id)
+        )
+    @staticmethod
+    def drop(cursor, scope: str, entity_query: str, params: tuple = ()):
+        """Remove aggregates for entities whose reviews were bulk-deleted"""
+        cursor.execute(
+            f"DELETE FROM rating_aggregates WHERE scope = ? AND entity_id IN ({entity_query})",
+            (scope,) + tuple(params)
+        )
+    @staticmethod
+    def _to_dict(row) -> Dict:
+        count, total = row[2], row[3]
+        return {
+            'scope': row[0],
+            'entity_id': row[1],
+            'review_count': count,
+            'avg_rating': round(total / count, 2) if count else None,
+            'histogram': {star: row[3 + star] for star in range(1, 6)},
+            'last_review_at': row[9]
+        }
+    def get_rating(self, scope: str, entity_id: int) -> Optional[Dict]:
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            """SELECT scope, entity_id, review_count, rating_sum, rating_1, rating_2, rating_3,
+                      rating_4, rating_5, last_review_at
+               FROM rating_aggregates WHERE scope = ? AND entity_id = ?""",
+            (scope, entity_id)
+        )
+        result = cursor.fetchone()
+        conn.close()
+        return self._to_dict(result) if result else None
+    def get_film_rating(self, film_id: int) -> Optional[Dict]:
+        """A film's rating across all theatres, summed from its screenings' rows"""
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            """SELECT 'film', ?, SUM(review_count), SUM(rating_sum), SUM(rating_1), SUM(rating_2),
+                      SUM(rating_3), SUM(rating_4), SUM(rating_5), MAX(last_review_at)
+               FROM rating_aggregates
+               WHERE scope = 'movie'
+               AND entity_id IN (SELECT id FROM screenings WHERE film_id = ? AND deleted_at IS NULL)""",
+            (film_id, film_id)
+        )
+        result = cursor.fetchone()
+        conn.close()
+        return self._to_dict(result) if result[2] else None
+    def get_movie_rating(self, movie_id: int) -> Optional[Dict]:
+        return self.get_rating('movie', movie_id)
+    def get_theatre_rating(self, theatre_id: int) -> Optional[Dict]:
+        return self.get_rating('theatre', theatre_id)
+    def top_rated(self, scope: str = 'movie', limit: int = 10, min_reviews: int = 1) -> List[Dict]:
+        """Highest average rating first, read from the aggregate index; soft-deleted movies and
+        theatres are skipped"""
+        live = "screenings" if scope == 'movie' else "theatres"
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            f"""SELECT scope, entity_id, review_count, rating_sum, rating_1, rating_2, rating_3,
+                      rating_4, rating_5, last_review_at
+               FROM rating_aggregates
+               WHERE scope = ? AND review_count >= ?
+               AND EXISTS (SELECT 1 FROM {live} WHERE id = entity_id AND deleted_at IS NULL)
+               ORDER BY rating_sum * 1.0 / review_count DESC
+               LIMIT ?""",
+            (scope, min_reviews, limit)
+        )
+        results = cursor.fetchall()
+        conn.close()
+        return [self._to_dict(result) for result in results]
+    def top_rated_movies(self, limit: int = 10, min_reviews: int = 1) -> List[Dict]:
+        ratings = self.top_rated('movie', limit, min_reviews)
+        if not ratings:
+            return ratings
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        movie_ids = [rating['entity_id'] for rating in ratings]
+        cursor.execute(
+            f"""SELECT m.id, m.title, t.name FROM movies m LEFT JOIN theatres t ON m.theatre_id = t.id
+                WHERE m.id IN ({','.join('?' * len(movie_ids))}) AND m.deleted_at IS NULL""",
+            movie_ids
+        )
+        titles = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+        conn.close()
+        for rating in ratings:
+            rating['movie_title'], rating['theatre_name'] = titles.get(rating['entity_id'], ('N/A', 'N/A'))
+        return ratings
+    def rebuild(self) -> int:
+        """Recompute every aggregate from the reviews table; returns rows written"""
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        written = self.rebuild_rows(cursor)
+        conn.commit()
+        conn.close()
+        return written
+    @staticmethod
+    def rebuild_rows(cursor) -> int:
+        """Reviews of soft-deleted screenings and theatres are left out, as drop() left them"""
+        cursor.execute("DELETE FROM rating_aggregates")
+        histogram = ', '.join(f"SUM(r.rating = {star})" for star in range(1, 6))
+        for scope, column, live in (('movie', 'movie_id', 'screenings'), ('theatre', 'theatre_id', 'theatres')):
+            cursor.execute(
+                f"""INSERT INTO rating_aggregates (scope, entity_id, review_count, rating_sum, rating_1,
+                        rating_2, rating_3, rating_4, rating_5, last_review_at)
+                    SELECT ?, r.{column}, COUNT(*), SUM(r.rating), {histogram}, MAX(r.created_at)
+                    FROM reviews r
+                    JOIN {live} e ON e.id = r.{column} AND e.deleted_at IS NULL
+                    WHERE r.review_type = ?
+                    GROUP BY r.{column}""",
+                (scope, scope)
+            )
+        CatalogVersions.bump(cursor, 'catalog')
+        cursor.execute("SELECT COUNT(*) FROM rating_aggregates")
+        return cursor.fetchone()[0]
+class CatalogSearch:
+    """Ranked full-text search over movies (title/cast/genre) and review comments"""
+    def __init__(self, db: Database):
+        self.db = db
+    @staticmethod
+    def build_match_query(text: str) -> str:
+        """Turn free text into an FTS5 query where every word is a prefix term"""
+        return ' '.join(f'"{token}"*' for token in re.findall(r'\w+', text))
+    def search_movies(self, text: str, limit: int = 20, mark: tuple = ('[', ']')) -> List[Dict]:
+        """Best-ranked movies first; matched words are wrapped in mark in the snippet"""
+        match = self.build_match_query(text)
+        if not match:
+            return []
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        if self.db.fts_enabled:
+            cursor.execute(
+                """SELECT m.id, m.title, m.cast_line, m.genre, m.theatre_id, t.name, m.ticket_price,
+                        hits.snippet, hits.score
+                FROM (SELECT movies_fts.rowid, snippet(movies_fts, -1, ?, ?, '...', 10) AS snippet,
+                             bm25(movies_fts, 10.0, 4.0, 2.0) AS score
+                      FROM movies_fts JOIN screenings s ON s.id = movies_fts.rowid AND s.deleted_at IS NULL
+                      WHERE movies_fts MATCH ? ORDER BY score LIMIT ?) hits
+                JOIN movies m ON m.id = hits.rowid
+                LEFT JOIN theatres t ON t.id = m.theatre_id
+                ORDER BY hits.score""",
+                (mark[0], mark[1], match, limit)
+            )
+        else:
+            pattern = f"%{text.strip()}%"
+            cursor.execute(
+                """SELECT m.id, m.title, m.cast_line, m.genre, m.theatre_id, t.name, m.ticket_price,
+                        m.title, 0
+                FROM movies m LEFT JOIN theatres t ON t.id = m.theatre_id
+                WHERE m.deleted_at IS NULL AND (m.title LIKE ? OR m.cast_line LIKE ? OR m.genre LIKE ?)
+                LIMIT ?""",
+                (pattern, pattern, pattern, limit)
+            )
+        movies = cursor.fetchall()
+        conn.close()
+        return [
+            {
+                'id': movie[0],
+                'title': movie[1],
+                'cast_line': movie[2],
+                'genre': movie[3],
+                'theatre_id': movie[4],
+                'theatre_name': movie[5],
+                'ticket_price': movie[6],
+                'snippet': movie[7],
+                'score': movie[8]
+            }
+            for movie in movies
+        ]
+    def search_reviews(self, text: str, limit: int = 20, mark: tuple = ('[', ']')) -> List[Dict]:
+        match = self.build_match_query(text)
+        if not match:
+            return []
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        if self.db.fts_enabled:
+            cursor.execute(
+                """SELECT r.id, r.rating, r.review_type, r.created_at, u.username, t.name, m.title,
+                        hits.snippet, hits.score
+                FROM (SELECT reviews_fts.rowid, snippet(reviews_fts, 0, ?, ?, '...', 12) AS snippet,
+                             bm25(reviews_fts) AS score
+                      FROM reviews_fts
+                      JOIN reviews lr ON lr.id = reviews_fts.rowid
+                      JOIN theatres lt ON lt.id = lr.theatre_id AND lt.deleted_at IS NULL
+                      LEFT JOIN screenings ls ON ls.id = lr.movie_id
+                      WHERE reviews_fts MATCH ? AND ls.deleted_at IS NULL ORDER BY score LIMIT ?) hits
+                JOIN reviews r ON r.id = hits.rowid
+                JOIN users u ON r.user_id = u.id
+                JOIN theatres t ON r.theatre_id = t.id
+                LEFT JOIN movies m ON r.movie_id = m.id
+                ORDER BY hits.score""",
+                (mark[0], mark[1], match, limit)
+            )
+        else:
+            cursor.execute(
+                """SELECT r.id, r.rating, r.review_type, r.created_at, u.username, t.name, m.title,
+                        r.comment, 0
+                FROM reviews r
+                JOIN users u ON r.user_id = u.id
+                JOIN theatres t ON r.theatre_id = t.id
+                LEFT JOIN movies m ON r.movie_id = m.id
+                WHERE r.comment LIKE ? AND t.deleted_at IS NULL AND m.deleted_at IS NULL
+                LIMIT ?""",
+                (f"%{text.strip()}%", limit)
+            )
+        reviews = cursor.fetchall()
+        conn.close()
+        return [
+            {
+                'id': review[0],
+                'rating': review[1],
+                'review_type': review[2],
+                'created_at': review[3],
+                'username': review[4],
+                'theatre_name': review[5],
+                'movie_title': review[6] if review[6] else 'N/A',
+                'snippet': review[7],
+                'score': review[8]
+            }
+            for review in reviews
+        ]
+    def rebuild(self):
+        """Re-index both search tables from their content tables"""
+        if not self.db.fts_enabled:
+            return
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO movies_fts (movies_fts) VALUES ('rebuild')")
+        cursor.execute("INSERT INTO reviews_fts (reviews_fts) VALUES ('rebuild')")
+        conn.commit()
+        conn.close()
+class CatalogIndex:
+    """Normalized genre and cast tables behind movies.genre / movies.cast_line.
+    The free-text columns stay the source of truth; they are tokenized into
+    genres/people rows with many-to-many links whenever a movie is written.
+    Link tables are keyed (term, movie) so lookups are index range scans."""
+    SEPARATORS = re.compile(r"\s*(?:[,/|;&]|\band\b)\s*", re.IGNORECASE)
+    @staticmethod
+    def split_terms(text: str) -> List[str]:
+        """'Action / Sci-Fi, thriller' -> ['Action', 'Sci-Fi', 'thriller'] (case-insensitive dedupe)"""
+        terms = []
+        seen = set()
+        for term in CatalogIndex.SEPARATORS.split(text or ''):
+            term = ' '.join(term.split())
+            if term and term.casefold() not in seen:
+                seen.add(term.casefold())
+                terms.append(term)
+        return terms
+    @staticmethod
+    def _term_id(cursor, table: str, name: str) -> int:
+        cursor.execute(f"INSERT INTO {table} (name) VALUES (?) ON CONFLICT(name) DO NOTHING", (name,))
+        cursor.execute(f"SELECT id FROM {table} WHERE name = ?", (name,))
+        return cursor.fetchone()[0]
+    @staticmethod
+    def link(cursor, movie_id: int, genre: str, cast_line: str):
+        """(Re)link one movie to its genres and cast inside the caller's transaction"""
+        cursor.execute("DELETE FROM movie_genres WHERE movie_id = ?", (movie_id,))
+        cursor.execute("DELETE FROM movie_cast WHERE movie_id = ?", (movie_id,))
+        cursor.executemany(
+            "INSERT INTO movie_genres (genre_id, movie_id) VALUES (?, ?)",
+            [(CatalogIndex._term_id(cursor, 'genres', name), movie_id) for name in CatalogIndex.split_terms(genre)]
+        )
+        cursor.executemany(
+            "INSERT INTO movie_cast (person_id, movie_id, billing) VALUES (?, ?, ?)",
+            [
+                (CatalogIndex._term_id(cursor, 'people', name), movie_id, billing)
+                for billing, name in enumerate(CatalogIndex.split_terms(cast_line), 1)
+            ]
+        )
+    @staticmethod
+    def unlink(cursor, movie_query: str, params: tuple = ()):
+        cursor.execute(f"DELETE FROM movie_genres WHERE movie_id IN ({movie_query})", params)
+        cursor.execute(f"DELETE FROM movie_cast WHERE movie_id IN ({movie_query})", params)
+    @staticmethod
+    def rebuild_rows(cursor) -> int:
+        """Tokenize every movie's genre and cast line; returns movies indexed"""
+        cursor.execute("DELETE FROM movie_genres")
+        cursor.execute("DELETE FROM movie_cast")
+        cursor.execute("SELECT id, genre, cast_line FROM movies WHERE deleted_at IS NULL")
+        movies = cursor.fetchall()
+        for movie_id, genre, cast_line in movies:
+            CatalogIndex.link(cursor, movie_id, genre, cast_line)
+        # Terms no longer used by any movie
+        cursor.execute("DELETE FROM genres WHERE id NOT IN (SELECT genre_id FROM movie_genres)")
+        cursor.execute("DELETE FROM people WHERE id NOT IN (SELECT person_id FROM movie_cast)")
+        return len(movies)
+class FilmCatalog:
+    """Global films shared by per-theatre screenings.
+    A film is identified by its title (ignoring case and spacing) plus duration,
+    so a theatre adding a film another theatre already shows reuses that row."""
+    def __init__(self, db: Database):
+        self.db = db
+    @staticmethod
+    def title_key(title: str) -> str:
+        return ' '.join((title or '').split()).casefold()
+    @staticmethod
+    def resolve(cursor, title: str, duration: int, cast_line: str, genre: str, relink: bool = True) -> int:
+        """Id of the matching film, created if new; blank details are filled in"""
+        key = FilmCatalog.title_key(title)
+        cursor.execute("SELECT id, cast_line, genre FROM films WHERE title_key = ? AND duration = ?", (key, duration))
+        film = cursor.fetchone()
+        if not film:
+            cursor.execute(
+                "INSERT INTO films (title, title_key, duration, cast_line, genre) VALUES (?, ?, ?, ?, ?)",
+                (' '.join(title.split()), key, duration, cast_line, genre)
+            )
+            return cursor.lastrowid
+        if (not film[1] and cast_line) or (not film[2] and genre):
+            cursor.execute(
+                """UPDATE films SET cast_line = COALESCE(NULLIF(cast_line, ''), ?),
+                   genre = COALESCE(NULLIF(genre, ''), ?) WHERE id = ?""",
+                (cast_line, genre, film[0])
+            )
+            if relink:
+                FilmCatalog.relink(cursor, film[0])
+        return film[0]
+    @staticmethod
+    def relink(cursor, film_id: int, screening_id: int = None):
+        """Refresh the genre/cast index of one screening, or every screening, of a film"""
+        cursor.execute("SELECT cast_line, genre FROM films WHERE id = ?", (film_id,))
+        cast_line, genre = cursor.fetchone()
+        if screening_id is not None:
+            CatalogIndex.link(cursor, screening_id, genre, cast_line)
+            return
+        cursor.execute("SELECT id FROM screenings WHERE film_id = ? AND deleted_at IS NULL", (film_id,))
+        for (screening_id,) in cursor.fetchall():
+            CatalogIndex.link(cursor, screening_id, genre, cast_line)
+    @staticmethod
+    def prune(cursor):
+        """Remove films no theatre screens any more"""
+        cursor.execute("DELETE FROM films WHERE NOT EXISTS (SELECT 1 FROM screenings s WHERE s.film_id = films.id)")
+    @staticmethod
+    def migrate_rows(cursor) -> int:
+        """Split the legacy movies table into films + screenings; returns films created.
+        Renaming keeps movie ids (now screening ids) and rewrites foreign keys that
+        referenced movies; the film columns are then dropped from the screenings."""
+        cursor.execute("SELECT id, title, duration, cast_line, genre FROM movies ORDER BY id")
+        assignments = [
+            (FilmCatalog.resolve(cursor, title, duration, cast_line, genre, relink=False), movie_id)
+            for movie_id, title, duration, cast_line, genre in cursor.fetchall()
+        ]
+        cursor.execute("ALTER TABLE movies ADD COLUMN film_id INTEGER REFERENCES films (id)")
+        cursor.executemany("UPDATE movies SET film_id = ? WHERE id = ?", assignments)
+        for trigger in ('movies_fts_insert', 'movies_fts_delete', 'movies_fts_update'):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        cursor.execute("ALTER TABLE movies RENAME TO screenings")
+        for column in ('title', 'duration', 'cast_line', 'genre'):
+            cursor.execute(f"ALTER TABLE screenings DROP COLUMN {column}")
+        cursor.execute("SELECT COUNT(*) FROM films")
+        return cursor.fetchone()[0]
+    def get_film(self, film_id: int) -> Optional[Dict]:
+        """Film details with every theatre screening it and its combined rating"""
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        film = self.db.get_films(cursor, [film_id]).get(film_id)
+        if not film:
+            conn.close()
+            return None
+        cursor.execute(
+            """SELECT s.id, s.theatre_id, t.name, s.show_times, s.ticket_price
+               FROM screenings s LEFT JOIN theatres t ON t.id = s.theatre_id
+               WHERE s.film_id = ? AND s.deleted_at IS NULL ORDER BY t.name""",
+            (film_id,)
+        )
+        screenings = cursor.fetchall()
+        conn.close()
+        return dict(
+            film,
+            id=film_id,
+            rating=RatingAggregates(self.db).get_film_rating(film_id),
+            screenings=[
+                {
+                    'movie_id': screening[0],
+                    'theatre_id': screening[1],
+                    'theatre_name': screening[2] or 'N/A',
+                    'show_times': screening[3],
+                    'ticket_price': screening[4]
+                }
+                for screening in screenings
+            ]
+        )
+class CatalogVersions:
+    """Version stamps for the public catalog listings: 'theatres' (scope 0), and 'movies' and
+    'snacks' per theatre id. Writers bump them in their own transaction; the 'catalog' row is a
+    generation that rebuilds bump to move every stamp at once. Readers poll PRAGMA data_version,
+    which only checks the WAL index, and re-read the table after some connection has committed."""
+    def __init__(self, db: Database):
+        self.db = db
+        self._conn = None
+        self._data_version = None
+        self._versions = {}
+        self._lock = threading.Lock()
+    @staticmethod
+    def seed(cursor):
+        # Start the generation at the creation time so a recreated database never reuses a stamp
+        cursor.execute(
+            """INSERT OR IGNORE INTO catalog_versions (resource, scope_id, version)
+               VALUES ('catalog', 0, CAST(STRFTIME('%s') AS INTEGER))"""
+        )
+    @staticmethod
+    def bump(cursor, resource: str, scope_query: str = "SELECT 0", params: tuple = ()):
+        """Advance the version of `resource` for every scope id returned by scope_query"""
+        cursor.execute(
+            f"""INSERT INTO catalog_versions (resource, scope_id, version)
+                SELECT DISTINCT ?, scope.*, 1 FROM ({scope_query}) scope WHERE true
+                ON CONFLICT(resource, scope_id) DO UPDATE SET version = version + 1""",
+            (resource,) + tuple(params)
+        )
+    def snapshot(self) -> Dict[tuple, int]:
+        """All stamps keyed by (resource, scope_id); cheap while nothing has been committed"""
+        with self._lock:
+            if self._conn is None:
+                self._conn = sqlite3.connect(self.db.db_name, check_same_thread=False)
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version != self._data_version:
+                self._versions = {
+                    (resource, scope_id): version for resource, scope_id, version in
+                    self._conn.execute("SELECT resource, scope_id, version FROM catalog_versions")
+                }
+                self._data_version = data_version
+            return self._versions
+    def etag(self, resource: str, scope_id: int = 0) -> str:
+        versions = self.snapshot()
+        return f'W/"{versions.get(("catalog", 0), 0)}.{versions.get((resource, scope_id), 0)}"'
+class SeatEvents:
+    """Seat deltas per show ('booked' today), appended in the booking transaction so a delta
+    becomes visible to every process exactly when its seats commit. Event ids are the cursor
+    live seat maps resume from; the oldest events beyond SEAT_EVENT_RETENTION are dropped."""
+    def __init__(self, db: Database):
+        self.db = db
+        self._conn = None
+        self._lock = threading.Lock()
+    @staticmethod
+    def seat_label(seat_row: str, seat_number: int) -> str:
+        return f"{seat_row}{seat_number}"
+    @staticmethod
+    def record(cursor, theatre_id: int, movie_id: int, show_time: str, state: str, seats: List[tuple]):
+        cursor.execute(
+            "INSERT INTO seat_events (theatre_id, movie_id, show_time, state, seats) VALUES (?, ?, ?, ?, ?)",
+            (theatre_id, movie_id, show_time, state, ','.join(SeatEvents.seat_label(*seat) for seat in seats))
+        )
+        cursor.execute("DELETE FROM seat_events WHERE id <= ?", (cursor.lastrowid - SEAT_EVENT_RETENTION,))
+    @staticmethod
+    def _to_dict(row) -> Dict:
+        return {
+            'id': row[0],
+            'theatre_id': row[1],
+            'movie_id': row[2],
+            'show_time': row[3],
+            'state': row[4],
+            'seats': row[5].split(',')
+        }
+    def last_id(self) -> int:
+        conn = self.db.get_connection()
+        last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM seat_events").fetchone()[0]
+        conn.close()
+        return last_id
+    def since(self, after_id: int, limit: int = 1000) -> List[Dict]:
+        """Events of every show after after_id, for a single tailing reader per process"""
+        with self._lock:
+            if self._conn is None:
+                self._conn = sqlite3.connect(self.db.db_name, check_same_thread=False)
+            rows = self._conn.execute(
+                """SELECT id, theatre_id, movie_id, show_time, state, seats FROM seat_events
+                   WHERE id > ? ORDER BY id LIMIT ?""",
+                (after_id, limit)
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+    def replay(self, theatre_id: int, movie_id: int, show_time: str, after_id: int) -> Optional[List[Dict]]:
+        """One show's events after after_id, or None if some of them were already dropped"""
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT MIN(id), MAX(id) FROM seat_events")
+        oldest, newest = cursor.fetchone()
+        if oldest is None or not oldest - 1 <= after_id <= newest:
+            conn.close()
+            return None
+        cursor.execute(
+            """SELECT id, theatre_id, movie_id, show_time, state, seats FROM seat_events
+               WHERE theatre_id = ? AND movie_id = ? AND show_time = ? AND id > ? ORDER BY id""",
+            (theatre_id, movie_id, show_time, after_id)
+        )
+        events = [self._to_dict(row) for row in cursor.fetchall()]
+        conn.close()
+        return events
+    def snapshot(self, theatre_id: int, movie_id: int, show_time: str) -> Optional[Dict]:
+        """Booked seats of a show and the last event id they include, read in one transaction"""
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("BEGIN")
+        cursor.execute("SELECT total_seats FROM theatres WHERE id = ? AND deleted_at IS NULL", (theatre_id,))
+        theatre = cursor.fetchone()
+        if not theatre:
+            conn.close()
+            return None
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM seat_events")
+        event_id = cursor.fetchone()[0]
+        cursor.execute(
+            """SELECT seat_row, seat_number FROM seats
+               WHERE theatre_id = ? AND movie_id = ? AND show_time = ? AND is_booked = 1""",
+            (theatre_id, movie_id, show_time)
+        )
+        booked = [self.seat_label(*seat) for seat in cursor.fetchall()]
+        conn.close()
+        return {
+            'event_id': event_id,
+            'rows': (theatre[0] + SEATS_PER_ROW - 1) // SEATS_PER_ROW,
+            'seats_per_row': SEATS_PER_ROW,
+            'total_seats': theatre[0],
+            'booked': booked
+        }
+class HistoryPurger:
+    """Garbage collector for soft-deleted theatres, screenings and snacks. collect() removes the
+    rows themselves once they are past retention and queues a purge_jobs row for their history,
+    which purge_batch() then deletes in short batches; doing millions of history deletes in one
+    transaction would hold the write lock for seconds and stall every booking. Bookings go
+    first so ON DELETE CASCADE takes their seats and food orders along; the other steps sweep
+    what is left. Archived bookings go last, with their seats and food orders by hand since the
+    archive has no foreign keys."""
+    STEPS = [('bookings', 'id'), ('reviews', 'id'), ('seats', 'id'), ('seat_events', 'id'), ('show_demand', 'rowid')]
+    def __init__(self, db: Database, batch_size: int = PURGE_BATCH_SIZE):
+        self.db = db
+        self.batch_size = batch_size
+        self.archiver = HistoryArchiver(db)
+        self._thread = None
+    @staticmethod
+    def enqueue(cursor, theatre_id: int, movie_id: int = None):
+        """Queue the history of a theatre (or of one of its screenings) for purging"""
+        cursor.execute("INSERT INTO purge_jobs (theatre_id, movie_id) VALUES (?, ?)", (theatre_id, movie_id))
+    @staticmethod
+    def off_peak(now: datetime.datetime = None) -> bool:
+        hour = (now or datetime.datetime.now()).hour
+        return GC_HOURS[0] <= hour < GC_HOURS[1]
+    def collect(self, retention_days: int = SOFT_DELETE_RETENTION_DAYS) -> Dict[str, int]:
+        """Hard-delete theatres, screenings and snacks soft-deleted more than retention_days ago,
+        queueing their bookings, reviews and seats for purge_batch. Food orders of collected
+        snacks are deleted here. Returns how many of each entity were removed."""
+        cutoff = f"-{retention_days} days"
+        # Foreign keys off: history is left for purge_batch instead of cascading inline
+        conn = self.db.get_write_connection(foreign_keys=False, archive=True)
+        cursor = conn.cursor()
+        try:
+            archived = self.archived(cursor)
+            cursor.execute("SELECT id FROM theatres WHERE deleted_at <= datetime('now', ?)", (cutoff,))
+            theatre_ids = [row[0] for row in cursor.fetchall()]
+            for theatre_id in theatre_ids:
+                for table in ('snacks', 'screenings', 'managers'):
+                    cursor.execute(f"DELETE FROM {table} WHERE theatre_id = ?", (theatre_id,))
+                cursor.execute("DELETE FROM theatres WHERE id = ?", (theatre_id,))
+                RevenueRollups.drop(cursor, 'theatre_id', theatre_id)
+                self.enqueue(cursor, theatre_id)
+            cursor.execute("SELECT id, theatre_id FROM screenings WHERE deleted_at <= datetime('now', ?)", (cutoff,))
+            screenings = cursor.fetchall()
+            for movie_id, theatre_id in screenings:
+                cursor.execute("DELETE FROM screenings WHERE id = ?", (movie_id,))
+                RevenueRollups.drop(cursor, 'movie_id', movie_id)
+                self.enqueue(cursor, theatre_id, movie_id)
+            FilmCatalog.prune(cursor)
+            cursor.execute("SELECT id, theatre_id FROM snacks WHERE deleted_at <= datetime('now', ?)", (cutoff,))
+            snacks = cursor.fetchall()
+            if snacks:
+                snack_ids = [snack[0] for snack in snacks]
+                marks = ','.join('?' * len(snack_ids))
+                self.db.reset_activity(cursor, f"SELECT user_id FROM food_orders WHERE snack_id IN ({marks})", snack_ids)
+                cursor.execute(f"DELETE FROM food_orders WHERE snack_id IN ({marks})", snack_ids)
+                if archived:
+                    cursor.execute(f"DELETE FROM archive.food_orders WHERE snack_id IN ({marks})", snack_ids)
+                cursor.execute(f"DELETE FROM snacks WHERE id IN ({marks})", snack_ids)
+            conn.commit()
+        finally:
+            conn.close()
+        # Food revenue and attach rates of those theatres change; recompute their rollups from
+        # hot and archived history
+        for theatre_id in {snack[1] for snack in snacks}:
+            RevenueRollups(self.db).rebuild(theatre_id)
+        self.db.activity_cache.clear()
+        return {'theatres': len(theatre_ids), 'screenings': len(screenings), 'snacks': len(snacks)}
+    @staticmethod
+    def archived(cursor) -> bool:
+        """Whether the connection has an archive attached that the archiver already filled"""
+        cursor.execute("SELECT 1 FROM pragma_database_list WHERE name = 'archive'")
+        if not cursor.fetchone():
+            return False
+        cursor.execute("SELECT 1 FROM archive.sqlite_master WHERE type = 'table' AND name = 'bookings'")
+        return cursor.fetchone() is not None
+    def purge_batch(self) -> Optional[int]:
+        """Delete up to batch_size rows of the oldest open job in one transaction, closing the
+        job once nothing is left. Returns rows changed (cascades included), None if no job is open."""
+        conn = self.db.get_write_connection(archive=True)
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT id, theatre_id, movie_id FROM purge_jobs WHERE finished_at IS NULL ORDER BY id LIMIT 1")
+            job = cursor.fetchone()
+            if not job:
+                return None
+            job_id, theatre_id, movie_id = job
+            scope, params = ("theatre_id = ?", (theatre_id,)) if movie_id is None else \
+                ("theatre_id = ? AND movie_id = ?", (theatre_id, movie_id))
+            changes = conn.total_changes
+            steps = [('main', table, key) for table, key in self.STEPS]
+            if self.archived(cursor):
+                steps.append(('archive', 'bookings', 'id'))
+            for schema, table, key in steps:
+                # is_booked = 1 lets the leftover-seat sweep use the partial idx_seats_booked
+                booked = " AND is_booked = 1" if table == 'seats' else ""
+                cursor.execute(f"SELECT {key} FROM {schema}.{table} WHERE {scope}{booked} LIMIT ?",
+                               params + (self.batch_size,))
+                keys = [row[0] for row in cursor.fetchall()]
+                if keys:
+                    marks = ','.join('?' * len(keys))
+                    if table in ('bookings', 'reviews'):
+                        self.db.reset_activity(cursor, f"SELECT user_id FROM {schema}.{table} WHERE id IN ({marks})", keys)
+                    if schema == 'archive':
+                        for dependent in ('seats', 'food_orders'):
+                            cursor.execute(f"DELETE FROM archive.{dependent} WHERE booking_id IN ({marks})", keys)
+                    cursor.execute(f"DELETE FROM {schema}.{table} WHERE {key} IN ({marks})", keys)
+                    break
+            else:
+                cursor.execute("UPDATE purge_jobs SET finished_at = CURRENT_TIMESTAMP WHERE id = ?", (job_id,))
+            purged = conn.total_changes - changes
+            cursor.execute("UPDATE purge_jobs SET rows_purged = rows_purged + ? WHERE id = ?", (purged, job_id))
+            conn.commit()
+        finally:
+            conn.close()
+        self.db.activity_cache.clear()
+        return purged
+    def run_pending(self) -> int:
+        """Purge every open job, pausing between batches so bookings get the write lock"""
+        total = 0
+        while True:
+            purged = self.purge_batch()
+            if purged is None:
+                return total
+            total += purged
+            time.sleep(PURGE_PAUSE)
+    def start(self):
+        """Collect, purge and archive from a daemon thread, during GC_HOURS only"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='history-purger', daemon=True)
+            self._thread.start()
+    def _run(self):
+        while True:
+            time.sleep(PURGE_POLL_INTERVAL)
+            if not self.off_peak():
+                continue
+            try:
+                self.collect()
+                while self.off_peak() and self.purge_batch() is not None:
+                    time.sleep(PURGE_PAUSE)
+                while self.off_peak() and self.archiver.archive_batch():
+                    time.sleep(PURGE_PAUSE)
+            except sqlite3.Error:
+                # Busy past the timeout; the next round picks the job up again
+                pass
+class HistoryArchiver:
+    """Moves bookings older than after_days, with their seats and food orders, from the hot
+    database into the archive file (Database.archive_name), so the hot tables and their indexes
+    hold about after_days of shows however long the system runs; freed pages are reused by new
+    bookings. Readers see both stores through Database.history_tables().
+
+    Bookings move in id order, which is booking order, and the 'archiver' watermark records the
+    last id moved. Each batch is copied into the archive and committed there first, then deleted
+    from the hot tables (seats and food orders by cascade) in the transaction that advances the
+    watermark. Readers ignore archive rows above the watermark, so a batch cut off between the
+    two commits is never seen twice and is simply copied again by the next run. Food orders
+    can still be placed for a booking being moved, so the batch's orders are copied once more,
+    and committed to the archive, while the delete holds the write lock."""
+    def __init__(self, db: Database, after_days: int = ARCHIVE_AFTER_DAYS, batch_size: int = ARCHIVE_BATCH_SIZE):
+        self.db = db
+        self.after_days = after_days
+        self.batch_size = batch_size
+    def _ensure_schema(self, cursor) -> Dict[str, List[str]]:
+        """Create or widen the archive tables to the hot columns; returns the columns per table.
+        Archive tables carry no foreign keys: the rows they point at may be gone from the hot side."""
+        columns = {}
+        for table in ARCHIVE_TABLES:
+            cursor.execute(f"PRAGMA main.table_info({table})")
+            declared = [(row[1], row[2]) for row in cursor.fetchall()]
+            cursor.execute(f"PRAGMA archive.table_info({table})")
+            archived = {row[1] for row in cursor.fetchall()}
+            if not archived:
+                definitions = ', '.join('id INTEGER PRIMARY KEY' if name == 'id' else f"{name} {kind}"
+                                        for name, kind in declared)
+                cursor.execute(f"CREATE TABLE archive.{table} ({definitions})")
+            else:
+                for name, kind in declared:
+                    if name not in archived:
+                        cursor.execute(f"ALTER TABLE archive.{table} ADD COLUMN {name} {kind}")
+            columns[table] = [name for name, kind in declared]
+        cursor.execute("CREATE INDEX IF NOT EXISTS archive.idx_bookings_user ON bookings (user_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS archive.idx_bookings_theatre ON bookings (theatre_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS archive.idx_seats_booking ON seats (booking_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS archive.idx_food_orders_booking ON food_orders (booking_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS archive.idx_food_orders_user ON food_orders (user_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS archive.idx_food_orders_snack ON food_orders (snack_id)")
+        return columns
+    @staticmethod
+    def _copy(cursor, columns: Dict[str, List[str]], tables: List[str], watermark: int, last_id: int):
+        """Copy the rows of the bookings in (watermark, last_id] from the hot tables into the archive"""
+        for table in tables:
+            column_list = ', '.join(columns[table])
+            key = ARCHIVE_TABLES[table]
+            cursor.execute(
+                f"""INSERT OR REPLACE INTO archive.{table} ({column_list})
+                    SELECT {column_list} FROM main.{table} WHERE {key} > ? AND {key} <= ?""",
+                (watermark, last_id)
+            )
+    def archive_batch(self) -> int:
+        """Move the next batch of bookings older than after_days; returns bookings moved"""
+        cutoff = (datetime.datetime.now(datetime.timezone.utc)
+                  - datetime.timedelta(days=self.after_days)).strftime('%Y-%m-%d %H:%M:%S')
+        conn = self.db.get_connection()
+        try:
+            conn.execute("ATTACH DATABASE ? AS archive", (self.db.archive_name,))
+            conn.execute("PRAGMA archive.journal_mode = WAL")
+            cursor = conn.cursor()
+            # Deferred: copying only reads the hot database, so bookings keep its write lock
+            cursor.execute("BEGIN")
+            columns = self._ensure_schema(cursor)
+            watermark = self.db.get_watermark(cursor, 'archiver', 'bookings')
+            cursor.execute(
+                "SELECT id, booking_date FROM main.bookings WHERE id > ? ORDER BY id LIMIT ?",
+                (watermark, self.batch_size)
+            )
+            last_id = None
+            for booking_id, booking_date in cursor.fetchall():
+                if booking_date is None or booking_date >= cutoff:
+                    break
+                last_id = booking_id
+            if last_id is None:
+                conn.rollback()
+                return 0
+            self._copy(cursor, columns, list(ARCHIVE_TABLES), watermark, last_id)
+            conn.commit()
+        finally:
+            conn.close()
+        conn = self.db.get_write_connection()
+        try:
+            # No food order can be placed now; copy those placed since, which the delete's cascade
+            # would lose, and commit them to the archive before the hot rows go
+            copier = self.db.get_connection()
+            try:
+                copier.execute("ATTACH DATABASE ? AS archive", (self.db.archive_name,))
+                copier.execute("BEGIN")
+                self._copy(copier.cursor(), columns, ['food_orders'], watermark, last_id)
+                copier.commit()
+            finally:
+                copier.close()
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM bookings WHERE id > ? AND id <= ?", (watermark, last_id))
+            moved = cursor.rowcount
+            self.db.set_watermark(cursor, 'archiver', 'bookings', last_id)
+            conn.commit()
+        finally:
+            conn.close()
+        return moved
+    def run(self) -> int:
+        """Archive every booking past the cutoff; returns bookings moved"""
+        total = 0
+        while True:
+            moved = self.archive_batch()
+            if not moved:
+                return total
+            total += moved
+            time.sleep(PURGE_PAUSE)
+class BackupManager:
+    """Consistent copies of the database and its archive while bookings carry on. Each backup
+    is taken with the SQLite backup API in step_pages steps with a pause between them, from one
+    read transaction held open throughout: without it every commit by a booking would restart
+    the copy, which then never finishes under load. WAL lets writers proceed past that
+    snapshot (the WAL only grows until it ends). The archive is read after the hot database,
+    so it holds every batch up to the copied archiver watermark.
+
+    Files go to <directory>/<db>-<UTC stamp>.db (and -archive.db) next to a .json manifest
+    with their sizes and SHA-256 checksums; only the newest `retention` backups are kept.
+    Scheduled runs are claimed through the 'backup' watermark (Unix time of the last run),
+    so with several API workers only one of them takes each backup."""
+    REMOVE_STEP_BYTES = 64 << 20
+    def __init__(self, db: Database, directory: str = None, step_pages: int = BACKUP_STEP_PAGES,
+                 pause: float = BACKUP_PAUSE, retention: int = BACKUP_RETENTION,
+                 interval_hours: float = BACKUP_INTERVAL_HOURS):
+        self.db = db
+        self.directory = directory or os.path.join(os.path.dirname(os.path.abspath(db.db_name)), 'backups')
+        self.step_pages = step_pages
+        self.pause = pause
+        self.retention = retention
+        self.interval = interval_hours * 3600
+        self._thread = None
+    @staticmethod
+    def checksum(path: str, pause: float = 0) -> str:
+        """SHA-256 of a file, read in 1 MiB blocks with an optional pause after each"""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as backup_file:
+            for block in iter(lambda: backup_file.read(1 << 20), b''):
+                digest.update(block)
+                if pause:
+                    time.sleep(pause)
+        return digest.hexdigest()
+    def _copy(self, conn, schema: str, path: str):
+        """Copy one attached schema of conn to path and sync it"""
+        if os.path.exists(path):
+            os.remove(path)
+        target = sqlite3.connect(path)
+        try:
+            conn.backup(target, pages=self.step_pages, name=schema,
+                        progress=lambda status, remaining, total: time.sleep(self.pause))
+        finally:
+            target.close()
+        with open(path, 'rb') as copied_file:
+            os.fsync(copied_file.fileno())
+    def _remove(self, path: str):
+        """Delete a file, shrinking it in steps first: freeing gigabytes in a single unlink
+        takes about a second of filesystem work that stalls the bookings' writes"""
+        with open(path, 'r+b') as removed_file:
+            size = os.fstat(removed_file.fileno()).st_size
+            while size > self.REMOVE_STEP_BYTES:
+                size -= self.REMOVE_STEP_BYTES
+                removed_file.truncate(size)
+                time.sleep(self.pause)
+        os.remove(path)
+    def snapshot(self, paths: Dict[str, str]) -> Tuple[List[str], float]:
+        """Copy the database ('main') and the archive ('archive') as of one moment to the given
+        paths; returns the schemas copied, without the archive while there is none, and the
+        Unix time of the snapshot"""
+        conn = self.db.get_connection(history=True)
+        try:
+            schemas = [row[1] for row in conn.execute("PRAGMA database_list") if row[1] in paths]
+            # Pin the snapshot every step reads from, hot database first
+            conn.execute("BEGIN")
+            for schema in schemas:
+                conn.execute(f"SELECT COUNT(*) FROM {schema}.sqlite_master").fetchone()
+            taken = time.time()
+            for schema in schemas:
+                self._copy(conn, schema, paths[schema])
+            conn.rollback()
+            # The snapshot kept the WAL from being checkpointed; catch up here rather than in
+            # the commit of whichever booking next crosses the autocheckpoint threshold
+            conn.execute("PRAGMA main.wal_checkpoint(PASSIVE)")
+        finally:
+            conn.close()
+        return schemas, taken
+    def backup(self) -> Dict:
+        """Take a backup now; returns its manifest"""
+        os.makedirs(self.directory, exist_ok=True)
+        started = time.perf_counter()
+        created = datetime.datetime.now(datetime.timezone.utc)
+        name = f"{os.path.splitext(os.path.basename(self.db.db_name))[0]}-{created.strftime('%Y%m%dT%H%M%SZ')}"
+        paths = {schema: os.path.join(self.directory, f"{name}.db" if schema == 'main' else f"{name}-{schema}.db")
+                 for schema in ('main', 'archive')}
+        # Named .partial until the manifest is written, so prune() clears what a stopped
+        # process leaves behind
+        schemas, _ = self.snapshot({schema: path + '.partial' for schema, path in paths.items()})
+        paths = {schema: paths[schema] for schema in schemas}
+        # Hashed once the snapshot is released, so the WAL is not held back meanwhile
+        files = {schema: {'file': os.path.basename(path), 'bytes': os.path.getsize(path + '.partial'),
+                          'sha256': self.checksum(path + '.partial', self.pause)}
+                 for schema, path in paths.items()}
+        for path in paths.values():
+            os.replace(path + '.partial', path)
+        manifest = {
+            'name': name,
+            'created_at': created.strftime('%Y-%m-%d %H:%M:%S'),
+            'source': os.path.abspath(self.db.db_name),
+            'seconds': round(time.perf_counter() - started, 3),
+            'files': files
+        }
+        manifest_path = os.path.join(self.directory, f"{name}.json")
+        with open(manifest_path + '.partial', 'w') as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
+        os.replace(manifest_path + '.partial', manifest_path)
+        self.prune()
+        return manifest
+    def list(self) -> List[Dict]:
+        """Manifests of the backups on disk, newest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        manifests = []
+        for entry in os.listdir(self.directory):
+            if entry.endswith('.json'):
+                with open(os.path.join(self.directory, entry)) as manifest_file:
+                    manifests.append(json.load(manifest_file))
+        return sorted(manifests, key=itemgetter('created_at', 'name'), reverse=True)
+    def last_completed(self) -> Optional[float]:
+        """Unix time the newest backup on disk was completed, None if there is none"""
+        newest = self.list()[:1]
+        return os.path.getmtime(os.path.join(self.directory, f"{newest[0]['name']}.json")) if newest else None
+    def manifest(self, name: str) -> Dict:
+        path = os.path.join(self.directory, f"{name}.json")
+        if not os.path.exists(path):
+            raise ValueError(f"No backup named {name} in {self.directory}")
+        with open(path) as manifest_file:
+            return json.load(manifest_file)
+    def prune(self) -> List[str]:
+        """Delete all but the newest `retention` backups, and copies abandoned mid-way by a
+        stopped process; returns the names of the backups deleted"""
+        removed = []
+        for manifest in self.list()[self.retention:]:
+            for copied in manifest['files'].values():
+                path = os.path.join(self.directory, copied['file'])
+                if os.path.exists(path):
+                    self._remove(path)
+            os.remove(os.path.join(self.directory, f"{manifest['name']}.json"))
+            removed.append(manifest['name'])
+        stale = time.time() - self.interval
+        for entry in os.listdir(self.directory):
+            path = os.path.join(self.directory, entry)
+            # A copy in progress is written to continuously, so only long-idle ones are stale
+            if entry.endswith('.partial') and os.path.getmtime(path) < stale:
+                self._remove(path)
+        return removed
+    def verify(self, name: str) -> List[str]:
+        """Check a backup's files against their checksums and SQLite's quick_check; returns
+        the problems found, none for a sound backup"""
+        problems = []
+        for schema, copied in self.manifest(name)['files'].items():
+            path = os.path.join(self.directory, copied['file'])
+            if not os.path.exists(path):
+                problems.append(f"{copied['file']}: missing")
+                continue
+            if self.checksum(path) != copied['sha256']:
+                problems.append(f"{copied['file']}: checksum mismatch")
+                continue
+            # immutable: reading must not create -wal/-shm files or touch the checked bytes
+            conn = sqlite3.connect(f"file:{quote(os.path.abspath(path))}?mode=ro&immutable=1", uri=True)
+            try:
+                result = [row[0] for row in conn.execute("PRAGMA quick_check")]
+            finally:
+                conn.close()
+            if result != ['ok']:
+                problems.append(f"{copied['file']}: {'; '.join(result)}")
+        return problems
+    def restore(self, name: str) -> Dict:
+        """Replace the database (and archive, if backed up) with a verified backup. Stop the
+        API first: the copy is transactional, but running processes keep stale caches."""
+        problems = self.verify(name)
+        if problems:
+            raise ValueError(f"Backup {name} failed verification: {', '.join(problems)}")
+        manifest = self.manifest(name)
+        for schema, copied in manifest['files'].items():
+            path = os.path.join(self.directory, copied['file'])
+            source = sqlite3.connect(f"file:{quote(os.path.abspath(path))}?mode=ro&immutable=1", uri=True)
+            target = sqlite3.connect(self.db.db_name if schema == 'main' else self.db.archive_name, timeout=30)
+            try:
+                source.backup(target)
+            finally:
+                source.close()
+                target.close()
+        return manifest
+    def run_if_due(self) -> Optional[Dict]:
+        """Take a backup if the last scheduled one is over interval_hours old; the manifest,
+        or None when it was not due or another process claimed it"""
+        last_run = self.db.claim_job('backup', self.interval)
+        if last_run is None:
+            return None
+        try:
+            return self.backup()
+        except (sqlite3.Error, OSError):
+            self.db.release_job('backup', last_run)
+            raise
+    def start(self):
+        """Take scheduled backups from a daemon thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='backup-scheduler', daemon=True)
+            self._thread.start()
+    def _run(self):
+        while True:
+            time.sleep(BACKUP_POLL_INTERVAL)
+            try:
+                self.run_if_due()
+            except (sqlite3.Error, OSError):
+                logging.getLogger('cine.backup').exception("Scheduled backup failed")
+class ReadReplica:
+    """Keeps Database.replica_name a recent read-only copy of the database and its archive, so
+    reports (get_connection(replica=True)) scan that instead of the files checkout writes: their
+    long reads then never hold back WAL checkpoints or evict the bookings' pages. Each refresh
+    is a paced snapshot as for backups, written to .partial files that then replace the
+    replica, archive first; reports already running finish on the copy they opened. The
+    snapshot time goes into the copy as its 'replica' watermark, for Database.replica_lag().
+    Refreshes are claimed like backups, so one API worker refreshes for all. Each one records
+    how long it copied, and the next is due after interval seconds or once copying would take
+    no more than copy_share of the time, whichever is later, up to half of REPLICA_MAX_LAG."""
+    def __init__(self, db: Database, interval: float = REPLICA_REFRESH_INTERVAL,
+                 copy_share: float = REPLICA_COPY_SHARE):
+        self.db = db
+        self.interval = interval
+        self.copy_share = copy_share
+        self.copier = BackupManager(db)
+        self._thread = None
+    def due_interval(self, seconds: float = None) -> float:
+        """Seconds between refreshes, given how long the last one copied (by default as recorded)"""
+        if seconds is None:
+            conn = self.db.get_connection()
+            try:
+                seconds = self.db.get_watermark(conn.cursor(), 'replica', 'seconds')
+            finally:
+                conn.close()
+        return max(self.interval, min(seconds / self.copy_share, REPLICA_MAX_LAG / 2))
+    def refresh(self) -> float:
+        """Rebuild the replica now; returns the Unix time of its snapshot"""
+        paths = {'main': self.db.replica_name, 'archive': self.db.replica_archive_name}
+        started = time.time()
+        schemas, taken = self.copier.snapshot({schema: path + '.partial' for schema, path in paths.items()})
+        for schema in schemas:
+            conn = sqlite3.connect(paths[schema] + '.partial')
+            try:
+                if schema == 'main':
+                    self.db.set_watermark(conn.cursor(), 'replica', 'snapshot', int(taken))
+                    conn.commit()
+                # Readers open the replica immutable, which a WAL file cannot be
+                conn.execute("PRAGMA journal_mode = DELETE")
+            finally:
+                conn.close()
+        # Archive first: a report opening the new main file must not find the old archive,
+        # whereas the old main file simply ignores archive rows past its watermark
+        for schema in sorted(schemas, key=lambda schema: schema == 'main'):
+            os.replace(paths[schema] + '.partial', paths[schema])
+        seconds = math.ceil(time.time() - started)
+        conn = self.db.get_write_connection()
+        try:
+            self.db.set_watermark(conn.cursor(), 'replica', 'seconds', seconds)
+            # Database.replica_age() keeps using the replica only while refreshes keep this pace
+            self.db.set_watermark(conn.cursor(), 'replica', 'interval', math.ceil(self.due_interval(seconds)))
+            conn.commit()
+        finally:
+            conn.close()
+        return taken
+    def refresh_if_due(self) -> Optional[float]:
+        last_run = self.db.claim_job('replica', self.due_interval())
+        if last_run is None:
+            return None
+        try:
+            return self.refresh()
+        except (sqlite3.Error, OSError):
+            self.db.release_job('replica', last_run)
+            raise
+    def start(self):
+        """Refresh the replica from a daemon thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='replica-refresher', daemon=True)
+            self._thread.start()
+    def _run(self):
+        while True:
+            try:
+                self.refresh_if_due()
+            except (sqlite3.Error, OSError):
+                logging.getLogger('cine.replica').exception("Replica refresh failed")
+            time.sleep(min(self.interval, BACKUP_POLL_INTERVAL))
+class ReviewFeed:
+    """Newest-first review feed with filters and keyset pagination on (created_at, id)"""
+    def __init__(self, db: Database):
+        self.db = db
+    def page(self, theatre_id: int = None, movie_id: int = None, min_rating: int = None,
+             max_rating: int = None, review_type: str = None, since: str = None,
+             cursor_key: tuple = None, limit: int = 20) -> Dict:
+        """Return one page of reviews plus next_cursor ((created_at, id) of the last row, or None).
+        Pass next_cursor back as cursor_key to fetch the following page."""
+        conditions = ["t.deleted_at IS NULL", "m.deleted_at IS NULL"]
+        params = []
+        if theatre_id is not None:
+            conditions.append("r.theatre_id = ?")
+            params.append(theatre_id)
+        if movie_id is not None:
+            conditions.append("r.movie_id = ?")
+            params.append(movie_id)
+        if min_rating is not None:
+            conditions.append("r.rating >= ?")
+            params.append(min_rating)
+        if max_rating is not None:
+            conditions.append("r.rating <= ?")
+            params.append(max_rating)
+        if review_type is not None:
+            conditions.append("r.review_type = ?")
+            params.append(review_type)
+        if since is not None:
+            conditions.append("r.created_at >= ?")
+            params.append(since)
+        if cursor_key is not None:
+            conditions.append("(r.created_at, r.id) < (?, ?)")
+            params.extend(cursor_key)
+        where = f"WHERE {' AND '.join(conditions)}"
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            f"""SELECT r.id, r.rating, r.comment, r.review_type, r.created_at,
+                    u.username, t.name as theatre_name, m.title as movie_title
+            FROM reviews r
+            JOIN users u ON r.user_id = u.id
+            JOIN theatres t ON r.theatre_id = t.id
+            LEFT JOIN movies m ON r.movie_id = m.id
+            {where}
+            ORDER BY r.created_at DESC, r.id DESC
+            LIMIT ?""",
+            params + [limit + 1]
+        )
+        reviews = cursor.fetchall()
+        conn.close()
+        has_more = len(reviews) > limit
+        reviews = reviews[:limit]
+        return {
+            'reviews': [
+                {
+                    'id': review[0],
+                    'rating': review[1],
+                    'comment': review[2],
+                    'review_type': review[3],
+                    'created_at': review[4],
+                    'username': review[5],
+                    'theatre_name': review[6],
+                    'movie_title': review[7] if review[7] else 'N/A'
+                }
+                for review in reviews
+            ],
+            'next_cursor': (reviews[-1][4], reviews[-1][0]) if has_more else None
+        }
+def parse_show_time(show_time: str) -> Optional[datetime.time]:
+    """Parse free-text show times such as '09:00AM', '12:30 PM' or '18:15'"""
+    text = (show_time or '').strip().upper().replace(' ', '').replace('.', '')
+    for fmt in ('%I:%M%p', '%I%p', '%H:%M', '%H'):
+        try:
+            return datetime.datetime.strptime(text, fmt).time()
+        except ValueError:
+            continue
+    return None
+class DemandForecaster:
+    """Forecasts per-show occupancy from booking history.
+    Each show day (theatre, movie, show time, date) is one observation of occupancy.
+    Occupancy sums and observation counts are kept per feature value (movie, genre,
+    weekday, time slot, theatre) and updated by every committed booking, so the
+    model never needs retraining. A forecast is the global mean plus a shrunken
+    offset for each feature."""
+    def __init__(self, db: Database):
+        self.db = db
+    @staticmethod
+    def time_slot(show_time: str) -> str:
+        parsed = parse_show_time(show_time)
+        if parsed is None:
+            return 'unknown'
+        if parsed.hour < 12:
+            return 'morning'
+        if parsed.hour < 17:
+            return 'afternoon'
+        if parsed.hour < 21:
+            return 'evening'
+        return 'night'
+    @staticmethod
+    def feature_keys(theatre_id: int, movie_id: int, genre: str, show_time: str, show_date: str) -> List[tuple]:
+        weekday = datetime.date.fromisoformat(show_date).strftime('%a')
+        values = {
+            'movie': movie_id,
+            'genre': (genre or 'unknown').strip().lower(),
+            'weekday': weekday,
+            'slot': DemandForecaster.time_slot(show_time),
+            'theatre': theatre_id
+        }
+        return [('global', '')] + [(feature, str(values[feature])) for feature in FORECAST_FEATURES]
+    @staticmethod
+    def record_booking(cursor, theatre_id: int, movie_id: int, show_time: str, seats: int, show_date: str = None):
+        """Fold a booking into the model inside the booking's transaction.
+        Shows carry no date, so a booking counts towards the show on its (UTC) booking day,
+        matching the CURRENT_TIMESTAMP stored in bookings.booking_date."""
+        show_date = show_date or datetime.datetime.now(datetime.timezone.utc).date().isoformat()
+        show_time = (show_time or '').strip()
+        cursor.execute(
+            "SELECT m.genre, t.total_seats FROM movies m JOIN theatres t ON t.id = ? WHERE m.id = ?",
+            (theatre_id, movie_id)
+        )
+        info = cursor.fetchone()
+        if not info or not info[1]:
+            return
+        cursor.execute(
+            """INSERT INTO show_demand (theatre_id, movie_id, show_time, show_date, seats_sold) VALUES (?, ?, ?, ?, 0)
+               ON CONFLICT(theatre_id, movie_id, show_time, show_date) DO NOTHING""",
+            (theatre_id, movie_id, show_time, show_date)
+        )
+        new_observation = 1 if cursor.rowcount > 0 else 0
+        cursor.execute(
+            """UPDATE show_demand SET seats_sold = seats_sold + ?
+               WHERE theatre_id = ? AND movie_id = ? AND show_time = ? AND show_date = ?""",
+            (seats, theatre_id, movie_id, show_time, show_date)
+        )
+        delta = seats / info[1]
+        cursor.executemany(
+            """INSERT INTO forecast_stats (feature, key, observations, occupancy_sum) VALUES (?, ?, ?, ?)
+               ON CONFLICT(feature, key) DO UPDATE SET observations = observations + excluded.observations,
+               occupancy_sum = occupancy_sum + excluded.occupancy_sum""",
+            [
+                (feature, key, new_observation, delta)
+                for feature, key in DemandForecaster.feature_keys(theatre_id, movie_id, info[0], show_time, show_date)
+            ]
+        )
+    def rebuild(self) -> int:
+        """Retrain from the full bookings history; returns the number of show days observed"""
+        conn = self.db.get_connection(history=True)
+        cursor = conn.cursor()
+        observed = self.rebuild_rows(cursor, self.db.history_tables(conn))
+        conn.commit()
+        conn.close()
+        return observed
+    @staticmethod
+    def rebuild_rows(cursor, tables: Dict[str, str] = None) -> int:
+        """tables maps bookings to another source, e.g. Database.history_tables()"""
+        bookings = tables['bookings'] if tables else 'bookings'
+        cursor.execute("DELETE FROM show_demand")
+        cursor.execute("DELETE FROM forecast_stats")
+        cursor.execute(
+            f"""INSERT INTO show_demand (theatre_id, movie_id, show_time, show_date, seats_sold)
+               SELECT theatre_id, movie_id, TRIM(show_time), DATE(booking_date), SUM(seats_booked)
+               FROM {bookings}
+               WHERE theatre_id IS NOT NULL AND movie_id IS NOT NULL AND show_time IS NOT NULL
+               GROUP BY theatre_id, movie_id, TRIM(show_time), DATE(booking_date)"""
+        )
+        cursor.execute(
+            """SELECT d.theatre_id, d.movie_id, m.genre, d.show_time, d.show_date, d.seats_sold, t.total_seats
+               FROM show_demand d
+               JOIN movies m ON m.id = d.movie_id
+               JOIN theatres t ON t.id = d.theatre_id"""
+        )
+        stats = {}
+        observed = 0
+        for theatre_id, movie_id, genre, show_time, show_date, seats_sold, total_seats in cursor.fetchall():
+            if not total_seats or not show_date:
+                continue
+            observed += 1
+            occupancy = seats_sold / total_seats
+            for key in DemandForecaster.feature_keys(theatre_id, movie_id, genre, show_time, show_date):
+                count, total = stats.get(key, (0, 0.0))
+                stats[key] = (count + 1, total + occupancy)
+        cursor.executemany(
+            "INSERT INTO forecast_stats (feature, key, observations, occupancy_sum) VALUES (?, ?, ?, ?)",
+            [(feature, key, count, total) for (feature, key), (count, total) in stats.items()]
+        )
+        return observed
+    def _load_stats(self, cursor) -> Dict:
+        cursor.execute("SELECT feature, key, observations, occupancy_sum FROM forecast_stats")
+        return {(row[0], row[1]): (row[2], row[3]) for row in cursor.fetchall()}
+    @staticmethod
+    def _predict(stats: Dict, keys: List[tuple]) -> float:
+        count, total = stats.get(('global', ''), (0, 0.0))
+        if not count:
+            return 0.0
+        base = total / count
+        occupancy = base
+        for key in keys[1:]:
+            n, feature_sum = stats.get(key, (0, 0.0))
+            # Offset from the global mean, shrunk towards 0 for rarely seen values
+            occupancy += (feature_sum - n * base) / (n + FORECAST_SHRINKAGE)
+        return min(max(occupancy, 0.0), 1.0)
+    def forecast(self, theatre_id: int = None, days: int = 1, start_date: datetime.date = None) -> List[Dict]:
+        """Score every scheduled show (all theatres unless theatre_id is given) for the next days.
+        Loads the model and the schedule with one query each and scores in memory."""
+        start_date = start_date or datetime.datetime.now(datetime.timezone.utc).date()
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        stats = self._load_stats(cursor)
+        query = """SELECT m.id, m.title, m.genre, m.show_times, t.id, t.name, t.total_seats
+                   FROM movies m JOIN theatres t ON t.id = m.theatre_id
+                   WHERE m.deleted_at IS NULL AND t.deleted_at IS NULL"""
+        params = ()
+        if theatre_id is not None:
+            query += " AND t.id = ?"
+            params = (theatre_id,)
+        cursor.execute(query, params)
+        movies = cursor.fetchall()
+        conn.close()
+        shows = []
+        for movie_id, title, genre, show_times, show_theatre_id, theatre_name, total_seats in movies:
+            for show_time in (show_times or '').split(','):
+                show_time = show_time.strip()
+                if show_time:
+                    keys = self.feature_keys(show_theatre_id, movie_id, genre, show_time, start_date.isoformat())
+                    shows.append((keys, movie_id, title, show_time, show_theatre_id, theatre_name, total_seats))
+        weekday_index = 1 + FORECAST_FEATURES.index('weekday')
+        forecasts = []
+        for offset in range(days):
+            day = start_date + datetime.timedelta(days=offset)
+            show_date = day.isoformat()
+            weekday_key = ('weekday', day.strftime('%a'))
+            for keys, movie_id, title, show_time, show_theatre_id, theatre_name, total_seats in shows:
+                keys[weekday_index] = weekday_key
+                occupancy = self._predict(stats, keys)
+                forecasts.append({
+                    'theatre_id': show_theatre_id,
+                    'theatre_name': theatre_name,
+                    'movie_id': movie_id,
+                    'movie_title': title,
+                    'show_time': show_time,
+                    'show_date': show_date,
+                    'predicted_occupancy': round(occupancy, 4),
+                    'predicted_seats': round(occupancy * (total_seats or 0)),
+                    'total_seats': total_seats
+                })
+        return forecasts
+class RevenueRollups:
+    """Revenue, seats and concession rollups per theatre/movie/show/day and per hour.
+    Booking and food-order commits add to the rollup rows in their own transaction,
+    so reports over any date range read a few hundred rows instead of every booking.
+    Food orders count towards the day and show of the booking they belong to."""
+    GROUPS = {
+        'day': 'day',
+        'movie': 'movie_id',
+        'show': 'movie_id, show_time',
+        'theatre': 'theatre_id',
+    }
+    def __init__(self, db: Database):
+        self.db = db
+    @staticmethod
+    def record_booking(cursor, theatre_id: int, movie_id: int, show_time: str, seats: int, amount: float):
+        cursor.execute(
+            """INSERT INTO revenue_daily (theatre_id, day, movie_id, show_time, bookings, seats_sold, ticket_revenue)
+               VALUES (?, DATE('now'), ?, ?, 1, ?, ?)
+               ON CONFLICT(theatre_id, day, movie_id, show_time) DO UPDATE SET bookings = bookings + 1,
+               seats_sold = seats_sold + excluded.seats_sold, ticket_revenue = ticket_revenue + excluded.ticket_revenue""",
+            (theatre_id, movie_id, show_time or '', seats, amount)
+        )
+        cursor.execute(
+            """INSERT INTO revenue_hourly (theatre_id, hour, movie_id, bookings, seats_sold, ticket_revenue)
+               VALUES (?, STRFTIME('%Y-%m-%d %H', 'now'), ?, 1, ?, ?)
+               ON CONFLICT(theatre_id, hour, movie_id) DO UPDATE SET bookings = bookings + 1,
+               seats_sold = seats_sold + excluded.seats_sold, ticket_revenue = ticket_revenue + excluded.ticket_revenue""",
+            (theatre_id, movie_id, seats, amount)
+        )
+    @staticmethod
+    def record_food_order(cursor, booking_id: int, total_price: float, orders: int = 1):
+        """Call before inserting the food order rows (`orders` of them, together costing
+        total_price), so a booking's first order is detectable"""
+        cursor.execute(
+            """SELECT b.theatre_id, b.movie_id, b.show_time, DATE(b.booking_date),
+                      EXISTS (SELECT 1 FROM food_orders WHERE booking_id = b.id)
+               FROM bookings b WHERE b.id = ?""",
+            (booking_id,)
+        )
+        booking = cursor.fetchone()
+        if not booking or booking[0] is None or booking[1] is None:
+            return
+        theatre_id, movie_id, show_time, day, had_food = booking
+        cursor.execute(
+            """INSERT INTO revenue_daily (theatre_id, day, movie_id, show_time, food_orders, food_revenue, bookings_with_food)
+               VALUES (?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT(theatre_id, day, movie_id, show_time) DO UPDATE SET
+               food_orders = food_orders + excluded.food_orders,
+               food_revenue = food_revenue + excluded.food_revenue,
+               bookings_with_food = bookings_with_food + excluded.bookings_with_food""",
+            (theatre_id, day, movie_id, show_time or '', orders, total_price, 0 if had_food else 1)
+        )
+        cursor.execute(
+            """INSERT INTO revenue_hourly (theatre_id, hour, movie_id, food_orders, food_revenue)
+               VALUES (?, STRFTIME('%Y-%m-%d %H', 'now'), ?, ?, ?)
+               ON CONFLICT(theatre_id, hour, movie_id) DO UPDATE SET
+               food_orders = food_orders + excluded.food_orders,
+               food_revenue = food_revenue + excluded.food_revenue""",
+            (theatre_id, movie_id, orders, total_price)
+        )
+    @staticmethod
+    def drop(cursor, column: str, value: int):
+        """Remove rollups of a deleted theatre ('theatre_id') or movie ('movie_id')"""
+        cursor.execute(f"DELETE FROM revenue_daily WHERE {column} = ?", (value,))
+        cursor.execute(f"DELETE FROM revenue_hourly WHERE {column} = ?", (value,))
+    @staticmethod
+    def rebuild_rows(cursor, theatre_id: int = None, tables: Dict[str, str] = None):
+        """Recompute rollups from bookings and food orders (one theatre, or all if None).
+        tables maps them to other sources, e.g. Database.history_tables(). History of collected
+        theatres and screenings is skipped while HistoryPurger has yet to delete it."""
+        bookings = tables['bookings'] if tables else 'bookings'
+        food_orders = tables['food_orders'] if tables else 'food_orders'
+        theatre_filter = """JOIN screenings s ON s.id = b.movie_id
+                JOIN theatres t ON t.id = b.theatre_id
+                WHERE b.theatre_id IS NOT NULL AND b.movie_id IS NOT NULL"""
+        if theatre_id is not None:
+            theatre_filter += " AND b.theatre_id = ?"
+        params = (theatre_id,) if theatre_id is not None else ()
+        if theatre_id is not None:
+            cursor.execute("DELETE FROM revenue_daily WHERE theatre_id = ?", params)
+            cursor.execute("DELETE FROM revenue_hourly WHERE theatre_id = ?", params)
+        else:
+            cursor.execute("DELETE FROM revenue_daily")
+            cursor.execute("DELETE FROM revenue_hourly")
+        cursor.execute(
+            f"""INSERT INTO revenue_daily (theatre_id, day, movie_id, show_time, bookings, seats_sold,
+                    ticket_revenue, food_orders, food_revenue, bookings_with_food)
+                SELECT b.theatre_id, DATE(b.booking_date), b.movie_id, COALESCE(b.show_time, ''), COUNT(*),
+                       COALESCE(SUM(b.seats_booked), 0), COALESCE(SUM(b.total_amount), 0),
+                       COALESCE(SUM(f.orders), 0), COALESCE(SUM(f.revenue), 0), COUNT(f.booking_id)
+                FROM {bookings} b
+                LEFT JOIN (SELECT booking_id, COUNT(*) AS orders, SUM(total_price) AS revenue
+                           FROM {food_orders} GROUP BY booking_id) f ON f.booking_id = b.id
+                {theatre_filter}
+                GROUP BY b.theatre_id, DATE(b.booking_date), b.movie_id, COALESCE(b.show_time, '')""",
+            params
+        )
+        cursor.execute(
+            f"""INSERT INTO revenue_hourly (theatre_id, hour, movie_id, bookings, seats_sold, ticket_revenue)
+                SELECT b.theatre_id, STRFTIME('%Y-%m-%d %H', b.booking_date), b.movie_id, COUNT(*),
+                       COALESCE(SUM(b.seats_booked), 0), COALESCE(SUM(b.total_amount), 0)
+                FROM {bookings} b
+                {theatre_filter}
+                GROUP BY b.theatre_id, STRFTIME('%Y-%m-%d %H', b.booking_date), b.movie_id""",
+            params
+        )
+        cursor.execute(
+            f"""INSERT INTO revenue_hourly (theatre_id, hour, movie_id, food_orders, food_revenue)
+                SELECT b.theatre_id, STRFTIME('%Y-%m-%d %H', fo.order_date), b.movie_id, COUNT(*),
+                       COALESCE(SUM(fo.total_price), 0)
+                FROM {food_orders} fo
+                JOIN {bookings} b ON b.id = fo.booking_id
+                {theatre_filter}
+                GROUP BY b.theatre_id, STRFTIME('%Y-%m-%d %H', fo.order_date), b.movie_id
+                ON CONFLICT(theatre_id, hour, movie_id) DO UPDATE SET food_orders = excluded.food_orders,
+                food_revenue = excluded.food_revenue""",
+            params
+        )
+    def rebuild(self, theatre_id: int = None):
+        conn = self.db.get_connection(history=True)
+        cursor = conn.cursor()
+        self.rebuild_rows(cursor, theatre_id, self.db.history_tables(conn))
+        conn.commit()
         conn.close()
-        
-        return [
-            {
-                'id': review[0],
-                'rating': review[1],
-                'comment': review[2],
-                'review_type': review[3],
-                'created_at': review[4],
-                'username': review[5],
-                'theatre_name': review[6],
-                'movie_title': review[7] if review[7] else 'N/A'
-            }
-            for review in reviews
-        ]
-    def get_user_bookings(self, user_id: int) -> List[Dict]:
-        """Get all bookings for a user"""
+    def report(self, theatre_id: int = None, start_date: str = None, end_date: str = None,
+               group_by: str = None) -> List[Dict]:
+        """Revenue, seats sold, occupancy % and concession attach rate for an inclusive
+        date range (YYYY-MM-DD), grouped by 'day', 'movie', 'show', 'theatre' or not at all.
+        Occupancy is measured against the capacity of show days that sold tickets."""
+        conditions = []
+        params = []
+        if theatre_id is not None:
+            conditions.append("r.theatre_id = ?")
+            params.append(theatre_id)
+        if start_date:
+            conditions.append("r.day >= ?")
+            params.append(start_date)
+        if end_date:
+            conditions.append("r.day <= ?")
+            params.append(end_date)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        group_columns = self.GROUPS.get(group_by, '')
+        select_group = ', '.join(f"r.{column.strip()}" for column in group_columns.split(',')) if group_columns else "NULL"
+        group_clause = f"GROUP BY {select_group} ORDER BY {select_group}" if group_columns else ""
         conn = self.db.get_connection()
         cursor = conn.cursor()
         cursor.execute(
-            """SELECT b.id, b.seats_booked, b.show_time, b.total_amount, 
-                    b.booking_date, m.title, t.name 
-            FROM bookings b 
-            JOIN movies m ON b.movie_id = m.id 
-            JOIN theatres t ON b.theatre_id = t.id 
-            WHERE b.user_id = ? 
-            ORDER BY b.booking_date DESC""",
-            (user_id,)
+            f"""SELECT {select_group}, SUM(r.bookings), SUM(r.seats_sold), SUM(r.ticket_revenue),
+                       SUM(r.food_orders), SUM(r.food_revenue), SUM(r.bookings_with_food),
+                       SUM(CASE WHEN r.bookings > 0 THEN t.total_seats ELSE 0 END)
+                FROM revenue_daily r
+                JOIN theatres t ON t.id = r.theatre_id
+                {where}
+                {group_clause}""",
+            params
         )
-        bookings = cursor.fetchall()
+        rows = cursor.fetchall()
         conn.close()
-        
-        return [
-            {
-                'id': booking[0],
-                'seats_booked': booking[1],
-                'show_time': booking[2],
-                'total_amount': booking[3],
-                'booking_date': booking[4],
-                'movie_title': booking[5],
-                'theatre_name': booking[6]
+        width = len(group_columns.split(',')) if group_columns else 1
+        results = []
+        for row in rows:
+            bookings, seats, tickets, orders, food, with_food, capacity = row[width:]
+            if bookings is None:
+                continue
+            result = {
+                'bookings': bookings,
+                'seats_sold': seats,
+                'ticket_revenue': round(tickets, 2),
+                'food_orders': orders,
+                'food_revenue': round(food, 2),
+                'total_revenue': round(tickets + food, 2),
+                'occupancy_pct': round(100.0 * seats / capacity, 2) if capacity else 0.0,
+                'attach_rate_pct': round(100.0 * with_food / bookings, 2) if bookings else 0.0
             }
-            for booking in bookings
-        ]
-    def get_available_snacks(self, theatre_id: int) -> List[Dict]:
-        """Get all snacks for a specific theatre"""
+            if group_columns:
+                for index, column in enumerate(group_columns.split(',')):
+                    result[column.strip()] = row[index]
+            results.append(result)
+        return results
+    def hourly_report(self, theatre_id: int = None, start_date: str = None, end_date: str = None) -> List[Dict]:
+        """Sales by hour of day (00-23, UTC) over an inclusive date range"""
+        conditions = []
+        params = []
+        if theatre_id is not None:
+            conditions.append("theatre_id = ?")
+            params.append(theatre_id)
+        if start_date:
+            conditions.append("hour >= ?")
+            params.append(start_date)
+        if end_date:
+            conditions.append("hour < ?")
+            params.append((datetime.date.fromisoformat(end_date) + datetime.timedelta(days=1)).isoformat())
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
         conn = self.db.get_connection()
         cursor = conn.cursor()
         cursor.execute(
-            "SELECT * FROM snacks WHERE theatre_id = ? AND available = 1",
-            (theatre_id,)
+            f"""SELECT SUBSTR(hour, 12, 2) AS hour_of_day, SUM(bookings), SUM(seats_sold),
+                       SUM(ticket_revenue), SUM(food_orders), SUM(food_revenue)
+                FROM revenue_hourly {where}
+                GROUP BY hour_of_day ORDER BY hour_of_day""",
+            params
         )
-        snacks = cursor.fetchall()
+        rows = cursor.fetchall()
         conn.close()
-        
         return [
             {
-                'id': snack[0],
-                'name': snack[1],
-                'price': snack[2],
-                'theatre_id': snack[3]
+                'hour': row[0],
+                'bookings': row[1],
+                'seats_sold': row[2],
+                'ticket_revenue': round(row[3], 2),
+                'food_orders': row[4],
+                'food_revenue': round(row[5], 2)
             }
-            for snack in snacks
+            for row in rows
         ]
-    def get_seat_arrangement(self, theatre_id: int, movie_id: int, show_time: str) -> Dict:
-        """Get seat arrangement for a specific show"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        
-        # Get theatre info
-        cursor.execute("SELECT total_seats FROM theatres WHERE id = ?", (theatre_id,))
-        theatre_info = cursor.fetchone()
-        if not theatre_info:
-            return None
-        
-        total_seats = theatre_info[0]
-        
-        # Calculate rows and seats per row (assuming rectangular arrangement)
-        seats_per_row = 10  # You can adjust this
-        rows = (total_seats + seats_per_row - 1) // seats_per_row
-        
-        # Get booked seats for this show
+class Recommender:
+    """Item-item "customers also watched" model.
+    A user's affinity for a movie is 1 for booking it plus (rating - 3) / 2 for a
+    movie review, so a poor review cancels out the booking. Movie similarity is the
+    cosine of those affinity vectors across users. The batch job keeps each movie's
+    strongest neighbours and a precomputed top-K list per user."""
+    AFFINITY_QUERY = """SELECT user_id, movie_id, SUM(weight) FROM (
+                            SELECT user_id, movie_id, 1.0 AS weight FROM {bookings}
+                            WHERE user_id IS NOT NULL AND movie_id IS NOT NULL
+                            GROUP BY user_id, movie_id
+                            UNION ALL
+                            SELECT user_id, movie_id, (AVG(rating) - 3) / 2.0 FROM reviews
+                            WHERE review_type = 'movie' AND user_id IS NOT NULL AND movie_id IS NOT NULL
+                            GROUP BY user_id, movie_id
+                        )
+                        GROUP BY user_id, movie_id HAVING SUM(weight) > 0
+                        ORDER BY user_id, movie_id"""
+    def __init__(self, db: Database):
+        self.db = db
+    @staticmethod
+    def _histories(cursor, bookings: str = 'bookings'):
+        """Stream (user_id, [(movie_id, affinity), ...]) in user order, movies ascending"""
+        cursor.execute(Recommender.AFFINITY_QUERY.format(bookings=bookings))
+        current, history = None, []
+        while True:
+            rows = cursor.fetchmany(RECOMMENDATION_BATCH_SIZE)
+            if not rows:
+                break
+            for user_id, movie_id, weight in rows:
+                if user_id != current:
+                    if history:
+                        yield current, history
+                    current, history = user_id, []
+                history.append((movie_id, weight))
+        if history:
+            yield current, history
+    @staticmethod
+    def drop(cursor, movie_query: str, params: tuple = ()):
+        """Forget movies that were deleted; remaining lists keep their rank order"""
         cursor.execute(
-            """SELECT seat_row, seat_number FROM seats 
-            WHERE theatre_id = ? AND movie_id = ? AND show_time = ? AND is_booked = 1""",
-            (theatre_id, movie_id, show_time)
+            f"""DELETE FROM item_similarity
+                WHERE movie_id IN ({movie_query}) OR similar_movie_id IN ({movie_query})""",
+            tuple(params) * 2
         )
-        booked_seats = cursor.fetchall()
+        cursor.execute(f"DELETE FROM user_recommendations WHERE movie_id IN ({movie_query})", params)
+    def rebuild(self) -> Dict:
+        """Recompute similarities and every user's list; returns movie and user counts"""
+        conn = self.db.get_connection(history=True)
+        cursor = conn.cursor()
+        result = self.rebuild_rows(cursor, self.db.history_tables(conn))
+        conn.commit()
         conn.close()
-        
-        # Create seat map
-        seat_map = {}
-        for row in range(1, rows + 1):
-            seat_map[chr(64 + row)] = {}  # A, B, C, etc.
-            for seat in range(1, seats_per_row + 1):
-                if (row - 1) * seats_per_row + seat <= total_seats:
-                    seat_map[chr(64 + row)][seat] = 'Available'
-        
-        # Mark booked seats
-        for booked_seat in booked_seats:
-            row, seat_num = booked_seat
-            if row in seat_map and seat_num in seat_map[row]:
-                seat_map[row][seat_num] = 'Booked'
-        
+        # Served lists live in the per-user activity cache
+        self.db.activity_cache.clear()
+        return result
+    @staticmethod
+    def rebuild_rows(cursor, tables: Dict[str, str] = None) -> Dict:
+        """tables maps bookings to another source, e.g. Database.history_tables()"""
+        bookings = tables['bookings'] if tables else 'bookings'
+        norms = defaultdict(float)
+        dots = defaultdict(lambda: defaultdict(float))
+        for _, history in Recommender._histories(cursor, bookings):
+            if len(history) > RECOMMENDATION_HISTORY_LIMIT:
+                # Very heavy users add quadratic work but little signal
+                history = sorted(heapq.nlargest(RECOMMENDATION_HISTORY_LIMIT, history, key=itemgetter(1)))
+            for index, (movie_id, weight) in enumerate(history):
+                norms[movie_id] += weight * weight
+                row = dots[movie_id]
+                for other_id, other_weight in history[index + 1:]:
+                    row[other_id] += weight * other_weight
+        candidates = defaultdict(list)
+        for movie_id, row in dots.items():
+            for other_id, dot in row.items():
+                score = dot / math.sqrt(norms[movie_id] * norms[other_id])
+                candidates[movie_id].append((score, other_id))
+                candidates[other_id].append((score, movie_id))
+        neighbours = {
+            movie_id: heapq.nlargest(RECOMMENDATION_NEIGHBOURS, scored)
+            for movie_id, scored in candidates.items()
+        }
+        cursor.execute("DELETE FROM item_similarity")
+        cursor.execute("DELETE FROM user_recommendations")
+        cursor.executemany(
+            "INSERT INTO item_similarity (movie_id, similar_movie_id, score) VALUES (?, ?, ?)",
+            [(movie_id, other_id, score) for movie_id, scored in neighbours.items() for score, other_id in scored]
+        )
+        writer = cursor.connection.cursor()
+        pending = []
+        users = 0
+        for user_id, history in Recommender._histories(cursor, bookings):
+            seen = {movie_id for movie_id, _ in history}
+            scores = defaultdict(float)
+            for movie_id, weight in history:
+                for score, other_id in neighbours.get(movie_id, ()):
+                    if other_id not in seen:
+                        scores[other_id] += weight * score
+            if not scores:
+                continue
+            users += 1
+            top = heapq.nlargest(RECOMMENDATION_TOP_K, scores.items(), key=itemgetter(1))
+            pending.extend((user_id, rank, movie_id, score) for rank, (movie_id, score) in enumerate(top, 1))
+            if len(pending) >= RECOMMENDATION_BATCH_SIZE:
+                writer.executemany(
+                    "INSERT INTO user_recommendations (user_id, rank, movie_id, score) VALUES (?, ?, ?, ?)",
+                    pending
+                )
+                pending = []
+        writer.executemany(
+            "INSERT INTO user_recommendations (user_id, rank, movie_id, score) VALUES (?, ?, ?, ?)",
+            pending
+        )
+        return {'movies': len(neighbours), 'users': users}
+class ColumnarExporter:
+    """Exports bookings, seats and food orders into a column-per-file layout that
+    analysts can mmap and scan without loading into memory or touching cine.db.
+    Each table directory holds one fixed-width native-endian file per column
+    (int64 'q', float64 'd', int32 dictionary codes 'i' for strings) plus
+    _meta.json with types, dictionaries, row count and the row id watermark.
+    Refreshes append only rows with id above the watermark. NULLs are stored as
+    -1 (ints and codes) or NaN (floats); timestamps as Unix seconds."""
+    TABLES = {
+        'bookings': {
+            'query': """SELECT b.id, b.user_id, b.movie_id, b.theatre_id, b.seats_booked, b.show_time,
+                               m.genre, CAST(STRFTIME('%s', b.booking_date) AS INTEGER), b.total_amount,
+                               b.points_earned
+                        FROM {bookings} b LEFT JOIN movies m ON m.id = b.movie_id
+                        WHERE b.id > ? ORDER BY b.id""",
+            'columns': [('id', 'q'), ('user_id', 'q'), ('movie_id', 'q'), ('theatre_id', 'q'),
+                        ('seats_booked', 'q'), ('show_time', 'dict'), ('genre', 'dict'),
+                        ('booking_date', 'q'), ('total_amount', 'd'), ('points_earned', 'q')]
+        },
+        'seats': {
+            'query': """SELECT id, theatre_id, movie_id, show_time, seat_row, seat_number, is_booked, booking_id
+                        FROM {seats} WHERE id > ? ORDER BY id""",
+            'columns': [('id', 'q'), ('theatre_id', 'q'), ('movie_id', 'q'), ('show_time', 'dict'),
+                        ('seat_row', 'dict'), ('seat_number', 'q'), ('is_booked', 'q'), ('booking_id', 'q')]
+        },
+        'food_orders': {
+            'query': """SELECT id, user_id, booking_id, snack_id, quantity, total_price,
+                               CAST(STRFTIME('%s', order_date) AS INTEGER)
+                        FROM {food_orders} WHERE id > ? ORDER BY id""",
+            'columns': [('id', 'q'), ('user_id', 'q'), ('booking_id', 'q'), ('snack_id', 'q'),
+                        ('quantity', 'q'), ('total_price', 'd'), ('order_date', 'q')]
+        },
+    }
+    CHUNK_ROWS = 50000
+    def __init__(self, db: Database, directory: str = None):
+        self.db = db
+        self.directory = directory or os.path.join(os.path.dirname(os.path.abspath(db.db_name)), 'analytics')
+    @staticmethod
+    def _typecode(column_type: str) -> str:
+        return 'i' if column_type == 'dict' else column_type
+    def _load_meta(self, table: str) -> Dict:
+        meta_path = os.path.join(self.directory, table, '_meta.json')
+        if os.path.exists(meta_path):
+            with open(meta_path) as meta_file:
+                return json.load(meta_file)
         return {
-            'seat_map': seat_map,
-            'rows': rows,
-            'seats_per_row': seats_per_row,
-            'total_seats': total_seats
+            'table': table,
+            'byteorder': sys.byteorder,
+            'row_count': 0,
+            'last_id': 0,
+            'columns': [{'name': name, 'type': column_type, 'typecode': self._typecode(column_type)}
+                        for name, column_type in self.TABLES[table]['columns']],
+            'dictionaries': {name: [] for name, column_type in self.TABLES[table]['columns'] if column_type == 'dict'}
         }
-    def book_specific_seats(self, user_id: int, movie_id: int, theatre_id: int, 
-                        show_time: str, selected_seats: List[tuple]) -> bool:
-        """Book specific seats"""
+    def export(self, tables: List[str] = None) -> Dict[str, int]:
+        """Append new rows of each table; returns rows appended per table"""
+        appended = {}
+        conn = self.db.get_connection(history=True)
         try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
-            
-            # Get ticket price
-            cursor.execute("SELECT ticket_price FROM movies WHERE id = ?", (movie_id,))
-            price_result = cursor.fetchone()
-            if not price_result:
-                return False
-            
-            ticket_price = price_result[0]
-            total_amount = ticket_price * len(selected_seats)
-            points_earned = int(total_amount / 10)
-            
-            # Create booking
-            cursor.execute(
-                """INSERT INTO bookings (user_id, movie_id, theatre_id, seats_booked, 
-                show_time, total_amount, points_earned) VALUES (?, ?, ?, ?, ?, ?, ?)""",
-                (user_id, movie_id, theatre_id, len(selected_seats), show_time, total_amount, points_earned)
-            )
-            booking_id = cursor.lastrowid
-        
-            # Book individual seats
-            for seat_row, seat_number in selected_seats:
-                cursor.execute(
-                    """INSERT INTO seats (theatre_id, movie_id, show_time, seat_row, 
-                    seat_number, is_booked, booking_id) VALUES (?, ?, ?, ?, ?, 1, ?)""",
-                    (theatre_id, movie_id, show_time, seat_row, seat_number, booking_id)
-                )
-            
-            # Update loyalty points
-            cursor.execute(
-                "UPDATE users SET loyalty_points = loyalty_points + ? WHERE id = ?",
-                (points_earned, user_id)
-            )
-            
-            conn.commit()
+            for table in tables or list(self.TABLES):
+                appended[table] = self._export_table(conn, table)
+        finally:
             conn.close()
-            return True
-        except:
-            return False
-    def book_specific_seats_with_points(self,user_id:int, movie_id:int, theatre_id:int,
-                        show_time:str, selected_seats:List[tuple], points_to_redeem:int=0) -> bool:
-        """Book specific seats with optional loyalty points redemption""" 
+        return appended
+    def _export_table(self, conn, table: str) -> int:
+        table_dir = os.path.join(self.directory, table)
+        os.makedirs(table_dir, exist_ok=True)
+        meta = self._load_meta(table)
+        columns = meta['columns']
+        dictionaries = meta['dictionaries']
+        codes = {name: {value: code for code, value in enumerate(values)} for name, values in dictionaries.items()}
+        files = {}
+        for column in columns:
+            path = os.path.join(table_dir, f"{column['name']}.bin")
+            column_file = open(path, 'ab')
+            # Drop any tail left by an interrupted refresh before appending
+            column_file.truncate(meta['row_count'] * array(column['typecode']).itemsize)
+            files[column['name']] = column_file
+        cursor = conn.cursor()
+        # Queries name their sources as {bookings}, {seats} and {food_orders}
+        query = self.TABLES[table]['query'].format(**self.db.history_tables(conn))
+        cursor.execute(query, (meta['last_id'],))
+        appended = 0
         try:
-            conn=self.db.get_connection()
-            cursor=conn.cursor()
-            #Get ticket price
-            cursor.execute("SELECT ticket_price FROM movies WHERE id=?",(movie_id,))
-            price_result=cursor.fetchone()
-            if not price_result:
-                conn.close()
-                return False
-            ticket_price=price_result[0] 
-            original_cost=ticket_price*len(selected_seats)
-            discount=(points_to_redeem//100)*10
-            final_cost=original_cost-discount
-            points_earned=int(final_cost/10)        
-            # Check if user has enough points to redeem
-            if points_to_redeem>0:
-                cursor.execute("SELECT loyalty_points FROM users WHERE id=?",(user_id,))
-                user_result=cursor.fetchone()
-                if not user_result or user_result[0]< points_to_redeem:
-                    conn.close()
-                    return False
-            # Create booking
-            cursor.execute(
-                """INSERT INTO bookings (user_id, movie_id, theatre_id, seats_booked,
-                show_time, total_amount, points_earned) VALUES(?, ?, ?, ?, ?, ?, ?)""",
-                (user_id, movie_id, theatre_id, len(selected_seats), show_time, final_cost, points_earned)
-            )      
-            booking_id=cursor.lastrowid
-            # Book individual seats
-            for seat_row, seat_number in selected_seats:
-                cursor.execute(
-                    """INSERT INTO seats (theatre_id, movie_id, show_time, seat_row,
-                    seat_number, is_booked, booking_id) VALUES (?, ?, ?, ?, ?, 1, ?)""",
-                    (theatre_id, movie_id, show_time, seat_row, seat_number, booking_id)
-                )
-            # Update loyalty points (subtract redeemed points, add earned points)
-            point_change=points_earned-points_to_redeem
-            cursor.execute(
-                "UPDATE users SET loyalty_points=loyalty_points + ? WHERE id=?",
-                (point_change, user_id)
-            )    
-            conn.commit()
-            conn.close()
-            return True
-        except Exception as e:
-            if 'conn' in locals():
-                conn.close()
-            return False    
-        
+            while True:
+                rows = cursor.fetchmany(self.CHUNK_ROWS)
+                if not rows:
+                    break
+                for index, column in enumerate(columns):
+                    name = column['name']
+                    values = [row[index] for row in rows]
+                    if column['type'] == 'dict':
+                        lookup = codes[name]
+                        encoded = array('i')
+                        for value in values:
+                            if value is None:
+                                encoded.append(-1)
+                                continue
+                            code = lookup.get(value)
+                            if code is None:
+                                code = lookup[value] = len(dictionaries[name])
+                                dictionaries[name].append(value)
+                            encoded.append(code)
+                    elif column['type'] == 'd':
+                        encoded = array('d', (float('nan') if value is None else value for value in values))
+                    else:
+                        encoded = array('q', (-1 if value is None else int(value) for value in values))
+                    encoded.tofile(files[name])
+                appended += len(rows)
+                meta['last_id'] = rows[-1][0]
+        finally:
+            for column_file in files.values():
+                column_file.close()
+        meta['row_count'] += appended
+        meta['exported_at'] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        meta_path = os.path.join(table_dir, '_meta.json')
+        with open(meta_path + '.tmp', 'w') as meta_file:
+            json.dump(meta, meta_file)
+        os.replace(meta_path + '.tmp', meta_path)
+        return appended
+class ListingExport:
+    """Encodes a stream of row dicts as NDJSON or CSV, EXPORT_CHUNK_ROWS rows per chunk, so
+    memory stays flat however many rows the listing yields. The same chunks are written to a
+    file by the CLI and sent as a response body by the API."""
+    FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+    # json.dumps with non-default options builds a new encoder per call; reuse one
+    JSON_ENCODER = json.JSONEncoder(separators=(',', ':'))
+    @staticmethod
+    def chunks(rows: Iterator[Dict], fmt: str) -> Iterator[bytes]:
+        if fmt not in ListingExport.FORMATS:
+            raise ValueError(f"Unknown export format: {fmt}")
+        buffer = io.StringIO()
+        writer = None
+        pending = 0
+        for row in rows:
+            if fmt == 'ndjson':
+                buffer.write(ListingExport.JSON_ENCODER.encode(row))
+                buffer.write('\n')
+            else:
+                if writer is None:
+                    writer = csv.DictWriter(buffer, fieldnames=list(row))
+                    writer.writeheader()
+                writer.writerow(row)
+            pending += 1
+            if pending == EXPORT_CHUNK_ROWS:
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+                pending = 0
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+    @staticmethod
+    def to_file(rows: Iterator[Dict], fmt: str, path: str) -> int:
+        """Write the export next to `path` and move it into place when complete; returns bytes"""
+        written = 0
+        partial = path + '.partial'
+        with open(partial, 'wb') as handle:
+            for chunk in ListingExport.chunks(rows, fmt):
+                handle.write(chunk)
+                written += len(chunk)
+        os.replace(partial, path)
+        return written
+class ColumnarTable:
+    """Read-only, memory-mapped view of one exported table.
+    column() returns a typed memoryview backed by the OS page cache."""
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, '_meta.json')) as meta_file:
+            self.meta = json.load(meta_file)
+        if self.meta['byteorder'] != sys.byteorder:
+            raise ValueError("Export was written on a machine with a different byte order")
+        self.row_count = self.meta['row_count']
+        self.types = {column['name']: column['typecode'] for column in self.meta['columns']}
+        self._maps = {}
+    def column(self, name: str) -> memoryview:
+        typecode = self.types[name]
+        if self.row_count == 0:
+            return memoryview(array(typecode))
+        if name not in self._maps:
+            with open(os.path.join(self.path, f"{name}.bin"), 'rb') as column_file:
+                self._maps[name] = mmap.mmap(column_file.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(self._maps[name]).cast(typecode)[:self.row_count]
+    def dictionary(self, name: str) -> List[str]:
+        return self.meta['dictionaries'][name]
+    def close(self):
+        for mapped in self._maps.values():
+            mapped.close()
+        self._maps = {}
 class CinePredicta:
     def __init__(self):
         self.db = Database()
+        # Nothing refreshes the read replica here, and an operator expects to see their own changes
+        self.db.replica_reads = False
         self.admin = Admin(self.db)
         self.manager = Manager(self.db)
         self.user = User(self.db)
+        self.loyalty = LoyaltyEngine(self.db)
+        self.ratings = RatingAggregates(self.db)
+        self.search = CatalogSearch(self.db)
+        self.review_feed = ReviewFeed(self.db)
+        self.forecaster = DemandForecaster(self.db)
+        self.revenue = RevenueRollups(self.db)
+        self.recommender = Recommender(self.db)
+        self.purger = HistoryPurger(self.db)
+        self.purger.start()
+        self.backups = BackupManager(self.db)
+        self.backups.start()
         self.current_user = None
         self.current_user_type = None
     def main_menu(self):
@@ -985,7 +4584,9 @@ class CinePredicta:
             print("3. View All Theatres")
             print("4. Delete Theatre")
             print("5. View All Reviews")
-            print("6. Logout")
+            print("6. Loyalty Tiers")
+            print("7. Maintenance")
+            print("8. Logout")
             choice = input("\nEnter your choice: ")
             if choice == '1':
                 while True:
@@ -1056,25 +4657,92 @@ class CinePredicta:
                     except ValueError:
                         print("Invalid theatre ID!")
             elif choice == '5':
-                while True:
-                    print("\n--- ALL REVIEWS ---")
-                    reviews = self.admin.view_all_reviews()
-                    print(f"Total Reviews: {len(reviews)}")
-                    for review in reviews:
-                        print(f"\nReview ID: {review['id']}")
-                        print(f"Rating: {review['rating']}/5 | Type: {review['review_type']}")
-                        print(f"User: {review['username']} | Theatre: {review['theatre_name']}")
-                        if review['movie_title'] != 'N/A':
-                            print(f"Movie: {review['movie_title']}")
-                        print(f"Comment: {review['comment']}")
-                        print(f"Date: {review['created_at']}")
-                        print("-" * 50)
-                    back_choice = input("\nPress Enter to go back to admin dashboard: ")
-                    break
+                print("\n--- ALL REVIEWS ---")
+                self.review_feed_interface()
             elif choice == '6':
+                self.loyalty_tiers_interface()
+            elif choice == '7':
+                self.maintenance_interface()
+            elif choice == '8':
                 self.current_user = None
                 self.current_user_type = None
                 break
+    def loyalty_tiers_interface(self):
+        while True:
+            print("\n--- LOYALTY TIERS ---")
+            for tier in self.loyalty.get_tiers():
+                print(f"{tier['name']}: spend >= ${tier['min_spend']} (last {LOYALTY_WINDOW_MONTHS} months), "
+                      f"points x{tier['multiplier']}")
+            print("1. Add/Update Tier")
+            print("2. Run Tier Job")
+            print("3. Back to Admin Dashboard")
+            choice = input("\nEnter your choice: ")
+            if choice == '1':
+                name = input("Tier Name: ").strip()
+                try:
+                    min_spend = float(input("Minimum trailing spend: $"))
+                    multiplier = float(input("Points multiplier: "))
+                except ValueError:
+                    print("Invalid number!")
+                    continue
+                if name and self.loyalty.set_tier(name, min_spend, multiplier):
+                    print("Tier saved!")
+                else:
+                    print("Failed to save tier!")
+            elif choice == '2':
+                result = self.loyalty.run_tier_job()
+                print(f"Processed {result['bookings_processed']} bookings and "
+                      f"{result['food_orders_processed']} food orders, re-rated {result['users_rated']} users.")
+            elif choice == '3':
+                break
+    def maintenance_interface(self):
+        while True:
+            print("\n--- MAINTENANCE ---")
+            print("1. Rebuild Rating Aggregates")
+            print("2. Rebuild Search Index")
+            print("3. Retrain Demand Forecast")
+            print("4. Rebuild Revenue Rollups")
+            print("5. Export Analytics Snapshot")
+            print("6. Rebuild Recommendations")
+            print("7. Export Users / Reviews")
+            print("8. Back to Admin Dashboard")
+            choice = input("\nEnter your choice: ")
+            if choice == '1':
+                written = self.ratings.rebuild()
+                print(f"Rebuilt {written} rating aggregates.")
+            elif choice == '2':
+                self.search.rebuild()
+                print("Search index rebuilt.")
+            elif choice == '3':
+                observed = self.forecaster.rebuild()
+                print(f"Demand model retrained on {observed} show days.")
+            elif choice == '4':
+                self.revenue.rebuild()
+                print("Revenue rollups rebuilt.")
+            elif choice == '5':
+                exporter = ColumnarExporter(self.db)
+                appended = exporter.export()
+                for table, rows in appended.items():
+                    print(f"{table}: {rows} new rows")
+                print(f"Columnar export written to {exporter.directory}")
+            elif choice == '6':
+                result = self.recommender.rebuild()
+                print(f"Recommendations rebuilt for {result['users']} users over {result['movies']} movies.")
+            elif choice == '7':
+                listing = input("Export (users/reviews): ").strip().lower()
+                fmt = input("Format (ndjson/csv) [ndjson]: ").strip().lower() or 'ndjson'
+                if listing not in ('users', 'reviews') or fmt not in ListingExport.FORMATS:
+                    print("Invalid export choice!")
+                    continue
+                path = input(f"File [{listing}.{fmt}]: ").strip() or f"{listing}.{fmt}"
+                rows = self.admin.iter_users() if listing == 'users' else self.admin.iter_all_reviews()
+                try:
+                    written = ListingExport.to_file(rows, fmt, path)
+                    print(f"Wrote {written} bytes to {path}")
+                except OSError as e:
+                    print(f"Export failed: {e}")
+            elif choice == '8':
+                break
     def manager_menu(self):
         while True:
             print("\n" + "="*30)
@@ -1126,7 +4794,9 @@ class CinePredicta:
             print("7. Edit Movie")
             print("8. View Snacks")
             print("9. Delete Snacks")
-            print("10. Logout")
+            print("10. Demand Forecast")
+            print("11. Revenue Report")
+            print("12. Logout")
             choice = input("\nEnter your choice: ")
             if choice == '1':
                 while True:
@@ -1193,10 +4863,10 @@ class CinePredicta:
             elif choice == '3':
                 while True:
                     print("\n--- VIEW BOOKINGS ---")
+                    # Totals of the rows listed below, so both always come from the same read
                     bookings = self.manager.view_bookings(self.current_user['theatre_id'])
                     print(f"Total Bookings: {len(bookings)}")
-                    total_seats = sum(booking['seats_booked'] for booking in bookings)
-                    print(f"Total Seats Booked: {total_seats}")
+                    print(f"Total Seats Booked: {sum(booking['seats_booked'] for booking in bookings)}")
                     for booking in bookings:
                         print(f"Booking ID: {booking['booking_id']}, Movie: {booking['movie_title']}, "
                             f"User: {booking['username']}, Seats: {booking['seats_booked']}, "
@@ -1231,6 +4901,8 @@ class CinePredicta:
                         print(f"Genre: {movie['genre']}")
                         print(f"Show Times: {movie['show_times']}")
                         print(f"Ticket Price: ${movie['ticket_price']}")
+                        if movie['review_count']:
+                            print(f"Rating: {movie['avg_rating']}/5 ({movie['review_count']} reviews)")
                         print("-" * 50)
                     back_choice = input("\nPress Enter to go back to manager dashboard: ")
                     break
@@ -1369,9 +5041,48 @@ class CinePredicta:
                     except ValueError:
                         print("Invalid input!")         
             elif choice == '10':
+                print("\n--- DEMAND FORECAST ---")
+                try:
+                    days = int(input("Forecast how many days ahead? [3]: ") or 3)
+                except ValueError:
+                    days = 3
+                forecasts = self.forecaster.forecast(self.current_user['theatre_id'], days=days)
+                if not forecasts:
+                    print("No scheduled shows to forecast!")
+                for forecast in forecasts:
+                    print(f"{forecast['show_date']} {forecast['show_time']:>8} | {forecast['movie_title']}: "
+                          f"~{forecast['predicted_seats']}/{forecast['total_seats']} seats "
+                          f"({forecast['predicted_occupancy']:.0%})")
+                input("\nPress Enter to go back to manager dashboard: ")
+            elif choice == '11':
+                self.revenue_report_interface()
+            elif choice == '12':
                 self.current_user = None
                 self.current_user_type = None
                 break
+    def revenue_report_interface(self):
+        print("\n--- REVENUE REPORT ---")
+        start_date = input("Start date YYYY-MM-DD (Enter for all time): ").strip() or None
+        end_date = input("End date YYYY-MM-DD (Enter for today): ").strip() or None
+        theatre_id = self.current_user['theatre_id']
+        totals = self.revenue.report(theatre_id, start_date, end_date)
+        if not totals:
+            print("No sales in this period!")
+            input("\nPress Enter to go back to manager dashboard: ")
+            return
+        total = totals[0]
+        print(f"Revenue: ${total['total_revenue']} (tickets ${total['ticket_revenue']}, food ${total['food_revenue']})")
+        print(f"Bookings: {total['bookings']} | Seats Sold: {total['seats_sold']} | "
+              f"Occupancy: {total['occupancy_pct']}% | Food Attach Rate: {total['attach_rate_pct']}%")
+        movies = {movie['id']: movie['title'] for movie in self.manager.view_movies(theatre_id)}
+        print("\nBy Movie:")
+        for row in self.revenue.report(theatre_id, start_date, end_date, group_by='movie'):
+            print(f"{movies.get(row['movie_id'], row['movie_id'])}: ${row['total_revenue']}, "
+                  f"{row['seats_sold']} seats, {row['occupancy_pct']}% full, attach {row['attach_rate_pct']}%")
+        print("\nBy Day:")
+        for row in self.revenue.report(theatre_id, start_date, end_date, group_by='day'):
+            print(f"{row['day']}: ${row['total_revenue']}, {row['seats_sold']} seats, {row['occupancy_pct']}% full")
+        input("\nPress Enter to go back to manager dashboard: ")
     def parse_duration(self, duration_str: str) -> int:
         """Parse duration string like '2h 29m' or '149m' into total minutes"""
         duration_str = duration_str.lower().replace(' ', '')
@@ -1426,9 +5137,14 @@ class CinePredicta:
                 break
     def user_dashboard(self):
         while True:
-            points = self.user.get_loyalty_points(self.current_user['id'])
+            summary = self.user.get_activity_summary(self.current_user['id'])
             print(f"\n🎪 USER DASHBOARD - Welcome {self.current_user['username']}!")
-            print(f"💎 Loyalty Points: {points}")
+            print(f"💎 Loyalty Points: {summary['loyalty_points']} | Tier: {summary['tier']} (x{summary['multiplier']} points)")
+            print(f"🎟️ Bookings: {summary['booking_count']} | 🍿 Food Orders: {summary['food_order_count']} "
+                  f"| ⭐ Reviews: {summary['review_count']}")
+            if summary['recent_bookings']:
+                latest = summary['recent_bookings'][0]
+                print(f"Latest: {latest['movie_title']} at {latest['theatre_name']} ({latest['show_time']})")
             print("1. Book Ticket")
             print("2. Order Food")
             print("3. Add Review")
@@ -1437,7 +5153,9 @@ class CinePredicta:
             print("6. View My Tickets")
             print("7. View My Food Orders")
             print("8. Browse Reviews")
-            print("9. Logout")
+            print("9. Search Movies & Reviews")
+            print("10. Recommended For You")
+            print("11. Logout")
             choice = input("\nEnter your choice: ")
             if choice == '1':
                 self.view_seat_arrangement_interface()
@@ -1448,7 +5166,7 @@ class CinePredicta:
             elif choice == '4':
                 points = self.user.get_loyalty_points(self.current_user['id'])
                 print(f"Your current loyalty points: {points}")
-                print("💡 Tip: You can redeem 100 points for $10 discount!")
+                print(f"💡 Tip: You can redeem {POINTS_REDEEM_BLOCK} points for ${POINTS_REDEEM_VALUE} discount!")
             elif choice == '5':
                 self.redeem_points_interface()
             elif choice == '6':
@@ -1501,7 +5219,8 @@ class CinePredicta:
                     print("\n---BROWSE REVIEWS---")
                     print("1.View My Reviews")
                     print("2.View All Reviews")
-                    print("3.Back to User Dashboard")
+                    print("3.Top Rated Movies")
+                    print("4.Back to User Dashboard")
                     review_choice=input("\nEnter your choice: ")
                     if review_choice=='1':
                         print("\n---MY REVIEWS---")
@@ -1520,33 +5239,136 @@ class CinePredicta:
                                 print(f"Comment: {review['comment']}")
                                 print(f"Date: {review['created_at']}")
                                 print("-" * 40)    
+                            review_choice=input("\nEnter Review ID to delete (or press Enter to continue): ").strip()
+                            if review_choice.isdigit():
+                                if self.user.delete_review(int(review_choice), self.current_user['id']):
+                                    print("Review deleted!")
+                                else:
+                                    print("Review not found!")
+                            continue
                         input("\nPress Enter to continue...") 
                     elif review_choice=='2':
                         print("\n---ALL REVIEWS---")
-                        all_reviews=self.user.get_all_reviews()
-                        if not all_reviews:
-                            print("No reviews fount!")
-                        else:
-                            print(f"Total Reviews: {len(all_reviews)}")
-                            for review in all_reviews:
-                                print(f"\nRating: {review['rating']}/5 ⭐")
-                                print(f"User: {review['username']}")
-                                print(f"Type: {review['review_type'].title()}")
-                                print(f"Theatre: {review['theatre_name']}")
-                                if review['movie_title'] !='N/A':
-                                    print(f"Movie: {review['movie_title']}")
-                                print(f"Comment: {review['comment']}")
-                                print(f"Date: {review['created_at']}")
-                                print(f"-" * 40)
-                        input("\nPress Enter to continue...")
+                        self.review_feed_interface()
                     elif review_choice=='3':
+                        print("\n---TOP RATED MOVIES---")
+                        top_movies=self.ratings.top_rated_movies(limit=10)
+                        if not top_movies:
+                            print("No rated movies yet!")
+                        for i, movie in enumerate(top_movies, 1):
+                            print(f"{i}. {movie['movie_title']} ({movie['theatre_name']}) - "
+                                  f"⭐ {movie['avg_rating']} from {movie['review_count']} reviews")
+                        input("\nPress Enter to continue...")
+                    elif review_choice=='4':
                         break
                     else:
                         print("Invalied choice")            
             elif choice == '9':
+                self.search_interface()
+            elif choice == '10':
+                self.recommendations_interface()
+            elif choice == '11':
                 self.current_user = None
                 self.current_user_type = None
                 break
+    def recommendations_interface(self):
+        print("\n--- RECOMMENDED FOR YOU ---")
+        picks = self.user.get_recommendations(self.current_user['id'])
+        if not picks:
+            print("No recommendations yet - book a movie to get started!")
+            input("\nPress Enter to continue...")
+            return
+        for i, pick in enumerate(picks, 1):
+            print(f"{i}. {pick['title']} ({pick['genre']}) at {pick['theatre_name']} - ${pick['ticket_price']}")
+        choice = input("\nEnter a number to see what its viewers also watched (or press Enter to go back): ").strip()
+        if choice.isdigit() and 1 <= int(choice) <= len(picks):
+            pick = picks[int(choice) - 1]
+            similar = self.user.get_similar_movies(pick['movie_id'], limit=5)
+            print(f"\nCustomers who watched {pick['title']} also watched:")
+            if not similar:
+                print("Nothing yet!")
+            for movie in similar:
+                print(f"- {movie['title']} at {movie['theatre_name']}")
+            input("\nPress Enter to continue...")
+    def search_interface(self):
+        while True:
+            print("\nTip: 'genre:<name>' or 'cast:<name>' lists every movie with that genre or cast member; "
+                  "'genres' lists all genres.")
+            text = input("Search movies, cast, genres and reviews (or 'back' to return): ").strip()
+            if text.lower() == 'back':
+                break
+            if not text:
+                continue
+            if text.lower() == 'genres':
+                for genre in self.user.get_genres():
+                    print(f"{genre['name']} ({genre['movie_count']} movies)")
+                continue
+            prefix, _, term = text.partition(':')
+            if term and prefix.strip().lower() in ('genre', 'cast'):
+                if prefix.strip().lower() == 'genre':
+                    movies = self.user.get_movies_by_genre(term)
+                else:
+                    movies = self.user.get_movies_by_person(term)
+                if not movies:
+                    print("No movies found!")
+                for movie in movies:
+                    print(f"{movie['title']} ({movie['genre']}) at {movie['theatre_name']} - ${movie['ticket_price']}")
+                continue
+            movies = self.search.search_movies(text, limit=10)
+            reviews = self.search.search_reviews(text, limit=10)
+            if not movies and not reviews:
+                print("No results found!")
+                continue
+            if movies:
+                print("\n--- MOVIES ---")
+                for movie in movies:
+                    print(f"{movie['title']} at {movie['theatre_name']} - ${movie['ticket_price']}")
+                    print(f"   {movie['snippet']}")
+            if reviews:
+                print("\n--- REVIEWS ---")
+                for review in reviews:
+                    subject = review['movie_title'] if review['movie_title'] != 'N/A' else review['theatre_name']
+                    print(f"{review['rating']}/5 ⭐ {subject} by {review['username']}: {review['snippet']}")
+    def review_feed_interface(self, page_size: int = 10):
+        """Page through the newest reviews with optional filters"""
+        filters = {}
+        try:
+            theatre_input = input("Filter by Theatre ID (Enter for all): ").strip()
+            if theatre_input:
+                filters['theatre_id'] = int(theatre_input)
+            rating_input = input("Minimum rating 1-5 (Enter for any): ").strip()
+            if rating_input:
+                filters['min_rating'] = int(rating_input)
+        except ValueError:
+            print("Invalid filter! Showing all reviews.")
+            filters = {}
+        type_input = input("Type - movie/theatre (Enter for both): ").strip().lower()
+        if type_input in ('movie', 'theatre'):
+            filters['review_type'] = type_input
+        cursor_key = None
+        shown = 0
+        while True:
+            page = self.review_feed.page(cursor_key=cursor_key, limit=page_size, **filters)
+            if not page['reviews'] and shown == 0:
+                print("No reviews found!")
+                break
+            for review in page['reviews']:
+                shown += 1
+                print(f"\nReview ID: {review['id']} | Rating: {review['rating']}/5 ⭐ | Type: {review['review_type'].title()}")
+                print(f"User: {review['username']} | Theatre: {review['theatre_name']}")
+                if review['movie_title'] != 'N/A':
+                    print(f"Movie: {review['movie_title']}")
+                print(f"Comment: {review['comment']}")
+                print(f"Date: {review['created_at']}")
+                print("-" * 40)
+            if not page['next_cursor']:
+                print(f"\nEnd of reviews ({shown} shown).")
+                input("Press Enter to continue...")
+                break
+            more = input("\nPress Enter for more reviews, or 'back' to return: ").strip().lower()
+            if more == 'back':
+                break
+            cursor_key = page['next_cursor']
     def order_food_interface(self):
             while True:
                 print("\n--- ORDER FOOD ---")
@@ -1587,61 +5409,58 @@ class CinePredicta:
                         
                     theatre_id = theatre_result[0]
                     
-                    # Show available snacks for this theatre
-                    snacks = self.user.get_available_snacks(theatre_id)
-                    if not snacks:
-                        print("No snacks available for this theatre!")
-                        continue
-                    
-                    print(f"\nAvailable Snacks at {selected_booking['theatre_name']}:")
-                    for i, snack in enumerate(snacks, 1):
-                        print(f"{i}. {snack['name']} - ${snack['price']}")
-                    
-                    snack_choice = input("\nSelect snack number (or 'back' to return): ")
-                    if snack_choice.lower() == 'back':
-                        continue
-                    
-                    snack_index = int(snack_choice) - 1
-                    if snack_index < 0 or snack_index >= len(snacks):
-                        print("Invalid snack selection!")
+                    snack_lines = self.select_snack_lines(theatre_id)
+                    if not snack_lines:
                         continue
+                    food_total = sum(snack['price'] * quantity for snack, quantity in snack_lines)
+                    print(f"\nOrder Summary:")
+                    for snack, quantity in snack_lines:
+                        print(f"{snack['name']} x {quantity} @ ${snack['price']} = ${snack['price'] * quantity}")
+                    print(f"Total Price: ${food_total}")
+                    print(f"For Movie: {selected_booking['movie_title']}")
                     
-                    selected_snack = snacks[snack_index]
-                    snack_id = selected_snack['id']
-                    
-                    quantity = input(f"Enter quantity for {selected_snack['name']} (or 'back' to return): ")
-                    if quantity.lower() == 'back':
-                        continue
-                    
-                    try:
-                        quantity = int(quantity)
-                        if quantity <= 0:
-                            print("Quantity must be greater than 0!")
-                            continue
-                        
-                        total_price = selected_snack['price'] * quantity
-                        print(f"\nOrder Summary:")
-                        print(f"Snack: {selected_snack['name']}")
-                        print(f"Quantity: {quantity}")
-                        print(f"Unit Price: ${selected_snack['price']}")
-                        print(f"Total Price: ${total_price}")
-                        print(f"For Movie: {selected_booking['movie_title']}")
-                        
-                        confirm = input("\nConfirm order? (y/n): ")
-                        if confirm.lower() == 'y':
-                            if self.user.order_food(self.current_user['id'], booking_id, snack_id, quantity):
-                                print("Food order placed successfully!")
-                                break
-                            else:
-                                print("Order failed!")
+                    confirm = input("\nConfirm order? (y/n): ")
+                    if confirm.lower() == 'y':
+                        lines = [(snack['id'], quantity) for snack, quantity in snack_lines]
+                        if self.user.order_food_items(self.current_user['id'], booking_id, lines):
+                            print("Food order placed successfully!")
+                            break
                         else:
-                            print("Order cancelled.")
-                            
-                    except ValueError:
-                        print("Invalid quantity!")
+                            print("Order failed!")
+                    else:
+                        print("Order cancelled.")
                         
                 except ValueError:
                     print("Invalid input!")       
+    def select_snack_lines(self, theatre_id: int) -> List[tuple]:
+        """Collect a snack cart for one theatre as (snack, quantity) pairs; empty if none chosen"""
+        snacks = self.user.get_available_snacks(theatre_id)
+        if not snacks:
+            print("No snacks available for this theatre!")
+            return []
+        print("\nAvailable Snacks:")
+        for i, snack in enumerate(snacks, 1):
+            print(f"{i}. {snack['name']} - ${snack['price']}")
+        print("Enter a snack number and quantity (e.g. '2 3'), 'done' when finished, or 'back' to return")
+        snack_lines = []
+        while True:
+            entry = input("Snack: ").strip().lower()
+            if entry == 'back':
+                return []
+            if entry == 'done':
+                return snack_lines
+            try:
+                parts = entry.split()
+                snack_index = int(parts[0]) - 1
+                quantity = int(parts[1]) if len(parts) > 1 else 1
+                if snack_index < 0 or snack_index >= len(snacks) or quantity <= 0:
+                    raise ValueError
+            except (ValueError, IndexError):
+                print("Invalid entry! Use a snack number and a quantity greater than 0, e.g. '2 3'")
+                continue
+            snack_lines.append((snacks[snack_index], quantity))
+            cart_total = sum(snack['price'] * quantity for snack, quantity in snack_lines)
+            print(f"Added {quantity} x {snacks[snack_index]['name']} (snacks total: ${cart_total})")
     def add_review_interface(self):
         print("1. Review Movie")
         print("2. Review Theatre")
@@ -1664,16 +5483,16 @@ class CinePredicta:
         current_points = self.user.get_loyalty_points(self.current_user['id'])
         print(f"Current points: {current_points}")
         print("Redemption Options:")
-        print("1. 100 points = $10 discount")
+        print(f"1. {POINTS_REDEEM_BLOCK} points = ${POINTS_REDEEM_VALUE} discount")
         print("2. 500 points = Free ticket")
-        if current_points < 100:
+        if current_points < POINTS_REDEEM_BLOCK:
             print("Insufficient points!")
             return        
         choice = input("Choose redemption option: ")
         
-        if choice == '1' and current_points >= 100:
-            if self.user.redeem_points(self.current_user['id'], 100):
-                print("Redeemed 100 points for $10 discount! 💰")
+        if choice == '1' and current_points >= POINTS_REDEEM_BLOCK:
+            if self.user.redeem_points(self.current_user['id'], POINTS_REDEEM_BLOCK):
+                print(f"Redeemed {POINTS_REDEEM_BLOCK} points for ${POINTS_REDEEM_VALUE} discount! 💰")
         elif choice == '2' and current_points >= 500:
             if self.user.redeem_points(self.current_user['id'], 500):
                 print("Redeemed 500 points for a free ticket! 🎟️")
@@ -1692,7 +5511,8 @@ class CinePredicta:
 
             print("Available Theatres:")
             for i, theatre in enumerate(theatres, 1):
-                print(f"{i}. {theatre['name']} - {theatre['location']}")
+                rating = f" - ⭐ {theatre['avg_rating']} ({theatre['review_count']})" if theatre['review_count'] else ""
+                print(f"{i}. {theatre['name']} - {theatre['location']}{rating}")
 
             try:
                 theatre_choice = input("\nSelect theatre number (or 'back' to return): ")
@@ -1714,7 +5534,8 @@ class CinePredicta:
 
                 print(f"\nMovies at {selected_theatre['name']}:")
                 for i, movie in enumerate(movies, 1):
-                    print(f"{i}. {movie['title']} - ${movie['ticket_price']}")
+                    rating = f" - ⭐ {movie['avg_rating']} ({movie['review_count']})" if movie['review_count'] else ""
+                    print(f"{i}. {movie['title']} - ${movie['ticket_price']}{rating}")
 
                 movie_choice = input("\nSelect movie number (or 'back' to return): ")
                 if movie_choice.lower() == 'back':
@@ -1847,6 +5668,11 @@ class CinePredicta:
                 else:
                     print(f"Invalid seat format: {seat}! Use format like A1, B5")
         
+        # Snacks are checked out together with the tickets
+        snack_lines = []
+        if input("\nAdd snacks to this order? (y/n): ").lower().strip() in ['y', 'yes']:
+            snack_lines = self.select_snack_lines(theatre['id'])
+        food_total = sum(snack['price'] * quantity for snack, quantity in snack_lines)
         # Confirm booking
         while True:
             total_cost = movie['ticket_price'] * len(selected_seats)
@@ -1858,25 +5684,29 @@ class CinePredicta:
             print(f"Selected Seats: {selected_display}")
             print(f"Number of Seats: {len(selected_seats)}")
             print(f"Original Total: ${total_cost}")
+            for snack, quantity in snack_lines:
+                print(f"Snack: {snack['name']} x {quantity} = ${snack['price'] * quantity}")
+            if snack_lines:
+                print(f"Snacks Total: ${food_total}")
             #Get current loyalty points
             current_points=self.user.get_loyalty_points(self.current_user['id'])
             print(f"Your Loyality Points: {current_points}")
             points_to_redeem=0
             final_cost=total_cost
             # Ask if user wants to redeem points
-            if current_points>=100:
-                max_redeemable=min(current_points//100, int(total_cost//10)) # Can't redeem more than ticket cost
+            if current_points>=POINTS_REDEEM_BLOCK:
+                max_redeemable=min(current_points//POINTS_REDEEM_BLOCK, int(total_cost//POINTS_REDEEM_VALUE)) # Can't redeem more than ticket cost
                 redeem_choice=input(f"\nDo you want to redeem your points for a discount? (y/n):").lower().strip()
                 if redeem_choice in ['y','yes']:
                     print(f"\nYou have {current_points} points available.")
-                    print(f"Each 100 points=$10 discount")
-                    print(f"You can redeem up to {max_redeemable*100} points (${max_redeemable*10} discount)")
+                    print(f"Each {POINTS_REDEEM_BLOCK} points=${POINTS_REDEEM_VALUE} discount")
+                    print(f"You can redeem up to {max_redeemable*POINTS_REDEEM_BLOCK} points (${max_redeemable*POINTS_REDEEM_VALUE} discount)")
                     try:
-                        sets_to_redeem=input(f"How many sets of 100 points would you like to redeem? (0-{max_redeemable}): ").strip()
+                        sets_to_redeem=input(f"How many sets of {POINTS_REDEEM_BLOCK} points would you like to redeem? (0-{max_redeemable}): ").strip()
                         sets_to_redeem=int(sets_to_redeem)
                         if 0<= sets_to_redeem <=max_redeemable:
-                            points_to_redeem=sets_to_redeem*100
-                            discount=sets_to_redeem*10
+                            points_to_redeem=sets_to_redeem*POINTS_REDEEM_BLOCK
+                            discount=sets_to_redeem*POINTS_REDEEM_VALUE
                             final_cost=total_cost-discount
                             print(f"\nDiscount Applied: ${discount}")
                             print(f"Points to be Redeemed: {points_to_redeem}")
@@ -1886,22 +5716,24 @@ class CinePredicta:
                     except ValueError:
                         print("Invalid input! No points will be redeemed.")
             else:
-                print(f"\nYou need at least 100 points to get a discount. You currently have {current_points} points.")            
+                print(f"\nYou need at least {POINTS_REDEEM_BLOCK} points to get a discount. You currently have {current_points} points.")            
             confirm = input("\nConfirm booking? (y/n/back): ")
             if confirm.lower() == 'back':
                 return
             elif confirm.lower() in ['y', 'yes']:
-                if self.user.book_specific_seats_with_points(
-                    self.current_user['id'], movie['id'], theatre['id'], 
-                    show_time, selected_seats, points_to_redeem
-                ):
-                    print("Tickets booked successfully!")
-                    points_earned = int(final_cost / 10)
-                    print(f"Amount Paid: ${final_cost}")
+                if self.user.checkout(
+                    self.current_user['id'], movie['id'], theatre['id'], show_time, selected_seats,
+                    [(snack['id'], quantity) for snack, quantity in snack_lines], points_to_redeem
+                ) is not None:
+                    print("Tickets booked successfully!" if not snack_lines else "Tickets and snacks booked successfully!")
+                    tier = self.loyalty.get_user_tier(self.current_user['id'])
+                    points_earned = int(final_cost / POINTS_EARN_UNIT * tier['multiplier'])
+                    print(f"Amount Paid: ${final_cost + food_total}")
                     print(f"You earned {points_earned} new loyalty points!")
                     if points_to_redeem>0:
-                        print(f"Points Redeemed {points_to_redeem} points for ${points_to_redeem//10} discount!")
-                        print(f"Discount Received: ${points_to_redeem//10}")
+                        discount = (points_to_redeem//POINTS_REDEEM_BLOCK)*POINTS_REDEEM_VALUE
+                        print(f"Points Redeemed {points_to_redeem} points for ${discount} discount!")
+                        print(f"Discount Received: ${discount}")
                     # Update current user's points in session
                     self.current_user['loyalty_points']=self.user.get_loyalty_points(self.current_user['id'])    
                     input("Press Enter to continue...")
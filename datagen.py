@@ -0,0 +1,319 @@
+"""Deterministic synthetic data for cine.db at chain scale.
+
+    python datagen.py --db bench.db --rows 1000000 --seed 7 --fast
+
+--rows is the approximate total across theatres, films, screenings, snacks, users,
+bookings, seats, food orders and reviews; every other count is derived from it. The same
+--rows, --seed and --end-date always produce the same database. Bookings run
+chronologically over the year before --end-date, favour popular films and evening shows,
+and take free seats next to each other. Every generated account has the password 'password':
+user1..userN, manager1..managerN (one per theatre) and admin.
+
+--fast trades crash safety for speed: no journal or fsync, and secondary indexes and
+search triggers are dropped during the load and rebuilt once at the end. Either way the
+derived tables (ratings, rollups, forecast, recommendations, search, genre/cast index,
+loyalty tiers) are rebuilt afterwards so the app sees a consistent database.
+"""
+import argparse
+import datetime
+import math
+import os
+import random
+import sqlite3
+import time
+from array import array
+from typing import Dict, List
+
+from c import (
+    Database, Auth, FilmCatalog, CatalogIndex, CatalogSearch, RatingAggregates, DemandForecaster,
+    RevenueRollups, Recommender, LoyaltyEngine, POINTS_EARN_UNIT, SEATS_PER_ROW
+)
+
+# Shape of the generated chain, per booking unless noted
+SEAT_WEIGHTS = [20, 40, 15, 15, 5, 5]          # party sizes 1-6
+FOOD_RATE = 0.35                               # bookings with a food order
+REVIEW_RATE = 0.08                             # bookings followed by a review
+MOVIE_REVIEW_SHARE = 0.75
+BOOKINGS_PER_USER = 5
+SCREENINGS_PER_THEATRE = 12
+SHOWS_PER_SCREENING = 4
+SLOT_FILL = 0.5                                # average occupancy the schedule is sized for
+MIN_CAPACITY, MAX_CAPACITY = 120, 26 * SEATS_PER_ROW
+BATCH_BOOKINGS = 50000
+
+FIRST_NAMES = ['James', 'Mary', 'Arjun', 'Priya', 'Chen', 'Mei', 'Omar', 'Fatima', 'Lucas', 'Sofia',
+               'Kwame', 'Amara', 'Ivan', 'Olga', 'Diego', 'Lucia', 'Kenji', 'Yuki', 'Noah', 'Emma',
+               'Ravi', 'Anjali', 'Tom', 'Grace', 'Ali', 'Leila', 'Sam', 'Nina', 'Leo', 'Zara']
+LAST_NAMES = ['Smith', 'Nair', 'Wang', 'Khan', 'Garcia', 'Okafor', 'Petrov', 'Tanaka', 'Brown', 'Menon',
+              'Silva', 'Kim', 'Haddad', 'Novak', 'Rossi', 'Singh', 'Mensah', 'Lopez', 'Muller', 'Das']
+CITIES = ['Kochi', 'Thrissur', 'Chennai', 'Bengaluru', 'Mumbai', 'Delhi', 'Pune', 'Hyderabad', 'Kolkata',
+          'Jaipur', 'Lucknow', 'Mysuru', 'Madurai', 'Goa', 'Surat', 'Nagpur', 'Indore', 'Bhopal']
+BRANDS = ['Ragam', 'Galaxy', 'Starlight', 'Majestic', 'Paragon', 'Vista', 'Regal', 'Odeon']
+TITLE_WORDS = (
+    ['Silent', 'Crimson', 'Last', 'Hidden', 'Broken', 'Golden', 'Midnight', 'Lost', 'Burning', 'Frozen',
+     'Electric', 'Savage', 'Quiet', 'Endless', 'Wild'],
+    ['River', 'Empire', 'Horizon', 'Kingdom', 'Signal', 'Harbor', 'Garden', 'Protocol', 'Frontier', 'Echo',
+     'Orbit', 'Legacy', 'Storm', 'Mirror', 'Summer'],
+)
+GENRES = ['Action', 'Drama', 'Comedy', 'Thriller', 'Romance', 'Horror', 'Sci-Fi', 'Animation', 'Fantasy',
+          'Documentary', 'Crime', 'Family']
+SNACKS = [('Salted Popcorn', 5.0), ('Caramel Popcorn', 6.0), ('Cheese Nachos', 7.5), ('Hot Dog', 6.5),
+          ('Soft Drink', 3.5), ('Iced Tea', 3.0), ('Chocolate Bar', 2.5), ('Combo Meal', 12.0)]
+SHOW_SLOTS = ['10:00AM', '12:30PM', '03:00PM', '05:45PM', '08:30PM', '10:45PM']
+SLOT_WEIGHTS = [0.5, 0.7, 0.8, 1.2, 1.6, 0.9]
+COMMENTS = {
+    1: ['Waste of time.', 'Could not finish it.', 'Terrible sound and a worse plot.'],
+    2: ['Not great.', 'Too long for what it was.', 'Some good scenes, mostly dull.'],
+    3: ['Decent watch.', 'Okay for a weekend.', 'Average, nothing special.'],
+    4: ['Really enjoyed it!', 'Great performances.', 'Good movie to watch with family.'],
+    5: ['Masterpiece!', 'Best film this year.', 'Loved every minute, watch it in a theatre.'],
+}
+
+def plan(rows: int) -> Dict[str, int]:
+    """Table sizes for roughly `rows` generated rows"""
+    average_seats = sum(size * weight for size, weight in enumerate(SEAT_WEIGHTS, 1)) / sum(SEAT_WEIGHTS)
+    per_booking = (1 + average_seats + FOOD_RATE * 2 + REVIEW_RATE + 1 / BOOKINGS_PER_USER)
+    bookings = max(10, int(rows / per_booking))
+    slot_seats = SLOT_FILL * (MIN_CAPACITY + MAX_CAPACITY) / 2
+    screenings = math.ceil(bookings * average_seats / (slot_seats * SHOWS_PER_SCREENING))
+    theatres = max(1, math.ceil(screenings / SCREENINGS_PER_THEATRE))
+    return {
+        'theatres': theatres,
+        'films': max(SCREENINGS_PER_THEATRE, min(theatres * SCREENINGS_PER_THEATRE // 3, 20000)),
+        'screenings': theatres * SCREENINGS_PER_THEATRE,
+        'users': max(5, bookings // BOOKINGS_PER_USER),
+        'bookings': bookings,
+    }
+
+def _person(rng: random.Random) -> str:
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+def _timestamp(moment: datetime.datetime) -> str:
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+def _prepare(path: str, fast: bool) -> sqlite3.Connection:
+    """Create the schema, then open the load connection (dropping indexes and triggers when fast)"""
+    if os.path.exists(path):
+        raise SystemExit(f"{path} already exists; generate into a new file")
+    Database(path)
+    conn = sqlite3.connect(path)
+    if fast:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("PRAGMA locking_mode = EXCLUSIVE")
+        conn.execute("PRAGMA cache_size = -262144")
+        # Database() recreates every dropped index and trigger when it reopens the file
+        for kind, name in conn.execute(
+            """SELECT type, name FROM sqlite_master WHERE (type = 'index' AND sql IS NOT NULL)
+               OR (type = 'trigger' AND name LIKE '%_fts_%')"""
+        ).fetchall():
+            conn.execute(f"DROP {kind.upper()} {name}")
+    else:
+        conn.execute("PRAGMA synchronous = NORMAL")
+    return conn
+
+def generate(path: str, rows: int, seed: int, end_date: datetime.date, fast: bool = False) -> Dict[str, int]:
+    rng = random.Random(seed)
+    sizes = plan(rows)
+    conn = _prepare(path, fast)
+    password = Auth.hash_password('password')
+    end = datetime.datetime.combine(end_date, datetime.time(23, 0))
+    start = end - datetime.timedelta(days=365)
+    counts = dict.fromkeys(['theatres', 'films', 'screenings', 'snacks', 'users', 'bookings', 'seats',
+                            'food_orders', 'reviews'], 0)
+
+    # Catalog: theatres with their snack menus, films, and each theatre's screenings
+    capacities = [rng.randrange(MIN_CAPACITY, MAX_CAPACITY + 1, SEATS_PER_ROW) for _ in range(sizes['theatres'])]
+    theatre_quality = [rng.uniform(2.5, 4.8) for _ in range(sizes['theatres'])]
+    conn.executemany(
+        "INSERT INTO theatres (id, name, location, total_seats, created_at) VALUES (?, ?, ?, ?, ?)",
+        [(index + 1, f"{BRANDS[index % len(BRANDS)]} {CITIES[index // len(BRANDS) % len(CITIES)]}"
+                     + (f" {index // (len(BRANDS) * len(CITIES)) + 1}" if index >= len(BRANDS) * len(CITIES) else ''),
+          CITIES[index // len(BRANDS) % len(CITIES)], capacities[index], _timestamp(start))
+         for index in range(sizes['theatres'])]
+    )
+    snack_prices = [[round(price * rng.uniform(0.9, 1.2), 2) for _, price in SNACKS] for _ in range(sizes['theatres'])]
+    conn.executemany(
+        "INSERT INTO snacks (id, name, price, theatre_id, available) VALUES (?, ?, ?, ?, 1)",
+        [(theatre * len(SNACKS) + index + 1, SNACKS[index][0], snack_prices[theatre][index], theatre + 1)
+         for theatre in range(sizes['theatres']) for index in range(len(SNACKS))]
+    )
+    conn.executemany(
+        "INSERT INTO managers (username, password, email, theatre_id) VALUES (?, ?, ?, ?)",
+        [(f"manager{theatre}", password, f"manager{theatre}@example.com", theatre)
+         for theatre in range(1, sizes['theatres'] + 1)]
+    )
+    conn.execute("INSERT INTO admins (username, password, email) VALUES ('admin', ?, 'admin@example.com')", (password,))
+    combos = len(TITLE_WORDS[0]) * len(TITLE_WORDS[1])
+    films = []
+    for index in range(sizes['films']):
+        title = f"{TITLE_WORDS[0][index % len(TITLE_WORDS[0])]} {TITLE_WORDS[1][index // len(TITLE_WORDS[0]) % len(TITLE_WORDS[1])]}"
+        if index >= combos:
+            title += f" {index // combos + 1}"
+        cast_line = ', '.join(_person(rng) for _ in range(3))
+        genre = ', '.join(rng.sample(GENRES, rng.choice([1, 1, 2])))
+        films.append((index + 1, title, FilmCatalog.title_key(title), rng.randint(85, 180), cast_line, genre,
+                      _timestamp(start)))
+    conn.executemany(
+        """INSERT INTO films (id, title, title_key, duration, cast_line, genre, created_at)
+           VALUES (?, ?, ?, ?, ?, ?, ?)""",
+        films
+    )
+    film_quality = [rng.uniform(2.0, 4.7) for _ in films]
+    # A few blockbusters take most of the sales
+    film_weights = [1 / (index + 1) ** 0.8 for index in range(len(films))]
+    film_cumulative = list(_accumulate(film_weights))
+    screenings = []
+    for theatre in range(sizes['theatres']):
+        showing = []
+        while len(showing) < SCREENINGS_PER_THEATRE:
+            film = rng.choices(range(len(films)), cum_weights=film_cumulative)[0]
+            if film not in showing:
+                showing.append(film)
+        for film in showing:
+            slots = sorted(rng.sample(range(len(SHOW_SLOTS)), SHOWS_PER_SCREENING))
+            screenings.append((film, theatre, slots, rng.randrange(16, 37) / 2))
+    conn.executemany(
+        "INSERT INTO screenings (id, film_id, theatre_id, show_times, ticket_price, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+        [(index + 1, film + 1, theatre + 1, ', '.join(SHOW_SLOTS[slot] for slot in slots), price, _timestamp(start))
+         for index, (film, theatre, slots, price) in enumerate(screenings)]
+    )
+    counts.update(theatres=sizes['theatres'], films=len(films), screenings=len(screenings),
+                  snacks=sizes['theatres'] * len(SNACKS))
+    conn.commit()
+
+    # Bookings in time order, each into the next free seats of a (screening, show time) slot
+    slot_weights = []
+    for film, theatre, slots, price in screenings:
+        for slot in slots:
+            slot_weights.append(film_weights[film] * SLOT_WEIGHTS[slot])
+    cumulative = list(_accumulate(slot_weights))
+    slot_count = len(slot_weights)
+    filled = array('H', bytes(2 * slot_count))
+    users = sizes['users']
+    user_points = array('q', bytes(8 * (users + 1)))
+    span = (end - start).total_seconds()
+    booking_id = seat_id = food_id = review_id = 0
+    for batch_start in range(0, sizes['bookings'], BATCH_BOOKINGS):
+        batch = min(BATCH_BOOKINGS, sizes['bookings'] - batch_start)
+        bookings, seats, food_orders, reviews = [], [], [], []
+        picks = rng.choices(range(slot_count), cum_weights=cumulative, k=batch)
+        for offset, slot_index in enumerate(picks):
+            party = rng.choices(range(1, 7), weights=SEAT_WEIGHTS)[0]
+            screening = slot_index // SHOWS_PER_SCREENING
+            film, theatre, slots, price = screenings[screening]
+            # Sold out or too full for the party: take the next show with room
+            probes = 0
+            while filled[slot_index] + party > capacities[theatre]:
+                slot_index = (slot_index + 1) % slot_count
+                screening = slot_index // SHOWS_PER_SCREENING
+                film, theatre, slots, price = screenings[screening]
+                probes += 1
+                if probes > slot_count:
+                    raise SystemExit("Every show is sold out; raise SLOT_FILL headroom")
+            show_time = SHOW_SLOTS[slots[slot_index % SHOWS_PER_SCREENING]]
+            booking_id += 1
+            moment = start + datetime.timedelta(seconds=span * (batch_start + offset) / sizes['bookings'])
+            booked_at = _timestamp(moment)
+            user_id = 1 + int(users * rng.random() ** 1.6)
+            amount = price * party
+            points = int(amount / POINTS_EARN_UNIT)
+            user_points[user_id] += points
+            bookings.append((booking_id, user_id, screening + 1, theatre + 1, party, show_time, booked_at, amount, points))
+            for seat in range(filled[slot_index], filled[slot_index] + party):
+                seat_id += 1
+                seats.append((seat_id, theatre + 1, screening + 1, show_time, chr(65 + seat // SEATS_PER_ROW),
+                              seat % SEATS_PER_ROW + 1, booking_id))
+            filled[slot_index] += party
+            if rng.random() < FOOD_RATE:
+                for snack in rng.sample(range(len(SNACKS)), rng.choice([1, 1, 2, 2, 3])):
+                    quantity = rng.choice([1, 1, 2, party])
+                    food_id += 1
+                    food_orders.append((food_id, user_id, booking_id, theatre * len(SNACKS) + snack + 1, quantity,
+                                        round(snack_prices[theatre][snack] * quantity, 2), booked_at))
+            if rng.random() < REVIEW_RATE:
+                movie_review = rng.random() < MOVIE_REVIEW_SHARE
+                quality = film_quality[film] if movie_review else theatre_quality[theatre]
+                rating = min(5, max(1, round(rng.gauss(quality, 0.9))))
+                review_id += 1
+                reviews.append((review_id, user_id, screening + 1 if movie_review else None, theatre + 1, rating,
+                                rng.choice(COMMENTS[rating]), 'movie' if movie_review else 'theatre',
+                                _timestamp(moment + datetime.timedelta(hours=rng.randint(3, 72)))))
+        conn.executemany(
+            """INSERT INTO bookings (id, user_id, movie_id, theatre_id, seats_booked, show_time, booking_date,
+               total_amount, points_earned) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            bookings
+        )
+        conn.executemany(
+            """INSERT INTO seats (id, theatre_id, movie_id, show_time, seat_row, seat_number, is_booked, booking_id)
+               VALUES (?, ?, ?, ?, ?, ?, 1, ?)""",
+            seats
+        )
+        conn.executemany(
+            """INSERT INTO food_orders (id, user_id, booking_id, snack_id, quantity, total_price, order_date)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            food_orders
+        )
+        conn.executemany(
+            """INSERT INTO reviews (id, user_id, movie_id, theatre_id, rating, comment, review_type, created_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+            reviews
+        )
+        conn.commit()
+        counts['bookings'] += len(bookings)
+        counts['seats'] += len(seats)
+        counts['food_orders'] += len(food_orders)
+        counts['reviews'] += len(reviews)
+
+    # Users last, once their loyalty points are known
+    for first in range(1, users + 1, BATCH_BOOKINGS):
+        conn.executemany(
+            """INSERT INTO users (id, username, password, email, phone, loyalty_points, created_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            [(user_id, f"user{user_id}", password, f"user{user_id}@example.com",
+              f"9{user_id:09d}", user_points[user_id],
+              _timestamp(start - datetime.timedelta(days=rng.randint(0, 1500))))
+             for user_id in range(first, min(first + BATCH_BOOKINGS, users + 1))]
+        )
+        conn.commit()
+    counts['users'] = users
+    conn.close()
+    _rebuild_derived(path)
+    return counts
+
+def _accumulate(values: List[float]):
+    total = 0.0
+    for value in values:
+        total += value
+        yield total
+
+def _rebuild_derived(path: str):
+    """Reopen through Database (restoring indexes, triggers and WAL), then rebuild derived tables"""
+    db = Database(path)
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    RatingAggregates.rebuild_rows(cursor)
+    DemandForecaster.rebuild_rows(cursor)
+    RevenueRollups.rebuild_rows(cursor)
+    Recommender.rebuild_rows(cursor)
+    CatalogIndex.rebuild_rows(cursor)
+    conn.commit()
+    conn.close()
+    CatalogSearch(db).rebuild()
+    LoyaltyEngine(db).run_tier_job()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', required=True, help="new database file to create")
+    parser.add_argument('--rows', type=int, default=100000, help="approximate total rows (1k to 50M)")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--end-date', type=datetime.date.fromisoformat, default=datetime.date.today(),
+                        help="last day of booking history (YYYY-MM-DD, default today)")
+    parser.add_argument('--fast', action='store_true', help="unjournaled load with deferred indexes")
+    args = parser.parse_args()
+    started = time.perf_counter()
+    counts = generate(args.db, args.rows, args.seed, args.end_date, args.fast)
+    elapsed = time.perf_counter() - started
+    total = sum(counts.values())
+    print(', '.join(f"{table} {count}" for table, count in counts.items()))
+    print(f"{total} rows in {elapsed:.1f} s ({total / elapsed:.0f} rows/s)")
@@ -0,0 +1,243 @@
+"""Local load test for api.py: requests/sec and latency percentiles.
+
+    python loadtest.py setup --db bench.db        # fixture theatre, movie and users
+    CINE_DB=bench.db python api.py                # in another terminal
+    python loadtest.py run --concurrency 32 --requests 5000
+
+    python loadtest.py fanout --subscribers 2000 --bookings 50   # live seat-map push
+
+The browse scenario replays catalog page views (theatres, then a theatre's movies and snacks)
+twice: once as plain GETs and once revalidating with If-None-Match like a browser cache.
+"""
+import argparse
+import asyncio
+import base64
+import http.client
+import json
+import threading
+import time
+from urllib.parse import quote
+from typing import List, Dict
+
+from c import Database, Admin, Manager, User
+
+BENCH_THEATRE = 'Load Test Theatre'
+BENCH_SEATS = 260          # rows A-Z, 10 seats each
+BENCH_USERS = 50
+BENCH_PASSWORD = 'loadtest'
+BENCH_CATALOG = 40         # extra screenings and snacks so listings have realistic size
+
+def setup(db_path: str):
+    db = Database(db_path)
+    Admin(db).add_theatre(BENCH_THEATRE, 'Benchmark', BENCH_SEATS)
+    conn = db.get_connection()
+    theatre_id = conn.execute("SELECT MAX(id) FROM theatres WHERE name = ?", (BENCH_THEATRE,)).fetchone()[0]
+    conn.close()
+    show_times = ', '.join(f"{hour % 12 or 12:02d}:{minute:02d}{'AM' if hour < 12 else 'PM'}"
+                           for hour in range(24) for minute in (0, 30))
+    Manager(db).add_movie('Load Test Feature', 120, 'Bench Actor', 'Drama', show_times, 100.0, theatre_id)
+    conn = db.get_connection()
+    movie_id = conn.execute("SELECT MAX(id) FROM screenings WHERE theatre_id = ?", (theatre_id,)).fetchone()[0]
+    conn.close()
+    manager = Manager(db)
+    for index in range(BENCH_CATALOG):
+        manager.add_movie(f"Catalog Feature {index}", 90 + index, f"Lead Actor {index}, Support Actor {index}",
+                          'Drama, Comedy' if index % 2 else 'Action', '10:00AM, 01:00PM, 07:30PM',
+                          80.0 + index, theatre_id)
+        manager.add_snack(f"Snack {index}", 2.5 + index % 7, theatre_id)
+    user = User(db)
+    for index in range(BENCH_USERS):
+        user.signup(f"loadtest{index}", BENCH_PASSWORD, f"loadtest{index}@example.com")
+    with open('loadtest.json', 'w') as fixture:
+        json.dump({'theatre_id': theatre_id, 'movie_id': movie_id,
+                   'show_times': [show_time.strip() for show_time in show_times.split(',')],
+                   'theatre_ids': [theatre['id'] for theatre in Admin(db).view_theatres()]}, fixture)
+    print(f"Fixture ready: theatre {theatre_id}, movie {movie_id}, {BENCH_USERS} users")
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+def run_scenario(name: str, host: str, port: int, concurrency: int, total: int, make_request,
+                 revalidate: bool = False) -> Dict:
+    """Issue `total` requests from `concurrency` keep-alive connections. With revalidate each
+    connection keeps the ETags it has seen and sends them back as If-None-Match."""
+    latencies = []
+    statuses = {}
+    received = [0]
+    lock = threading.Lock()
+    counter = iter(range(total))
+    def worker():
+        connection = http.client.HTTPConnection(host, port)
+        local_latencies = []
+        local_statuses = {}
+        local_bytes = 0
+        etags = {}
+        while True:
+            with lock:
+                index = next(counter, None)
+            if index is None:
+                break
+            method, path, body, headers = make_request(index)
+            if revalidate and path in etags:
+                headers = dict(headers, **{'If-None-Match': etags[path]})
+            started = time.perf_counter()
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            local_bytes += len(response.read())
+            local_latencies.append(time.perf_counter() - started)
+            local_statuses[response.status] = local_statuses.get(response.status, 0) + 1
+            if revalidate and response.getheader('ETag'):
+                etags[path] = response.getheader('ETag')
+        connection.close()
+        with lock:
+            latencies.extend(local_latencies)
+            received[0] += local_bytes
+            for code, count in local_statuses.items():
+                statuses[code] = statuses.get(code, 0) + count
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    result = {
+        'scenario': name,
+        'requests': len(latencies),
+        'requests_per_sec': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'body_bytes': received[0],
+        'statuses': statuses
+    }
+    print(f"{name:>10}: {result['requests_per_sec']} req/s, p50 {result['p50_ms']} ms, "
+          f"p99 {result['p99_ms']} ms, {received[0] / 1024:.0f} KiB of bodies, statuses {statuses}")
+    return result
+
+def run(host: str, port: int, concurrency: int, total: int):
+    with open('loadtest.json') as fixture:
+        fixture = json.load(fixture)
+    theatre_id, movie_id, show_times = fixture['theatre_id'], fixture['movie_id'], fixture['show_times']
+    theatre_ids = fixture['theatre_ids']
+    auth = [
+        'Basic ' + base64.b64encode(f"loadtest{index}:{BENCH_PASSWORD}".encode()).decode()
+        for index in range(BENCH_USERS)
+    ]
+    def seat_map_request(index):
+        show_time = quote(show_times[index % len(show_times)])
+        return 'GET', f"/theatres/{theatre_id}/movies/{movie_id}/seats?show_time={show_time}", None, {}
+    def browse_request(index):
+        # One page view is the theatre list followed by one theatre's movies and snacks
+        browsed = theatre_ids[(index // 3) % len(theatre_ids)]
+        paths = ['/theatres', f"/theatres/{browsed}/movies", f"/theatres/{browsed}/snacks"]
+        return 'GET', paths[index % 3], None, {}
+    def booking_request(index):
+        # Walk every seat of every show once; past shows x seats requests collide and measure the 409 path
+        show_time = show_times[index % len(show_times)]
+        seat = (index // len(show_times)) % BENCH_SEATS
+        body = json.dumps({
+            'theatre_id': theatre_id, 'movie_id': movie_id, 'show_time': show_time,
+            'seats': [{'row': chr(65 + seat // 10), 'number': seat % 10 + 1}]
+        })
+        headers = {'Content-Type': 'application/json', 'Authorization': auth[index % len(auth)]}
+        return 'POST', '/bookings', body, headers
+    run_scenario('seat-map', host, port, concurrency, total, seat_map_request)
+    run_scenario('browse', host, port, concurrency, total, browse_request)
+    run_scenario('revalidate', host, port, concurrency, total, browse_request, revalidate=True)
+    run_scenario('booking', host, port, concurrency, total, booking_request)
+
+async def _subscribe(host: str, port: int, path: str, ready: List[float], received: List[float]):
+    """Hold one live seat-map stream open, recording when each delta arrives"""
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nAccept: text/event-stream\r\n\r\n".encode())
+    await writer.drain()
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            if line.startswith(b'event: snapshot'):
+                ready.append(time.perf_counter())
+            elif line.startswith(b'event: seats'):
+                received.append(time.perf_counter())
+    finally:
+        writer.close()
+def _free_seats(host: str, port: int, fixture: Dict, bookings: int):
+    """First show, from the last one back, with enough free seats for the run"""
+    connection = http.client.HTTPConnection(host, port)
+    for show_time in reversed(fixture['show_times']):
+        connection.request('GET', f"/theatres/{fixture['theatre_id']}/movies/{fixture['movie_id']}/seats"
+                                  f"?show_time={quote(show_time)}")
+        seat_map = json.loads(connection.getresponse().read())['seat_map']
+        free = [(row, int(number)) for row, seats in seat_map.items() for number, state in seats.items()
+                if state == 'Available']
+        if len(free) >= bookings:
+            connection.close()
+            return show_time, free[:bookings]
+    raise SystemExit("No show has enough free seats left; rerun setup on a fresh database")
+def _book_sequentially(host: str, port: int, fixture: Dict, show_time: str, seats: List[tuple]) -> List[float]:
+    """Book the seats one at a time; returns when each request was sent"""
+    connection = http.client.HTTPConnection(host, port)
+    auth = 'Basic ' + base64.b64encode(f"loadtest0:{BENCH_PASSWORD}".encode()).decode()
+    sent = []
+    for row, number in seats:
+        body = json.dumps({
+            'theatre_id': fixture['theatre_id'], 'movie_id': fixture['movie_id'], 'show_time': show_time,
+            'seats': [{'row': row, 'number': number}]
+        })
+        sent.append(time.perf_counter())
+        connection.request('POST', '/bookings', body=body,
+                           headers={'Content-Type': 'application/json', 'Authorization': auth})
+        connection.getresponse().read()
+        time.sleep(0.05)
+    connection.close()
+    return sent
+async def fanout(host: str, port: int, subscribers: int, bookings: int):
+    """Subscribe many clients to one show, book seats, and time how long each delta takes to
+    reach every subscriber after its booking request was sent"""
+    with open('loadtest.json') as fixture:
+        fixture = json.load(fixture)
+    show_time, seats = _free_seats(host, port, fixture, bookings)
+    path = f"/theatres/{fixture['theatre_id']}/movies/{fixture['movie_id']}/seats/live?show_time={quote(show_time)}"
+    ready = []
+    streams = [[] for _ in range(subscribers)]
+    started = time.perf_counter()
+    tasks = [asyncio.create_task(_subscribe(host, port, path, ready, received)) for received in streams]
+    while len(ready) < subscribers:
+        await asyncio.sleep(0.05)
+    print(f"{subscribers} subscribers connected with snapshots in {time.perf_counter() - started:.2f} s")
+    sent = await asyncio.get_running_loop().run_in_executor(
+        None, _book_sequentially, host, port, fixture, show_time, seats
+    )
+    deadline = time.perf_counter() + 10
+    while any(len(received) < bookings for received in streams) and time.perf_counter() < deadline:
+        await asyncio.sleep(0.05)
+    for task in tasks:
+        task.cancel()
+    latencies = [arrived - sent[index] for received in streams for index, arrived in enumerate(received[:bookings])]
+    # Time from a booking request to its delta reaching the last subscriber
+    spread = [max(received[index] for received in streams if len(received) > index) - sent[index]
+              for index in range(bookings) if any(len(received) > index for received in streams)]
+    print(f"deltas delivered {len(latencies)}/{subscribers * bookings}, "
+          f"booking-to-subscriber p50 {percentile(latencies, 0.50) * 1000:.1f} ms, "
+          f"p99 {percentile(latencies, 0.99) * 1000:.1f} ms, "
+          f"to last subscriber p50 {percentile(spread, 0.50) * 1000:.1f} ms, max {max(spread, default=0) * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['setup', 'run', 'fanout'])
+    parser.add_argument('--db', default='cine.db')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--subscribers', type=int, default=2000)
+    parser.add_argument('--bookings', type=int, default=50)
+    args = parser.parse_args()
+    if args.command == 'setup':
+        setup(args.db)
+    elif args.command == 'fanout':
+        asyncio.run(fanout(args.host, args.port, args.subscribers, args.bookings))
+    else:
+        run(args.host, args.port, args.concurrency, args.requests)